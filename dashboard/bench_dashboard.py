@@ -0,0 +1,191 @@
+"""
+Benchmark suite for the dashboard's data functions, run with pytest-benchmark.
+
+Every benchmark runs on ten readings from each of 50 up to 100k synthetic
+plants. Today's data is refreshed from a local SQLite file and archived
+partitions are read from the moto S3 stand-in, so no real database or bucket
+is touched.
+
+Run with `bash benchmarks.sh` to compare against the stored baseline, failing on
+regressions, or `bash benchmarks.sh save` to store a new baseline.
+"""
+
+from io import BytesIO
+
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+from sqlalchemy import sql
+
+from dashboard import (create_todays_data_state, refresh_todays_data,
+                       join_dimensions, get_last_watered_plants, downsample_readings,
+                       get_archive_partition, build_date_index, get_archive_dates_in_range,
+                       ARCHIVE_COLUMNS)
+from frame_schema import compact_frame, add_day_keys, concat_frames
+from local_database import create_local_engine
+
+PLANT_COUNTS = [50, 1_000, 100_000]
+READINGS_PER_PLANT = 10
+CHOSEN_PLANT_COUNT = 5
+BUCKET = "test-archive-bucket"
+
+def make_recordings(plant_count: int) -> pd.DataFrame:
+    """Builds recordings as the database returns them, ten per plant over a day."""
+
+    rows = plant_count * READINGS_PER_PLANT
+    plant_ids = np.arange(rows) % plant_count
+
+    return pd.DataFrame({
+        "recording_id": np.arange(1, rows + 1), "plant_id": plant_ids,
+        "soil_moisture": 50.0 + plant_ids % 40, "temperature": 10.0 + plant_ids % 15,
+        "recording_taken": pd.Timestamp("2023-12-18") + pd.to_timedelta(
+            np.arange(rows) // plant_count * 8_640, unit="s"),
+        "last_watered": pd.Timestamp("2023-12-17 08:00:00")})
+
+
+def make_dimensions(plant_count: int) -> pd.DataFrame:
+    """Builds each plant's name, botanist and location, indexed by plant id."""
+
+    plant_ids = pd.RangeIndex(plant_count, name="plant_id")
+
+    return pd.DataFrame({
+        "plant_name": plant_ids.map("Plant {}".format),
+        "name": (plant_ids % 12).map("Botanist {}".format),
+        "email": (plant_ids % 12).map("botanist.{}@lnhm.co.uk".format),
+        "telephone_number": "(146)994-1635x35992",
+        "region": (plant_ids % 90).map("Region {}".format),
+        "country": (plant_ids % 3).map(["Brazil", "Peru", "Chile"].__getitem__),
+        "continent": "America"}, index=plant_ids)
+
+
+def make_todays_data(plant_count: int) -> pd.DataFrame:
+    """Builds today's compact frame, as the dashboard holds it."""
+
+    return add_day_keys(compact_frame(join_dimensions(make_recordings(plant_count),
+                                                      make_dimensions(plant_count))))
+
+
+def get_chosen_plants() -> list[str]:
+    """Returns the plants picked in the filters."""
+
+    return [f"Plant {plant}" for plant in range(CHOSEN_PLANT_COUNT)]
+
+
+@pytest.fixture(scope="module", params=PLANT_COUNTS)
+def todays_data(request):
+    """Returns today's frame for the given number of plants."""
+
+    return make_todays_data(request.param)
+
+
+@pytest.fixture(scope="module", params=PLANT_COUNTS)
+def recordings_database(request, tmp_path_factory):
+    """Returns an engine over a SQLite file holding the given number of plants' recordings."""
+
+    engine = create_local_engine(str(tmp_path_factory.mktemp("db") / "plants.db"))
+    dimensions = make_dimensions(request.param)
+
+    with engine.begin() as connection:
+        connection.execute(sql.text("INSERT INTO s_delta.botanist VALUES (:id, :name, :email, "
+                                    ":phone)"),
+                           [{"id": botanist, "name": f"Botanist {botanist}",
+                             "email": f"botanist.{botanist}@lnhm.co.uk",
+                             "phone": "(146)994-1635x35992"} for botanist in range(12)])
+        connection.execute(sql.text("INSERT INTO s_delta.location VALUES (:id, :region, "
+                                    ":country, 'America')"),
+                           [{"id": region, "region": f"Region {region}",
+                             "country": dimensions["country"].iloc[region % len(dimensions)]}
+                            for region in range(90)])
+        connection.execute(sql.text("INSERT INTO s_delta.plant VALUES (:id, :name, :location, "
+                                    ":botanist)"),
+                           [{"id": plant, "name": f"Plant {plant}", "location": plant % 90,
+                             "botanist": plant % 12} for plant in range(request.param)])
+        recordings = make_recordings(request.param).astype({"recording_taken": str,
+                                                            "last_watered": str})
+        connection.execute(sql.text("INSERT INTO s_delta.recording VALUES (:recording_id, "
+                                    ":plant_id, :soil_moisture, :temperature, "
+                                    ":recording_taken, :last_watered)"),
+                           recordings.to_dict("records"))
+
+    yield request.param, engine
+    engine.dispose()
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """Returns a client for an empty bucket in a local S3 stand-in."""
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-2")
+
+    with mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={
+            "LocationConstraint": "eu-west-2"})
+        yield s3_client
+
+
+def test_refresh_todays_data(benchmark, recordings_database):
+    """Benchmarks the first load of today's recordings, which fetches every one."""
+
+    plant_count, engine = recordings_database
+
+    def refresh():
+        with engine.connect() as connection:
+            return refresh_todays_data(connection, create_todays_data_state(), 0.0)
+
+    data = benchmark(refresh)
+
+    assert len(data) == plant_count * READINGS_PER_PLANT
+
+
+def test_get_last_watered_plants(benchmark, todays_data):
+    """Benchmarks the last watered table."""
+
+    benchmark(get_last_watered_plants, todays_data, get_chosen_plants())
+
+
+@pytest.mark.parametrize("column", ["Soil Moisture", "Temperature"])
+def test_downsample_readings(benchmark, todays_data, column):
+    """Benchmarks bucketing the chosen plants' readings for a chart."""
+
+    benchmark(downsample_readings, todays_data, column, get_chosen_plants())
+
+
+def test_filter_by_country(benchmark, todays_data):
+    """Benchmarks finding the plants in a chosen country, as the sidebar filter does."""
+
+    benchmark(lambda: todays_data[todays_data['Country'].isin(["Peru"])]['Plant Name'].unique())
+
+
+def test_concat_frames(benchmark, todays_data):
+    """Benchmarks adding today's data to a day from the archive."""
+
+    benchmark(concat_frames, [todays_data[ARCHIVE_COLUMNS + ['date', 'time']]] * 2)
+
+
+@pytest.mark.parametrize("plant_count", PLANT_COUNTS)
+def test_get_archive_partition(benchmark, s3_client, plant_count):
+    """Benchmarks reading the chart columns of a day's Parquet partition."""
+
+    key = "lmnh_plant_data_archive/date=2023-12-18/1.parquet"
+    body = BytesIO()
+    make_todays_data(plant_count)[ARCHIVE_COLUMNS].to_parquet(body)
+    s3_client.put_object(Bucket=BUCKET, Key=key, Body=body.getvalue())
+
+    data = benchmark(get_archive_partition, s3_client, BUCKET, key, ARCHIVE_COLUMNS)
+
+    assert len(data) == plant_count * READINGS_PER_PLANT
+
+
+def test_get_archive_dates_in_range(benchmark):
+    """Benchmarks finding a month of dates in three years of archive."""
+
+    dates = pd.date_range("2021-01-01", "2023-12-31").strftime("%Y-%m-%d")
+    date_index = build_date_index({"partitions": dict.fromkeys(dates, [])})
+
+    benchmark(get_archive_dates_in_range, date_index, pd.Timestamp("2023-11-01").date(),
+              pd.Timestamp("2023-11-30").date())
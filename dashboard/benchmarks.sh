@@ -0,0 +1,8 @@
+# Compares the benchmarks with the stored baseline, failing if any is more than
+# BENCHMARK_MAX_REGRESSION percent (50 by default) slower. `save` stores a new baseline.
+if [ "$1" == "save" ]; then
+    python3 -m pytest bench_dashboard.py --benchmark-storage=file://./benchmark_baselines --benchmark-disable-gc --benchmark-warmup=on --benchmark-save=baseline
+else
+    python3 -m pytest bench_dashboard.py --benchmark-storage=file://./benchmark_baselines --benchmark-disable-gc --benchmark-warmup=on --benchmark-compare \
+        --benchmark-compare-fail=median:${BENCHMARK_MAX_REGRESSION:-50}%
+fi
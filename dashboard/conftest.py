@@ -0,0 +1,6 @@
+"""Puts the pipeline's SQLite backend on the path for the tests and benchmarks."""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipeline"))
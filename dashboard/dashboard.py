@@ -1,33 +1,103 @@
 """Script to run the dashboard app, displaying the key plant data for the LNHM botanical wing."""
-from io import StringIO
+from __future__ import annotations
+
+from io import BytesIO
 from os import environ, _Environ
 import datetime
+import json
+import time
+from threading import Lock
+from typing import TYPE_CHECKING
 
 import altair as alt
 from dotenv import load_dotenv
 import pandas as pd
+import pyarrow.parquet as pq
 from boto3 import client
-from mypy_boto3_s3 import S3Client
-from sqlalchemy import create_engine, Connection, sql
+from sqlalchemy import create_engine, Connection, Engine, sql
 import streamlit as st
 
+from frame_schema import CSV_DTYPES, compact_frame, add_day_keys, concat_frames
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
 ARCHIVE_BUCKET = "c9-ladybird-lnhm-data-bucket"
 
-ARCHIVE_KEY = 'lmnh_plant_data_archive.csv'
+ARCHIVE_PREFIX = 'lmnh_plant_data_archive'
+
+MANIFEST_KEY = f'{ARCHIVE_PREFIX}/manifest.json'
+
+CSV_CHUNK_ROWS = 250_000
+
+# Today's data changes every pipeline cycle (1 min), the manifest once a day
+# and archived partitions never, so each is cached for a different time
+TODAYS_DATA_TTL = 60
+MANIFEST_TTL = 10 * 60
+ARCHIVE_PARTITION_TTL = 24 * 60 * 60
+ARCHIVE_CACHE_ENTRIES = 90
+
+DIMENSIONS_TTL = 10 * 60
+
+# The pipeline writes an hour's rollups once it has finished, and a day's after midnight
+ROLLUP_TTL = 10 * 60
+
+# Charts draw at most one point per plant per pixel, and at most
+# MAX_CHART_POINTS in total, whatever range and number of plants is chosen
+CHART_WIDTH_PIXELS = 800
+MAX_CHART_POINTS = 5000
+BUCKET_SIZES = [pd.Timedelta(size) for size in
+                ['1min', '2min', '5min', '10min', '15min', '30min', '1h', '3h', '6h', '12h', '1D']]
+
+# Charts over more than a day use the pipeline's hourly rollups, or its daily
+# ones once the range has more hours than the chart has pixels
+ROLLUP_BUCKETS = {"hour": pd.Timedelta('1h'), "day": pd.Timedelta('1D')}
+ROLLUP_READINGS = {'Soil Moisture': 'soil_moisture', 'Soil Temperature': 'temperature'}
+ROLLUP_FILTER_COLUMNS = ['Plant Name', 'Botanist Name', 'Country']
+
+DB_BACKEND = "mssql"
+POOL_SIZE = 5
+POOL_RECYCLE = 1800
+
+ARCHIVE_COLUMNS = ['Recording Taken', 'Last Watered', 'Soil Moisture', 'Temperature',
+                   'Plant Name', 'Botanist Name', 'Country']
 
 COLOUR_LIST = ['#7db16a', '#c6d485', '#618447', '#5e949b', '#415d2e',
                '#d7f1ec', '#b7c62d', '#0f1511', '#3e6164', '#87c7cd',
                '#2d4221', '#6a6539' '#2b4242', '#48472f', '#1e2f1d']
 
-QUERY = sql.text("""SELECT rec.recording_id, rec.soil_moisture, rec.temperature,
-                     rec.recording_taken, rec.last_watered, plant.name AS plant_name,
-                     bot.name, bot.email, bot.telephone_number, loc.region, loc.country,
-                     loc.continent
-                     FROM s_delta.recording AS rec
-                     JOIN s_delta.plant AS plant ON rec.plant_id = plant.plant_id
-                     JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
-                     JOIN s_delta.location AS loc ON plant.location_id = loc.location_id;
-                     """)
+RECORDING_QUERY = sql.text("""SELECT recording_id, plant_id, soil_moisture, temperature,
+                               recording_taken, last_watered
+                               FROM s_delta.recording
+                               WHERE recording_id > :last_recording_id
+                               ORDER BY recording_id;
+                               """)
+
+RECORDING_RANGE_QUERY = sql.text("""SELECT MIN(recording_id), MAX(recording_id)
+                                     FROM s_delta.recording;""")
+
+DIMENSION_QUERY = sql.text("""SELECT plant.plant_id, plant.name AS plant_name,
+                               bot.name, bot.email, bot.telephone_number, loc.region,
+                               loc.country, loc.continent
+                               FROM s_delta.plant AS plant
+                               JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
+                               JOIN s_delta.location AS loc ON plant.location_id = loc.location_id;
+                               """)
+
+ROLLUP_QUERY = sql.text("""SELECT plant.name AS plant_name, bot.name, loc.country,
+                            rollup.period_start, rollup.reading_count, rollup.soil_moisture_mean,
+                            rollup.soil_moisture_min, rollup.soil_moisture_max,
+                            rollup.temperature_mean, rollup.temperature_min,
+                            rollup.temperature_max
+                            FROM s_delta.recording_rollup AS rollup
+                            JOIN s_delta.plant AS plant ON rollup.plant_id = plant.plant_id
+                            JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
+                            JOIN s_delta.location AS loc ON plant.location_id = loc.location_id
+                            WHERE rollup.resolution = :resolution
+                            AND rollup.period_start >= :period_start
+                            AND rollup.period_start < :period_end
+                            ORDER BY rollup.period_start;
+                            """)
 
 COLUMNS = {"recording_id": "Recording ID", "soil_moisture": "Soil Moisture",
            "temperature": "Temperature", "recording_taken": "Recording Taken",
@@ -44,36 +114,214 @@ def get_s3_client(config: _Environ) -> S3Client:
     return s3client
 
 
-def get_archive_data_csv(s3client: S3Client, bucket: str, key: str) -> pd.DataFrame:
-    """Retrieves the archived data from an S3 bucket."""
+def get_archive_data_csv(s3client: S3Client, bucket: str, key: str,
+                         columns: list[str] = None) -> pd.DataFrame:
+    """Retrieves archived data from an S3 bucket, parsing it in compact chunks as it streams in."""
+
+    obj = s3client.get_object(Bucket=bucket, Key=key)
+    with pd.read_csv(obj["Body"], usecols=columns, chunksize=CSV_CHUNK_ROWS, dtype=CSV_DTYPES,
+                     parse_dates=['Recording Taken', 'Last Watered']) as reader:
+        return concat_frames(list(reader))
+
+
+def get_archive_manifest(s3client: S3Client, bucket: str, key: str) -> dict:
+    """Retrieves the manifest listing every partition of the archive."""
 
     obj = s3client.get_object(Bucket=bucket, Key=key)
-    csv_str = obj["Body"].read().decode()
-    return pd.read_csv(StringIO(csv_str))
+    return json.loads(obj["Body"].read())
+
+
+def build_date_index(manifest: dict) -> pd.DatetimeIndex:
+    """Returns a sorted index of the dates held in the archive."""
+
+    return pd.DatetimeIndex(sorted(manifest["partitions"]))
+
+
+def get_archive_dates_in_range(date_index: pd.DatetimeIndex, start: datetime.date,
+                               end: datetime.date) -> list[str]:
+    """Returns the archived dates from start to end inclusive, by binary search of the index."""
+
+    first = date_index.searchsorted(pd.Timestamp(start), side='left')
+    last = date_index.searchsorted(pd.Timestamp(end), side='right')
+    return date_index[first:last].strftime('%Y-%m-%d').tolist()
+
+
+def get_archive_partition(s3client: S3Client, bucket: str, key: str,
+                          columns: list[str]) -> pd.DataFrame:
+    """Retrieves the given columns of one archive partition, Parquet or CSV."""
+
+    if key.endswith('.parquet'):
+        body = s3client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return compact_frame(pq.read_table(BytesIO(body), columns=columns).to_pandas())
+    return get_archive_data_csv(s3client, bucket, key, columns)
+
+
+def get_archive_data_for_dates(s3client: S3Client, bucket: str, manifest: dict,
+                               dates: list[str],
+                               columns: list[str] = ARCHIVE_COLUMNS) -> pd.DataFrame:
+    """Retrieves only the archive partitions and columns needed to show the given dates."""
+
+    partitions = [call_cached("archive_partitions", load_archive_partition,
+                              s3client, bucket, obj["key"], columns)
+                  for date in dates
+                  for obj in manifest["partitions"][date]]
+    if not partitions:
+        return pd.DataFrame(columns=columns)
+    return add_day_keys(concat_frames(partitions))
+
+
+@st.cache_resource
+def get_db_engine(_config: _Environ) -> Engine:
+    """
+    Creates the engine shared by every dashboard session: a pooled SQL Server
+    engine by default, or the pipeline's local SQLite file with `DB_BACKEND=sqlite`.
+    """
+    if _config.get("DB_BACKEND", DB_BACKEND) == "sqlite":
+        # The pipeline's SQLite backend, on the path with PYTHONPATH=../pipeline
+        from local_database import create_local_engine  # pylint: disable=import-outside-toplevel
+        return create_local_engine(_config["DB_PATH"])
+    return create_engine(
+        f"mssql+pymssql://{_config['DB_USERNAME']}:{_config['DB_PASSWORD']}@{_config['DB_HOST']}"
+        f"/{_config.get('DB_NAME', 'plants')}?charset=utf8",
+        pool_size=POOL_SIZE, pool_recycle=POOL_RECYCLE, pool_pre_ping=True)
+
+
+@st.cache_resource
+def get_shared_s3_client(_config: _Environ) -> S3Client:
+    """Creates the S3 client shared by every dashboard session."""
+    return get_s3_client(_config)
+
+
+@st.cache_resource
+def get_cache_stats() -> dict:
+    """Returns the call and miss counts of each cached loader, shared by every session."""
+    return {"lock": Lock(), "loaders": {}}
 
 
-def get_db_connection(config: _Environ) -> Connection:
-    """Creates a database connection to the SQL Server."""
-    engine = create_engine(
-        f"mssql+pymssql://{config['DB_USERNAME']}:{config['DB_PASSWORD']}@{config['DB_HOST']}/?charset=utf8")
-    conn = engine.connect()
-    return conn
+def count_cache_event(name: str, event: str) -> None:
+    """Adds a call or a miss to a cached loader's counts."""
+    stats = get_cache_stats()
+    with stats["lock"]:
+        counts = stats["loaders"].setdefault(name, {"calls": 0, "misses": 0})
+        counts[event] += 1
 
 
-def get_data_from_db(conn: Connection) -> pd.DataFrame:
-    """Returns a dataframe containing all the food truck data."""
-    conn.execute(sql.text("USE plants;"))
-    recording_data = conn.execute(QUERY)
-    recordings_df = pd.DataFrame(recording_data.fetchall())
-    recordings_df = recordings_df.rename(columns=COLUMNS)
-    return recordings_df
+def call_cached(name: str, loader, *args):
+    """Calls a cached loader, counting the call. The loader counts its own misses."""
+    count_cache_event(name, "calls")
+    return loader(*args)
 
 
-def get_date_and_time_from_data(data: pd.DataFrame) -> pd.DataFrame:
-    """Extracts the date from the datetime values for recordings taken."""
-    data['date'] = data['Recording Taken'].dt.date
-    data['time'] = data['Recording Taken'].dt.time
-    return data
+@st.cache_resource
+def get_todays_data_state() -> dict:
+    """Returns the incrementally loaded recordings shared by every session."""
+    return {"lock": Lock(), **create_todays_data_state()}
+
+
+@st.cache_data(ttl=TODAYS_DATA_TTL, show_spinner=False)
+def load_todays_data(_engine: Engine) -> pd.DataFrame:
+    """Loads today's new recordings from the database, at most once per pipeline cycle."""
+    count_cache_event("todays_data", "misses")
+    state = get_todays_data_state()
+    with state["lock"], _engine.connect() as conn:
+        return refresh_todays_data(conn, state, time.monotonic())
+
+
+@st.cache_data(ttl=MANIFEST_TTL, show_spinner=False)
+def load_archive_manifest(_s3client: S3Client, bucket: str, key: str) -> dict:
+    """Loads the archive's manifest, which only changes when the daily transfer runs."""
+    count_cache_event("archive_manifest", "misses")
+    return get_archive_manifest(_s3client, bucket, key)
+
+
+@st.cache_data(ttl=ARCHIVE_PARTITION_TTL, max_entries=ARCHIVE_CACHE_ENTRIES,
+               show_spinner=False)
+def load_archive_partition(_s3client: S3Client, bucket: str, key: str,
+                           columns: list[str]) -> pd.DataFrame:
+    """Loads an archive partition. Partitions are never rewritten, so are kept for a day."""
+    count_cache_event("archive_partitions", "misses")
+    return get_archive_partition(_s3client, bucket, key, columns)
+
+
+@st.cache_data(ttl=ROLLUP_TTL, show_spinner=False)
+def load_rollups(_engine: Engine, resolution: str, start: datetime.date,
+                 end: datetime.date) -> pd.DataFrame:
+    """Loads the rollups for a range of days, which only grow once an hour."""
+    count_cache_event("rollups", "misses")
+    with _engine.connect() as conn:
+        return get_rollups_from_db(conn, resolution, start, end)
+
+
+def get_dimensions_from_db(conn: Connection) -> pd.DataFrame:
+    """Returns each plant's name, botanist and location, indexed by plant id."""
+    result = conn.execute(DIMENSION_QUERY)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys())).set_index('plant_id')
+
+
+def get_new_recordings_from_db(conn: Connection, last_recording_id: int) -> pd.DataFrame:
+    """Returns only the recordings added since the given recording id."""
+    result = conn.execute(RECORDING_QUERY, {"last_recording_id": last_recording_id})
+    recordings = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    for column in ['recording_taken', 'last_watered']:
+        recordings[column] = pd.to_datetime(recordings[column])
+    return recordings
+
+
+def join_dimensions(recordings: pd.DataFrame, dimensions: pd.DataFrame) -> pd.DataFrame:
+    """Adds the plant, botanist and location columns to recordings, client side."""
+    recordings = recordings.join(dimensions, on='plant_id').drop(columns='plant_id')
+    return recordings.rename(columns=COLUMNS)
+
+
+def create_todays_data_state() -> dict:
+    """Returns the state of an empty incremental load of today's recordings."""
+    return {"data": compact_frame(pd.DataFrame(columns=[*COLUMNS.values(), 'date', 'time'])),
+            "first_recording_id": None, "last_recording_id": 0,
+            "dimensions": None, "dimensions_loaded_at": 0.0}
+
+
+def is_full_reload_needed(state: dict, first_id: int | None, last_id: int | None) -> bool:
+    """
+    Checks whether rows already loaded have left the table, as when the
+    transfer job clears it, so the loaded frame has to be thrown away.
+    """
+    if state["first_recording_id"] is None:
+        return False
+    if first_id is None:
+        return True
+    return first_id > state["first_recording_id"] or last_id < state["last_recording_id"]
+
+
+def refresh_todays_data(conn: Connection, state: dict, now: float) -> pd.DataFrame:
+    """
+    Adds the recordings loaded since the last refresh to the state's frame and
+    returns it. The dimension columns are joined from a frame of the plants,
+    which is only reloaded when a new plant appears or it is out of date.
+    """
+    first_id, last_id = conn.execute(RECORDING_RANGE_QUERY).one()
+    if is_full_reload_needed(state, first_id, last_id):
+        state.update(create_todays_data_state())
+
+    new_recordings = get_new_recordings_from_db(conn, state["last_recording_id"])
+    if new_recordings.empty:
+        return state["data"]
+
+    dimensions = state["dimensions"]
+    if (dimensions is None or now - state["dimensions_loaded_at"] > DIMENSIONS_TTL
+            or not new_recordings['plant_id'].isin(dimensions.index).all()):
+        dimensions = state["dimensions"] = get_dimensions_from_db(conn)
+        state["dimensions_loaded_at"] = now
+
+    new_data = add_day_keys(compact_frame(join_dimensions(new_recordings, dimensions)))
+
+    if state["first_recording_id"] is None:
+        state["data"] = new_data
+        state["first_recording_id"] = int(new_recordings['recording_id'].iloc[0])
+    else:
+        state["data"] = concat_frames([state["data"], new_data])
+    state["last_recording_id"] = int(new_recordings['recording_id'].iloc[-1])
+
+    return state["data"]
 
 
 def get_last_watered_plants(data: pd.DataFrame, chosen_plants: list[str]) -> pd.DataFrame:
@@ -84,39 +332,160 @@ def get_last_watered_plants(data: pd.DataFrame, chosen_plants: list[str]) -> pd.
     return each_plant_data[['Plant Name', 'Last Watered']]
 
 
-def temp_line_chart(data: pd.DataFrame, chosen_plants: list[str]) -> st.altair_chart:
-    """Creates a line graph showing temperature of soil throughout the day for plants."""
-    data = data[data['Plant Name'].isin(chosen_plants)].rename(
-        columns={'Temperature': 'Soil Temperature', 'Recording Taken': 'Time'})
-    title = alt.TitleParams(
-        'Temperature of soil over time', anchor='middle')
-    color = alt.Color('Plant Name', scale=alt.Scale(range=COLOUR_LIST))
-    figure = alt.Chart(data).mark_line().encode(
-        x='hoursminutes(Time)', y='Soil Temperature', color=color).properties(title=title)
-    return figure
+def choose_bucket_size(start: pd.Timestamp, end: pd.Timestamp, plant_count: int,
+                       width: int = CHART_WIDTH_PIXELS) -> pd.Timedelta:
+    """Picks the smallest bucket that keeps the chart within its point budget."""
+    max_buckets = max(1, min(width, MAX_CHART_POINTS // max(plant_count, 1)))
+    span = (end - start) / max_buckets
+    return next((size for size in BUCKET_SIZES if size >= span), BUCKET_SIZES[-1])
 
 
-def moisture_line_chart(data: pd.DataFrame, chosen_plants: list[str]) -> st.altair_chart:
-    """Creates a line graph showing moisture levels of soil throughout the day for plants."""
-    data = data[data['Plant Name'].isin(chosen_plants)].rename(
-        columns={'Recording Taken': 'Time'})
-    title = alt.TitleParams(
-        'Moisture Level of soil over time', anchor='middle')
+def bucket_readings(data: pd.DataFrame, column: str, bucket: pd.Timedelta) -> pd.DataFrame:
+    """Averages each plant's readings into time buckets, keeping each bucket's min and max."""
+    buckets = data.groupby(['Plant Name', pd.Grouper(key='Recording Taken', freq=bucket)],
+                           observed=True)[column].agg(['mean', 'min', 'max']).dropna()
+    return buckets.reset_index().rename(columns={'Recording Taken': 'Time', 'mean': column,
+                                                 'min': 'Min', 'max': 'Max'})
+
+
+def downsample_readings(data: pd.DataFrame, column: str, chosen_plants: list[str],
+                        width: int = CHART_WIDTH_PIXELS) -> pd.DataFrame:
+    """
+    Averages each chosen plant's readings into time buckets sized to the chart,
+    keeping each bucket's min and max so short spikes still show.
+    """
+    data = data[data['Plant Name'].isin(chosen_plants)]
+    if data.empty:
+        return pd.DataFrame(columns=['Plant Name', 'Time', column, 'Min', 'Max'])
+
+    bucket = choose_bucket_size(data['Recording Taken'].min(), data['Recording Taken'].max(),
+                                data['Plant Name'].nunique(), width)
+    return bucket_readings(data, column, bucket)
+
+
+def choose_rollup_resolution(start: datetime.date, end: datetime.date,
+                             width: int = CHART_WIDTH_PIXELS) -> str:
+    """Picks hourly rollups when the range has no more hours than the chart has pixels."""
+    hours = ((end - start).days + 1) * 24
+    return "hour" if hours <= width else "day"
+
+
+def get_rollups_from_db(conn: Connection, resolution: str, start: datetime.date,
+                        end: datetime.date) -> pd.DataFrame:
+    """Returns every plant's hourly or daily rollups from start to end inclusive."""
+    result = conn.execute(ROLLUP_QUERY, {
+        "resolution": resolution,
+        "period_start": datetime.datetime.combine(start, datetime.time()),
+        "period_end": datetime.datetime.combine(end + datetime.timedelta(days=1),
+                                                datetime.time())})
+    rollups = pd.DataFrame(result.fetchall(), columns=list(result.keys())).rename(
+        columns={**COLUMNS, "period_start": "Time"})
+    rollups['Time'] = pd.to_datetime(rollups['Time'])
+    return compact_frame(rollups)
+
+
+def get_rolled_up_dates(rollups: pd.DataFrame, manifest: dict) -> pd.DatetimeIndex:
+    """
+    Returns the archived days whose every reading is counted in the rollups, by
+    comparing their reading counts with the manifest's rows for the day. Only
+    these days needn't be read from the archive.
+    """
+    rolled_up = rollups.groupby(rollups['Time'].dt.normalize())['reading_count'].sum()
+    archived = pd.Series({pd.Timestamp(date): sum(obj["rows"] for obj in objects)
+                          for date, objects in manifest["partitions"].items()}, dtype='float64')
+    archived = archived.reindex(rolled_up.index)
+    return pd.DatetimeIndex(rolled_up.index[rolled_up.to_numpy() >= archived.to_numpy()])
+
+
+def drop_rolled_up_readings(data: pd.DataFrame, rollups: pd.DataFrame,
+                            resolution: str) -> pd.DataFrame:
+    """Drops the readings taken in a period that the plant's rollups already cover."""
+    if data.empty:
+        return data
+    readings = pd.MultiIndex.from_arrays([data['Plant Name'].astype(str),
+                                          data['Recording Taken'].dt.floor(
+                                              ROLLUP_BUCKETS[resolution])])
+    rolled_up = pd.MultiIndex.from_arrays([rollups['Plant Name'].astype(str), rollups['Time']])
+    return data[~readings.isin(rolled_up)]
+
+
+def get_range_chart_data(data: pd.DataFrame, rollups: pd.DataFrame, column: str,
+                         chosen_plants: list[str], resolution: str) -> pd.DataFrame:
+    """
+    Returns the chosen plants' points for a range of more than a day: the
+    rollups where the pipeline has written them, and readings not yet rolled
+    up, such as this hour's, bucketed to the same size.
+    """
+    rollups = rollups[rollups['Plant Name'].isin(chosen_plants)]
+    reading = ROLLUP_READINGS[column]
+    rolled_up = pd.DataFrame({'Plant Name': rollups['Plant Name'].astype(str),
+                              'Time': rollups['Time'],
+                              column: rollups[f'{reading}_mean'],
+                              'Min': rollups[f'{reading}_min'],
+                              'Max': rollups[f'{reading}_max']})
+
+    data = data[data['Plant Name'].isin(chosen_plants)]
+    if data.empty:
+        return rolled_up.reset_index(drop=True)
+
+    bucketed = bucket_readings(data, column, ROLLUP_BUCKETS[resolution])
+    bucketed['Plant Name'] = bucketed['Plant Name'].astype(str)
+    return pd.concat([rolled_up, bucketed], ignore_index=True).sort_values('Time',
+                                                                           ignore_index=True)
+
+
+def downsampled_line_chart(data: pd.DataFrame, column: str, title: str) -> alt.LayerChart:
+    """Draws each plant's bucket means as a line over a band of the bucket's min to max."""
     color = alt.Color('Plant Name', scale=alt.Scale(range=COLOUR_LIST))
-    figure = alt.Chart(data).mark_line().encode(
-        x='hoursminutes(Time)', y='Soil Moisture', color=color).properties(title=title)
-    return figure
+    one_day = data['Time'].dt.normalize().nunique() <= 1
+    base = alt.Chart(data).encode(x='hoursminutes(Time)' if one_day else 'Time:T', color=color)
+    band = base.mark_area(opacity=0.2).encode(y='Min', y2='Max')
+    line = base.mark_line().encode(y=column, tooltip=['Plant Name', 'Time', column, 'Min', 'Max'])
+    return alt.layer(band, line).properties(title=alt.TitleParams(title, anchor='middle'))
 
 
-def filter_by_date(chosen_date: datetime.date,
-                   current_data: pd.DataFrame,
-                   archived_data: pd.DataFrame) -> pd.DataFrame:
-    """Filters by the chosen date, returns relevant data to be displayed in a pandas dataframe."""
-    if chosen_date == datetime.date.today():
-        data = current_data
-    else:
-        data = archived_data[(archived_data['date'] == chosen_date)]
-    return data
+def get_chart_data(data: pd.DataFrame, column: str, chosen_plants: list[str],
+                   rollups: pd.DataFrame = None, resolution: str = "hour") -> pd.DataFrame:
+    """Returns a chart's points, from the rollups when given, or else by downsampling."""
+    if rollups is None:
+        return downsample_readings(data, column, chosen_plants)
+    return get_range_chart_data(data, rollups, column, chosen_plants, resolution)
+
+
+def temp_line_chart(data: pd.DataFrame, chosen_plants: list[str], rollups: pd.DataFrame = None,
+                    resolution: str = "hour") -> st.altair_chart:
+    """Creates a line graph showing temperature of soil throughout the day for plants."""
+    data = get_chart_data(data.rename(columns={'Temperature': 'Soil Temperature'}),
+                          'Soil Temperature', chosen_plants, rollups, resolution)
+    return downsampled_line_chart(data, 'Soil Temperature', 'Temperature of soil over time')
+
+
+def moisture_line_chart(data: pd.DataFrame, chosen_plants: list[str],
+                        rollups: pd.DataFrame = None, resolution: str = "hour") -> st.altair_chart:
+    """Creates a line graph showing moisture levels of soil throughout the day for plants."""
+    data = get_chart_data(data, 'Soil Moisture', chosen_plants, rollups, resolution)
+    return downsampled_line_chart(data, 'Soil Moisture', 'Moisture Level of soil over time')
+
+
+def filter_by_date_range(start: datetime.date, end: datetime.date,
+                         current_data: pd.DataFrame,
+                         s3client: S3Client,
+                         manifest: dict,
+                         date_index: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Filters by the chosen range of dates, returns relevant data to be displayed in a
+    pandas dataframe. Archived days come from the partitions the date index finds, and
+    today's data is added when the range reaches today.
+    """
+    dates = get_archive_dates_in_range(date_index, start, end)
+    frames = []
+    if dates:
+        frames.append(get_archive_data_for_dates(s3client, ARCHIVE_BUCKET, manifest, dates))
+    if end >= datetime.date.today():
+        frames.append(current_data[ARCHIVE_COLUMNS + ['date', 'time']])
+    if not frames:
+        return pd.DataFrame(columns=ARCHIVE_COLUMNS + ['date', 'time'])
+    return concat_frames(frames)
 
 
 def filter_by_country(data: pd.DataFrame) -> list[str]:
@@ -144,13 +513,29 @@ def filter_by_botanist(data: pd.DataFrame) -> list[str]:
     return chosen_plants
 
 
-def soil_monitoring_charts(data:pd.DataFrame, chosen_plants:list[str]) -> None:
-    """Plots the temperature and soil moisture charts."""
+def soil_monitoring_charts(data:pd.DataFrame, chosen_plants:list[str],
+                           rollups: pd.DataFrame = None, resolution: str = "hour") -> None:
+    """Plots the temperature and soil moisture charts, from the rollups when given."""
     st.subheader('Soil Monitoring', anchor=None, divider='grey')
     st.altair_chart(moisture_line_chart
-                    (data, chosen_plants), theme=None, use_container_width=True)
+                    (data, chosen_plants, rollups, resolution), theme=None,
+                    use_container_width=True)
     st.altair_chart(temp_line_chart
-                    (data, chosen_plants), theme=None, use_container_width=True)
+                    (data, chosen_plants, rollups, resolution), theme=None,
+                    use_container_width=True)
+
+
+def cache_stats_sidebar() -> None:
+    """Shows the hit rate of each cached loader in the sidebar, for debugging."""
+    stats = get_cache_stats()
+    with stats["lock"]:
+        rows = [{"Cache": name, "Calls": counts["calls"],
+                 "Hits": counts["calls"] - counts["misses"],
+                 "Hit Rate": (f"{1 - counts['misses'] / counts['calls']:.0%}"
+                              if counts["calls"] else "-")}
+                for name, counts in stats["loaders"].items()]
+    st.sidebar.subheader('Cache (debug)', anchor=None, divider='grey')
+    st.sidebar.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
 
 
 def last_watered_table(data:pd.DataFrame, chosen_plants:list[str]) -> None:
@@ -164,18 +549,17 @@ if __name__ == "__main__":
 
     load_dotenv()
 
-    # connecting to the database and retrieving the data:
-    connection = get_db_connection(environ)
-    todays_data = get_data_from_db(connection)
-    todays_data = get_date_and_time_from_data(todays_data)
+    # retrieving today's data through the shared engine, cached for a pipeline cycle:
+    db_engine = get_db_engine(environ)
+    todays_data = call_cached("todays_data", load_todays_data, db_engine)
 
-    # connecting to the s3 bucket and retrieving archive data file:
-    s3_client = get_s3_client(environ)
-    archive_data = get_archive_data_csv(s3_client, ARCHIVE_BUCKET, ARCHIVE_KEY)
-    archive_data['Recording Taken'] = pd.to_datetime(archive_data['Recording Taken'])
-    archive_data = get_date_and_time_from_data(archive_data)
+    # retrieving the archive's list of partitions through the shared s3 client:
+    s3_client = get_shared_s3_client(environ)
+    archive_manifest = call_cached("archive_manifest", load_archive_manifest,
+                                   s3_client, ARCHIVE_BUCKET, MANIFEST_KEY)
 
-    all_dates = pd.concat([todays_data['date'], archive_data['date'][::-1]]).unique()
+    archive_date_index = build_date_index(archive_manifest)
+    today = datetime.date.today()
 
     # establishing streamlit dashboard title.
     st.title(':herb: LNHM Botanical Plant Sensors :herb:')
@@ -183,28 +567,54 @@ if __name__ == "__main__":
     # setting up a filter search on the side bar.
     st.sidebar.header('Filters:')
 
-    #filtering by date
-    selected_date = st.sidebar.selectbox(
-        "Select Date:", all_dates, index=0)
-    relevant_data = filter_by_date(selected_date, todays_data, archive_data)
+    #filtering by a range of dates, a single day by default
+    selected_dates = st.sidebar.date_input(
+        "Select Dates:", value=(today, today), max_value=today,
+        min_value=archive_date_index[0].date() if len(archive_date_index) else today)
+    # while the second date is being picked only the first has been chosen
+    start_date, end_date = selected_dates if len(selected_dates) == 2 else (selected_dates[0],) * 2
+
+    # ranges of more than a day are charted from the pipeline's rollups, so only
+    # days it hasn't fully rolled up are read from the archive, and only each
+    # plant's readings in periods without a rollup are charted from them
+    chart_rollups, chart_resolution = None, "hour"
+    if start_date < end_date:
+        chart_resolution = choose_rollup_resolution(start_date, end_date)
+        chart_rollups = call_cached("rollups", load_rollups, db_engine, chart_resolution,
+                                    start_date, end_date)
+        archive_date_index = archive_date_index.difference(
+            get_rolled_up_dates(chart_rollups, archive_manifest))
+
+    relevant_data = filter_by_date_range(start_date, end_date, todays_data, s3_client,
+                                         archive_manifest, archive_date_index)
+
+    filter_data = relevant_data
+    if chart_rollups is not None:
+        relevant_data = drop_rolled_up_readings(relevant_data, chart_rollups, chart_resolution)
+        filter_data = concat_frames([relevant_data[ROLLUP_FILTER_COLUMNS],
+                                     chart_rollups[ROLLUP_FILTER_COLUMNS]])
 
     # option to filter by country or botanist.
     filter_choice = st.sidebar.selectbox("Filter by:", ['Botanist', 'Country'])
 
     if filter_choice == "Country":
-        selected_plants = filter_by_country(relevant_data)
+        selected_plants = filter_by_country(filter_data)
 
     if filter_choice == "Botanist":
-        selected_plants = filter_by_botanist(relevant_data)
+        selected_plants = filter_by_botanist(filter_data)
 
     # displays relevant charts depending on the date and plants selected.
-    if selected_plants and selected_date == datetime.date.today():
-        last_watered_table(relevant_data, selected_plants)
-        soil_monitoring_charts(relevant_data, selected_plants)
+    if selected_plants and end_date == today:
+        last_watered_table(todays_data, selected_plants)
+        soil_monitoring_charts(relevant_data, selected_plants, chart_rollups, chart_resolution)
 
     elif selected_plants:
-        soil_monitoring_charts(relevant_data, selected_plants)
+        soil_monitoring_charts(relevant_data, selected_plants, chart_rollups, chart_resolution)
 
     else:
         st.subheader('Please use the filters to display relevant data :hibiscus:',
                      anchor=None, divider='grey', )
+
+    # shows the cache hit rates when run with DASHBOARD_DEBUG=true or ?debug=true
+    if "true" in (environ.get("DASHBOARD_DEBUG", "false").lower(), st.query_params.get("debug")):
+        cache_stats_sidebar()
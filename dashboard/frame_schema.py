@@ -0,0 +1,54 @@
+"""
+Compact column types for the dashboard's recordings frames, today's and archived.
+
+Plant, botanist and location strings repeat on every reading, so they are held
+as categoricals: each row stores a small integer code, and filters compare the
+codes. Readings are float32, and the day and time of each reading are kept as
+datetime64 and timedelta64 columns rather than Python date and time objects.
+"""
+
+from functools import reduce
+
+import pandas as pd
+
+DIMENSION_COLUMNS = ['Plant Name', 'Botanist Name', 'Botanist Email', 'Botanist Phone Number',
+                     'Region', 'Country', 'Continent']
+READING_COLUMNS = ['Soil Moisture', 'Temperature']
+TIMESTAMP_COLUMNS = ['Recording Taken', 'Last Watered']
+
+CSV_DTYPES = {**{column: 'category' for column in DIMENSION_COLUMNS},
+              **{column: 'float32' for column in READING_COLUMNS}}
+
+
+def compact_frame(data: pd.DataFrame) -> pd.DataFrame:
+    """Casts whichever of the recordings columns the frame has to their compact types."""
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items()
+              if column in data and data[column].dtype != dtype}
+    data = data.astype(dtypes)
+    for column in TIMESTAMP_COLUMNS:
+        if column in data and not pd.api.types.is_datetime64_any_dtype(data[column]):
+            data[column] = pd.to_datetime(data[column])
+    return data
+
+
+def add_day_keys(data: pd.DataFrame) -> pd.DataFrame:
+    """Adds the day each reading was taken, and the time into that day, as typed columns."""
+    data['date'] = data['Recording Taken'].dt.normalize()
+    data['time'] = data['Recording Taken'] - data['date']
+    return data
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates compact frames, keeping the dimension columns categorical.
+    pandas falls back to strings when categories differ, so every frame's
+    column is first given the union of their categories.
+    """
+    frames = [compact_frame(frame) for frame in frames]
+    for column in DIMENSION_COLUMNS:
+        if all(column in frame for frame in frames):
+            categories = reduce(pd.Index.union,
+                                [frame[column].cat.categories for frame in frames])
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)})
+                      for frame in frames]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,231 @@
+"""Unit tests for the dashboard's data functions."""
+
+import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import sql
+
+from dashboard import (get_rollups_from_db, choose_rollup_resolution, drop_rolled_up_readings,
+                       get_range_chart_data, get_rolled_up_dates, create_todays_data_state,
+                       refresh_todays_data, is_full_reload_needed)
+from frame_schema import compact_frame
+from local_database import create_local_engine
+
+DIMENSION_ROWS = [
+    "INSERT INTO s_delta.botanist VALUES (1, 'Carl Linnaeus', 'carl.linnaeus@lnhm.co.uk', "
+    "'(146)994-1635x35992')",
+    "INSERT INTO s_delta.location VALUES (1, 'Resplendor', 'Brazil', 'America')",
+    "INSERT INTO s_delta.location VALUES (2, 'Lima', 'Peru', 'America')",
+    "INSERT INTO s_delta.plant VALUES (1, 'Venus flytrap', 1, 1)",
+    "INSERT INTO s_delta.plant VALUES (2, 'Corpse flower', 2, 1)"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Returns an engine over the pipeline's SQLite schema, holding two plants."""
+
+    local_engine = create_local_engine(str(tmp_path / "plants.db"))
+    with local_engine.begin() as conn:
+        for statement in DIMENSION_ROWS:
+            conn.execute(sql.text(statement))
+
+    yield local_engine
+    local_engine.dispose()
+
+
+def insert_rollup(conn, plant_id: int, resolution: str, period_start: str,
+                  soil_moisture: float) -> None:
+    """Inserts a rollup of a plant's readings, with the same mean, min and max."""
+
+    conn.execute(sql.text("""INSERT INTO s_delta.recording_rollup VALUES (:plant_id, :resolution,
+                          :period_start, 4, :moisture, :moisture, :moisture, 12.0, 11.0, 13.0)"""),
+                 {"plant_id": plant_id, "resolution": resolution, "period_start": period_start,
+                  "moisture": soil_moisture})
+
+
+def insert_recordings(conn, plant_id: int, hours: range) -> None:
+    """Inserts a plant's readings, one on each of the given hours of the day."""
+
+    for hour in hours:
+        conn.execute(sql.text("""INSERT INTO s_delta.recording VALUES (NULL, :plant_id, 50.0, 12.5,
+                              :taken, '2023-12-18 08:00:00')"""),
+                     {"plant_id": plant_id, "taken": f"2023-12-18 {hour:02}:00:00"})
+
+
+def make_readings(times: list[str], soil_moisture: list[float],
+                  plant_name: str = "Venus flytrap") -> pd.DataFrame:
+    """Builds a plant's raw readings, as loaded from the archive or today's data."""
+
+    return compact_frame(pd.DataFrame({
+        "Recording Taken": pd.to_datetime(times), "Soil Moisture": soil_moisture,
+        "Temperature": 12.0, "Plant Name": plant_name, "Botanist Name": "Carl Linnaeus",
+        "Country": "Brazil"}))
+
+
+def test_get_rollups_from_db(engine):
+    """Tests that only the range's rollups at the chosen resolution are read, with plant names."""
+
+    with engine.begin() as conn:
+        insert_rollup(conn, 1, "hour", "2023-12-18 09:00:00", 40.0)
+        insert_rollup(conn, 2, "hour", "2023-12-19 23:00:00", 60.0)
+        insert_rollup(conn, 1, "hour", "2023-12-20 00:00:00", 50.0)
+        insert_rollup(conn, 1, "day", "2023-12-18 00:00:00", 45.0)
+
+    with engine.connect() as conn:
+        rollups = get_rollups_from_db(conn, "hour", datetime.date(2023, 12, 18),
+                                      datetime.date(2023, 12, 19))
+
+    assert rollups["Plant Name"].tolist() == ["Venus flytrap", "Corpse flower"]
+    assert rollups["Country"].tolist() == ["Brazil", "Peru"]
+    assert rollups["Time"].tolist() == [pd.Timestamp("2023-12-18 09:00"),
+                                        pd.Timestamp("2023-12-19 23:00")]
+    assert isinstance(rollups["Plant Name"].dtype, pd.CategoricalDtype)
+
+
+def test_choose_rollup_resolution():
+    """Tests that hourly rollups are used until the range has more hours than the chart pixels."""
+
+    week_end = datetime.date(2023, 12, 7)
+
+    assert choose_rollup_resolution(datetime.date(2023, 12, 1), week_end) == "hour"
+    assert choose_rollup_resolution(datetime.date(2023, 10, 1), week_end) == "day"
+
+
+def test_range_chart_data_uses_rollups_then_readings(engine):
+    """Tests that rolled up hours come from the rollups and later readings are bucketed."""
+
+    with engine.begin() as conn:
+        insert_rollup(conn, 1, "hour", "2023-12-18 09:00:00", 40.0)
+        insert_rollup(conn, 1, "hour", "2023-12-18 10:00:00", 50.0)
+
+    with engine.connect() as conn:
+        rollups = get_rollups_from_db(conn, "hour", datetime.date(2023, 12, 17),
+                                      datetime.date(2023, 12, 18))
+
+    readings = make_readings(["2023-12-18 10:30", "2023-12-18 11:10", "2023-12-18 11:50"],
+                             [99.0, 60.0, 70.0])
+    readings = drop_rolled_up_readings(readings, rollups, "hour")
+
+    chart_data = get_range_chart_data(readings, rollups, "Soil Moisture", ["Venus flytrap"],
+                                      "hour")
+
+    assert chart_data["Time"].tolist() == [pd.Timestamp("2023-12-18 09:00"),
+                                           pd.Timestamp("2023-12-18 10:00"),
+                                           pd.Timestamp("2023-12-18 11:00")]
+    assert chart_data["Soil Moisture"].tolist() == [40.0, 50.0, 65.0]
+    assert chart_data["Min"].tolist() == [40.0, 50.0, 60.0]
+
+
+def test_drop_rolled_up_readings_per_plant():
+    """Tests that a plant's readings are only dropped in periods that plant has a rollup for."""
+
+    rollups = pd.DataFrame({"Plant Name": ["Venus flytrap"],
+                            "Time": [pd.Timestamp("2023-12-18 10:00")]})
+    readings = pd.concat([make_readings(["2023-12-18 10:30", "2023-12-18 11:10"], [1.0, 2.0]),
+                          make_readings(["2023-12-18 10:30"], [3.0], "Corpse flower")],
+                         ignore_index=True)
+
+    kept = drop_rolled_up_readings(readings, rollups, "hour")
+
+    assert kept["Soil Moisture"].tolist() == [2.0, 3.0]
+
+
+def test_get_rolled_up_dates_needs_every_archived_reading(engine):
+    """Tests that only days whose rollups count all their archived rows skip the archive."""
+
+    with engine.begin() as conn:
+        insert_rollup(conn, 1, "hour", "2023-12-17 09:00:00", 40.0)
+        insert_rollup(conn, 1, "hour", "2023-12-18 09:00:00", 40.0)
+        insert_rollup(conn, 2, "hour", "2023-12-18 10:00:00", 50.0)
+
+    with engine.connect() as conn:
+        rollups = get_rollups_from_db(conn, "hour", datetime.date(2023, 12, 16),
+                                      datetime.date(2023, 12, 18))
+
+    manifest = {"partitions": {"2023-12-16": [{"rows": 4}],
+                               "2023-12-17": [{"rows": 4}, {"rows": 2}],
+                               "2023-12-18": [{"rows": 8}]}}
+
+    assert list(get_rolled_up_dates(rollups, manifest)) == [pd.Timestamp("2023-12-18")]
+
+
+def test_is_full_reload_needed():
+    """Tests that a reload is only needed once loaded recordings have left the table."""
+
+    state = {**create_todays_data_state(), "first_recording_id": 5, "last_recording_id": 9}
+
+    assert not is_full_reload_needed(create_todays_data_state(), None, None)
+    assert not is_full_reload_needed(state, 5, 12)
+    assert is_full_reload_needed(state, 6, 12)
+    assert is_full_reload_needed(state, 5, 8)
+    assert is_full_reload_needed(state, None, None)
+
+
+def test_refresh_todays_data_appends_new_recordings(engine):
+    """Tests that a refresh only adds the recordings after the last one loaded."""
+
+    state = create_todays_data_state()
+
+    with engine.begin() as conn:
+        insert_recordings(conn, 1, range(9, 12))
+    with engine.connect() as conn:
+        first = refresh_todays_data(conn, state, 0.0)
+
+    with engine.begin() as conn:
+        insert_recordings(conn, 1, range(12, 14))
+    with engine.connect() as conn:
+        data = refresh_todays_data(conn, state, 1.0)
+
+    assert len(first) == 3
+    assert data["Recording ID"].tolist() == [1, 2, 3, 4, 5]
+    assert data["Plant Name"].tolist() == ["Venus flytrap"] * 5
+    assert (state["first_recording_id"], state["last_recording_id"]) == (1, 5)
+    assert state["dimensions_loaded_at"] == 0.0
+    assert data["date"].tolist() == [pd.Timestamp("2023-12-18")] * 5
+
+
+@pytest.mark.parametrize("removed_id", [1, 3], ids=["minimum_id_rises", "maximum_id_drops"])
+def test_refresh_todays_data_reloads_when_recordings_leave(engine, removed_id):
+    """Tests that everything is reloaded once a loaded recording is no longer in the table."""
+
+    state = create_todays_data_state()
+
+    with engine.begin() as conn:
+        insert_recordings(conn, 1, range(9, 12))
+    with engine.connect() as conn:
+        refresh_todays_data(conn, state, 0.0)
+
+    with engine.begin() as conn:
+        conn.execute(sql.text("DELETE FROM s_delta.recording WHERE recording_id = :id"),
+                     {"id": removed_id})
+    with engine.connect() as conn:
+        data = refresh_todays_data(conn, state, 1.0)
+
+    remaining = sorted({1, 2, 3} - {removed_id})
+    assert data["Recording ID"].tolist() == remaining
+    assert (state["first_recording_id"], state["last_recording_id"]) == (remaining[0],
+                                                                        remaining[-1])
+
+
+def test_refresh_todays_data_reloads_dimensions_for_new_plants(engine):
+    """Tests that the plants are reloaded within their TTL when an unknown plant id appears."""
+
+    state = create_todays_data_state()
+
+    with engine.begin() as conn:
+        insert_recordings(conn, 1, range(9, 10))
+    with engine.connect() as conn:
+        refresh_todays_data(conn, state, 0.0)
+
+    with engine.begin() as conn:
+        conn.execute(sql.text("INSERT INTO s_delta.plant VALUES (3, 'Snake plant', 1, 1)"))
+        insert_recordings(conn, 3, range(10, 11))
+        insert_recordings(conn, 1, range(10, 11))
+    with engine.connect() as conn:
+        data = refresh_todays_data(conn, state, 1.0)
+
+    assert data["Plant Name"].tolist() == ["Venus flytrap", "Snake plant", "Venus flytrap"]
+    assert 3 in state["dimensions"].index
+    assert state["dimensions_loaded_at"] == 1.0
+    assert isinstance(data["Plant Name"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,100 @@
+"""Unit tests for the dashboard's compact frame types."""
+
+import datetime
+import io
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from dashboard import ARCHIVE_BUCKET, ARCHIVE_COLUMNS, build_date_index, filter_by_date_range
+from frame_schema import add_day_keys, compact_frame, concat_frames
+
+
+def make_raw_readings(taken: list[str], plant_name: str, country: str) -> pd.DataFrame:
+    """Builds readings with the plain string and float64 columns read from a CSV."""
+
+    return pd.DataFrame({
+        "Recording Taken": pd.to_datetime(taken), "Last Watered": pd.to_datetime(taken),
+        "Soil Moisture": [50.5] * len(taken), "Temperature": [12.25] * len(taken),
+        "Plant Name": plant_name, "Botanist Name": "Carl Linnaeus", "Country": country})
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """Returns a client for an empty archive bucket in a local S3 stand-in."""
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-2")
+
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=ARCHIVE_BUCKET, CreateBucketConfiguration={
+            "LocationConstraint": "eu-west-2"})
+        yield client
+
+
+def test_compact_frame_types():
+    """Tests that dimensions become categoricals and readings float32."""
+
+    data = compact_frame(make_raw_readings(["2023-12-18 09:00"], "Venus flytrap", "Brazil"))
+
+    assert isinstance(data["Plant Name"].dtype, pd.CategoricalDtype)
+    assert isinstance(data["Country"].dtype, pd.CategoricalDtype)
+    assert data["Soil Moisture"].dtype == "float32"
+    assert data["Temperature"].dtype == "float32"
+
+
+def test_concat_frames_keeps_different_categories():
+    """Tests that frames with different categories concatenate into one categorical column."""
+
+    data = concat_frames([make_raw_readings(["2023-12-17 09:00"], "Venus flytrap", "Brazil"),
+                          make_raw_readings(["2023-12-18 09:00"], "Corpse flower", "Peru")])
+
+    assert isinstance(data["Plant Name"].dtype, pd.CategoricalDtype)
+    assert set(data["Plant Name"].cat.categories) == {"Venus flytrap", "Corpse flower"}
+    assert data["Plant Name"].tolist() == ["Venus flytrap", "Corpse flower"]
+    assert data["Soil Moisture"].dtype == "float32"
+
+
+def test_add_day_keys_types():
+    """Tests that the date and time of day are datetime64 and timedelta64 columns."""
+
+    data = add_day_keys(compact_frame(make_raw_readings(["2023-12-18 09:30"], "Venus flytrap",
+                                                        "Brazil")))
+
+    assert pd.api.types.is_datetime64_dtype(data["date"])
+    assert pd.api.types.is_timedelta64_dtype(data["time"])
+    assert data["date"].tolist() == [pd.Timestamp("2023-12-18")]
+    assert data["time"].tolist() == [pd.Timedelta(hours=9, minutes=30)]
+
+
+def test_filter_by_date_range_returns_same_rows(s3_client):
+    """Tests that the range holds the archived days in it and today's data, unchanged."""
+
+    today = datetime.date.today()
+    archived = {"2023-12-16": make_raw_readings(["2023-12-16 09:00"], "Venus flytrap", "Brazil"),
+                "2023-12-17": make_raw_readings(["2023-12-17 09:00", "2023-12-17 10:00"],
+                                                "Venus flytrap", "Brazil")}
+    manifest = {"partitions": {}}
+    for date, readings in archived.items():
+        key = f"lmnh_plant_data_archive/date={date}/test_frame_schema.parquet"
+        body = io.BytesIO()
+        readings.to_parquet(body)
+        s3_client.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=body.getvalue())
+        manifest["partitions"][date] = [{"key": key}]
+
+    todays = make_raw_readings([f"{today} 08:00"], "Corpse flower", "Peru")
+    current_data = add_day_keys(compact_frame(todays))
+
+    data = filter_by_date_range(datetime.date(2023, 12, 17), today, current_data, s3_client,
+                                manifest, build_date_index(manifest))
+
+    expected = pd.concat([archived["2023-12-17"], todays], ignore_index=True)
+    actual = data[ARCHIVE_COLUMNS].astype({"Plant Name": str, "Botanist Name": str,
+                                           "Country": str, "Soil Moisture": float,
+                                           "Temperature": float})
+    pd.testing.assert_frame_equal(actual, expected[ARCHIVE_COLUMNS])
+    assert data["date"].tolist() == [pd.Timestamp("2023-12-17")] * 2 + [pd.Timestamp(today)]
@@ -0,0 +1,268 @@
+"""
+Backfills historical recordings from the headerless CSV dumps, such as
+`lambda-load-old-data/data/lnhm_archive.csv` and the `tester/` files, whose
+rows are `recording_id, plant_id, soil_moisture, temperature, recording_taken,
+last_watered`.
+
+Each file is streamed in chunks of BACKFILL_CHUNK_ROWS rows, so it never has to
+fit in memory. Every chunk is validated with `clean_plant_data`, then loaded by
+a pool of worker processes, each with its own connection. On SQL Server a chunk
+is bulk copied into a temporary table and inserted with one statement; on the
+local SQLite backend it goes through the staged insert. Readings for unknown
+plants, or already in the table, are skipped, so a file can be loaded twice.
+
+The chunks each file has finished are checkpointed to BACKFILL_CHECKPOINT_FILE,
+so an interrupted backfill picks up where it stopped when run again.
+
+Run with `python3 backfill.py <csv file> [<csv file> ...] [--workers N] [--chunk-rows N]`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from os import environ, _Environ
+
+from dotenv import load_dotenv
+from sqlalchemy import sql, Connection
+import pandas as pd
+
+from transform import clean_plant_data
+from load import ENGINES, get_database_engine, execute_staged_insert
+
+BACKFILL_CHECKPOINT_FILE = './data/backfill_checkpoint.json'
+BACKFILL_CHUNK_ROWS = 50_000
+BACKFILL_WORKERS = 4
+BULK_COPY_BATCH_SIZE = 10_000
+
+CSV_COLUMNS = ["recording_id", "plant_id", "soil_moisture", "temperature",
+               "recording_taken", "last_watered"]
+TRANSFORM_COLUMNS = {"plant_id": "Id", "soil_moisture": "Soil Moisture",
+                     "temperature": "Temperature", "recording_taken": "Recording Taken",
+                     "last_watered": "Last Watered"}
+RECORDING_COLUMNS = ["plant_id", "soil_moisture", "temperature", "recording_taken",
+                     "last_watered"]
+
+BACKFILL_RECORDING_QUERY = """INSERT INTO s_delta.recording
+    (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+    SELECT staged.plant_id, staged.soil_moisture, staged.temperature,
+    staged.recording_taken, staged.last_watered FROM staged
+    JOIN s_delta.plant AS plant ON plant.plant_id = staged.plant_id
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording AS rec
+        WHERE rec.plant_id = staged.plant_id AND rec.recording_taken = staged.recording_taken)"""
+
+CREATE_BULK_TABLE_QUERY = """IF OBJECT_ID('tempdb..#recording_backfill') IS NULL
+    CREATE TABLE #recording_backfill (plant_id INT NOT NULL, soil_moisture FLOAT NOT NULL,
+        temperature FLOAT, recording_taken DATETIME NOT NULL, last_watered DATETIME NOT NULL)
+    ELSE TRUNCATE TABLE #recording_backfill"""
+
+BULK_RECORDING_QUERY = """INSERT INTO s_delta.recording
+    (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+    SELECT staged.plant_id, staged.soil_moisture, staged.temperature,
+    staged.recording_taken, staged.last_watered FROM #recording_backfill AS staged
+    JOIN s_delta.plant AS plant ON plant.plant_id = staged.plant_id
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording AS rec
+        WHERE rec.plant_id = staged.plant_id AND rec.recording_taken = staged.recording_taken)"""
+
+
+def load_checkpoint(filename: str = BACKFILL_CHECKPOINT_FILE) -> dict:
+    """Loads the chunks finished by previous backfills, or an empty checkpoint."""
+
+    try:
+        with open(filename, encoding='utf-8') as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoint(checkpoint: dict, filename: str = BACKFILL_CHECKPOINT_FILE) -> None:
+    """Saves the checkpoint, replacing the old file in one step so a crash can't corrupt it."""
+
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_filename, filename)
+
+
+def get_file_progress(checkpoint: dict, filename: str, chunk_rows: int) -> dict:
+    """
+    Returns the finished chunks of a file, starting again if it was
+    checkpointed with a different chunk size, since the chunks won't line up.
+    """
+
+    key = os.path.abspath(filename)
+
+    if checkpoint.get(key, {}).get("chunk_rows") != chunk_rows:
+        checkpoint[key] = {"chunk_rows": chunk_rows, "completed": []}
+
+    return checkpoint[key]
+
+
+def read_csv_chunks(filename: str, chunk_rows: int):
+    """Streams a headerless recordings dump in chunks of rows."""
+
+    return pd.read_csv(filename, header=None, names=CSV_COLUMNS, chunksize=chunk_rows)
+
+
+def clean_recordings(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validates a chunk of dumped recordings with the transform checks,
+    returning the valid ones with the recording table's column names.
+    """
+
+    plant_data = chunk.rename(columns=TRANSFORM_COLUMNS)
+    cleaned = clean_plant_data(plant_data, required_columns=list(TRANSFORM_COLUMNS.values()))
+
+    recordings = cleaned[list(TRANSFORM_COLUMNS.values())].set_axis(
+        list(TRANSFORM_COLUMNS), axis=1)
+    recordings["plant_id"] = recordings["plant_id"].astype(int)
+
+    return recordings.drop_duplicates(["plant_id", "recording_taken"])[RECORDING_COLUMNS]
+
+
+def bulk_copy_recordings(connection: Connection, recordings: pd.DataFrame) -> None:
+    """
+    Bulk copies the recordings into a session temporary table with pymssql's
+    `bulk_copy`, then inserts the new ones in a single statement.
+    """
+
+    connection.execute(sql.text(CREATE_BULK_TABLE_QUERY))
+
+    rows = [(plant_id, soil_moisture, temperature, recording_taken.to_pydatetime(),
+             last_watered.to_pydatetime())
+            for plant_id, soil_moisture, temperature, recording_taken, last_watered
+            in recordings.itertuples(index=False, name=None)]
+
+    connection.connection.dbapi_connection.bulk_copy(
+        "#recording_backfill", rows, batch_size=BULK_COPY_BATCH_SIZE, tablock=True)
+
+    connection.execute(sql.text(BULK_RECORDING_QUERY))
+
+
+def insert_recordings(connection: Connection, recordings: pd.DataFrame) -> None:
+    """Inserts the recordings with the fastest path the database has."""
+
+    if connection.dialect.name == "mssql":
+        bulk_copy_recordings(connection, recordings)
+    else:
+        execute_staged_insert(connection, BACKFILL_RECORDING_QUERY, recordings)
+
+    connection.commit()
+
+
+def reset_engines() -> None:
+    """
+    Drops engines inherited from the parent process, without closing
+    the parent's connections, so each worker opens its own.
+    """
+
+    for engine in ENGINES.values():
+        engine.dispose(close=False)
+    ENGINES.clear()
+
+
+def load_chunk(config: dict, chunk_number: int, chunk: pd.DataFrame) -> tuple[int, int, int]:
+    """Cleans and loads a chunk in a worker, returning its number, rows read and valid rows."""
+
+    recordings = clean_recordings(chunk)
+
+    if not recordings.empty:
+        with get_database_engine(config).connect() as connection:
+            insert_recordings(connection, recordings)
+
+    return chunk_number, len(chunk), len(recordings)
+
+
+def backfill_file(config: _Environ, filename: str, checkpoint: dict,
+                  executor: ProcessPoolExecutor, workers: int = BACKFILL_WORKERS,
+                  chunk_rows: int = BACKFILL_CHUNK_ROWS,
+                  checkpoint_file: str = BACKFILL_CHECKPOINT_FILE) -> dict:
+    """
+    Loads every chunk of a file not already in the checkpoint, keeping at most
+    two chunks per worker in flight, and checkpoints each one as it finishes.
+    If a chunk fails, no more are started, the chunks already in flight are
+    still checkpointed, and then the first error is raised.
+    Returns the rows read and the valid rows.
+    """
+
+    progress = get_file_progress(checkpoint, filename, chunk_rows)
+    completed = set(progress["completed"])
+    config = dict(config)
+    totals = {"rows_read": 0, "rows_valid": 0}
+    pending = set()
+    errors = []
+
+    def finish(done) -> None:
+        for future in done:
+            try:
+                chunk_number, rows_read, rows_valid = future.result()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                errors.append(error)
+                continue
+            totals["rows_read"] += rows_read
+            totals["rows_valid"] += rows_valid
+            progress["completed"].append(chunk_number)
+        save_checkpoint(checkpoint, checkpoint_file)
+
+    for chunk_number, chunk in enumerate(read_csv_chunks(filename, chunk_rows)):
+        if chunk_number in completed:
+            continue
+
+        if len(pending) >= workers * 2:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            finish(done)
+            if errors:
+                break
+
+        pending.add(executor.submit(load_chunk, config, chunk_number, chunk))
+
+    finish(wait(pending).done)
+
+    if errors:
+        raise errors[0]
+
+    return totals
+
+
+def backfill(config: _Environ, filenames: list[str], workers: int = BACKFILL_WORKERS,
+             chunk_rows: int = BACKFILL_CHUNK_ROWS,
+             checkpoint_file: str = BACKFILL_CHECKPOINT_FILE) -> dict:
+    """Backfills each file in turn across a pool of worker processes, logging its rows/sec."""
+
+    checkpoint = load_checkpoint(checkpoint_file)
+    totals = {"rows_read": 0, "rows_valid": 0}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=reset_engines) as executor:
+        for filename in filenames:
+            start = time.perf_counter()
+            file_totals = backfill_file(config, filename, checkpoint, executor, workers,
+                                        chunk_rows, checkpoint_file)
+            seconds = time.perf_counter() - start
+
+            logging.info("%s: read %d rows, %d valid, in %.1f s (%.0f rows/sec)",
+                         filename, file_totals["rows_read"], file_totals["rows_valid"],
+                         seconds, file_totals["rows_read"] / seconds if seconds else 0)
+
+            for key, value in file_totals.items():
+                totals[key] += value
+
+    return totals
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    parser = argparse.ArgumentParser(description="Backfill recordings from headerless CSV dumps")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=BACKFILL_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    backfill(environ, args.files, args.workers, args.chunk_rows,
+             environ.get("BACKFILL_CHECKPOINT_FILE", BACKFILL_CHECKPOINT_FILE))
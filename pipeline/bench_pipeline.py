@@ -0,0 +1,162 @@
+"""
+Benchmark suite for the extract, transform and load stages, run with pytest-benchmark.
+
+Every benchmark runs on synthetic plants from 50 up to 100k, apart from the
+API fetches and the row-by-row inserts, which stop at 1k because each plant
+costs a request or several round trips. The extract runs against the local
+fake API, with BENCHMARK_API_LATENCY seconds added to each response, and the
+inserts run against a fresh local SQLite database every round.
+
+Run with `bash benchmarks.sh` to compare against the stored baseline, failing on
+regressions, or `bash benchmarks.sh save` to store a new baseline.
+"""
+
+import asyncio
+from os import environ
+
+import pytest
+
+import extract
+from extract import flatten_and_organize_data, fetch_all_plant_data, fetch_all_plant_data_async
+from fake_plants_api import start_fake_plants_api, make_plant_json
+from transform import (remove_rows_with_null, check_soil_temp_valid, check_soil_moisture_valid,
+                       normalize_datetimes, change_temp_and_moisture_to_two_dp, clean_plant_data,
+                       standardize_country_names, REQUIRED_COLUMNS, COUNTRY_NAMES)
+from load import (insert_into_botanist_table, insert_into_location_table, insert_into_plant_table,
+                  insert_into_recordings_table, bulk_load_plant_data, cached_load_plant_data)
+from local_database import create_local_engine
+from dimension_cache import create_dimension_cache
+from benchmark_load import make_plant_data
+from benchmark_transform import make_raw_plant_data
+
+PLANT_COUNTS = [50, 1_000, 100_000]
+ROW_BY_ROW_PLANT_COUNTS = [50, 1_000]
+FETCH_PLANT_COUNTS = [50, 1_000]
+API_LATENCY = float(environ.get("BENCHMARK_API_LATENCY", 0))
+DATABASE_ROUNDS = 3
+
+
+@pytest.fixture(scope="module", params=FETCH_PLANT_COUNTS)
+def fake_api(request):
+    """Serves the given number of plants from the fake API for the module's benchmarks."""
+
+    server, url = start_fake_plants_api(plant_ids=range(request.param), latency=API_LATENCY)
+    yield request.param, url
+    server.shutdown()
+
+
+def test_fetch_all_plant_data(benchmark, fake_api, monkeypatch):
+    """Benchmarks the threaded extract of every plant."""
+
+    plant_count, url = fake_api
+    monkeypatch.setattr(extract, "API_URL", url)
+
+    plants = benchmark(fetch_all_plant_data, range(plant_count))
+
+    assert len(plants) == plant_count
+
+
+def test_fetch_all_plant_data_async(benchmark, fake_api):
+    """Benchmarks the async extract of every plant."""
+
+    plant_count, url = fake_api
+
+    plants = benchmark(lambda: asyncio.run(fetch_all_plant_data_async(
+        range(plant_count), api_url=url)))
+
+    assert len(plants) == plant_count
+
+
+def test_flatten_and_organize_data(benchmark):
+    """Benchmarks flattening a single plant's response."""
+
+    benchmark(flatten_and_organize_data, make_plant_json(1))
+
+
+@pytest.fixture(scope="module", params=PLANT_COUNTS)
+def raw_plant_data(request):
+    """Returns extracted plant data for the given number of plants."""
+
+    return make_raw_plant_data(request.param)
+
+
+@pytest.mark.parametrize("transform_function", [
+    lambda plants: remove_rows_with_null(plants, REQUIRED_COLUMNS),
+    check_soil_temp_valid,
+    check_soil_moisture_valid,
+    lambda plants: normalize_datetimes(plants.copy()),
+    lambda plants: change_temp_and_moisture_to_two_dp(plants.copy()),
+    clean_plant_data],
+    ids=["remove_rows_with_null", "check_soil_temp_valid", "check_soil_moisture_valid",
+         "normalize_datetimes", "change_temp_and_moisture_to_two_dp", "clean_plant_data"])
+def test_transform(benchmark, raw_plant_data, transform_function):
+    """Benchmarks each transform function on its own."""
+
+    benchmark(transform_function, raw_plant_data)
+
+
+def test_standardize_country_names(benchmark, raw_plant_data, monkeypatch):
+    """Benchmarks converting the country codes, once every code is cached."""
+
+    monkeypatch.setitem(COUNTRY_NAMES, "BR", "Brazil")
+    country_codes = raw_plant_data["Country"].map({"Brazil": "BR"})
+
+    benchmark(standardize_country_names, country_codes)
+
+
+def prepare_dimensions(connection, plant_data) -> None:
+    """Loads the botanists and locations a plant insert looks up."""
+
+    insert_into_botanist_table(connection, plant_data)
+    insert_into_location_table(connection, plant_data)
+
+
+def prepare_plants(connection, plant_data) -> None:
+    """Loads the botanists, locations and plants a recordings insert looks up."""
+
+    prepare_dimensions(connection, plant_data)
+    insert_into_plant_table(connection, plant_data)
+
+
+def benchmark_load(benchmark, load_function, plant_data, prepare=None) -> None:
+    """Benchmarks a load function against a fresh local database each round."""
+
+    def setup():
+        connection = create_local_engine().connect()
+        if prepare is not None:
+            prepare(connection, plant_data)
+        return (connection, plant_data), {}
+
+    def teardown(connection, *_):
+        connection.close()
+
+    benchmark.pedantic(load_function, setup=setup, teardown=teardown, rounds=DATABASE_ROUNDS)
+
+
+@pytest.mark.parametrize("plant_count", ROW_BY_ROW_PLANT_COUNTS)
+@pytest.mark.parametrize("load_function, prepare", [
+    (insert_into_botanist_table, None),
+    (insert_into_location_table, None),
+    (insert_into_plant_table, prepare_dimensions),
+    (insert_into_recordings_table, prepare_plants)],
+    ids=["insert_into_botanist_table", "insert_into_location_table", "insert_into_plant_table",
+         "insert_into_recordings_table"])
+def test_row_by_row_insert(benchmark, plant_count, load_function, prepare):
+    """Benchmarks each row-by-row insert function on its own."""
+
+    benchmark_load(benchmark, load_function, make_plant_data(plant_count, plant_count), prepare)
+
+
+@pytest.mark.parametrize("plant_count", PLANT_COUNTS)
+def test_bulk_load_plant_data(benchmark, plant_count):
+    """Benchmarks loading a cycle of new plants with the bulk load."""
+
+    benchmark_load(benchmark, bulk_load_plant_data, make_plant_data(plant_count, plant_count))
+
+
+@pytest.mark.parametrize("plant_count", PLANT_COUNTS)
+def test_cached_load_plant_data(benchmark, plant_count):
+    """Benchmarks loading a cycle of new plants with the dimension cache, as the pipeline does."""
+
+    benchmark_load(benchmark, lambda connection, plant_data: cached_load_plant_data(
+        connection, plant_data, create_dimension_cache()), make_plant_data(plant_count, plant_count))
@@ -0,0 +1,75 @@
+"""
+Benchmarks the row-by-row insert functions against the bulk load path
+on the local SQLite stand-in for the database.
+
+Run with `python3 benchmark_load.py [row count]`.
+"""
+
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import event
+
+from load import (insert_into_botanist_table, insert_into_location_table, insert_into_plant_table,
+                  insert_into_recordings_table, bulk_load_plant_data)
+from local_database import create_local_engine
+
+DEFAULT_ROW_COUNT = 10_000
+PLANT_COUNT = 500
+
+
+def make_plant_data(row_count: int, plant_count: int = PLANT_COUNT) -> pd.DataFrame:
+    """Builds `row_count` cleaned recordings spread across `plant_count` plants."""
+
+    rows = [{"Id": str(row % plant_count + 1), "Name": f"Plant {row % plant_count}",
+             "Last Watered": pd.Timestamp("2023-12-19 14:03:04"),
+             "Recording Taken": pd.Timestamp("2023-12-19 15:02:35") + pd.Timedelta(
+                 seconds=row // plant_count),
+             "Soil Moisture": 50 + row % 40, "Temperature": 10 + row % 15,
+             "Botanist Name": f"Botanist {row % 12}",
+             "Botanist Email": f"botanist.{row % 12}@lnhm.co.uk",
+             "Botanist Phone": "(146)994-1635x35992",
+             "Region": f"Region {row % plant_count % 90}", "Continent": "America",
+             "Country": "Brazil"}
+            for row in range(row_count)]
+
+    return pd.DataFrame(rows)
+
+
+def row_by_row_load(connection, plant_data: pd.DataFrame) -> None:
+    """Loads the data with the original per-row insert functions."""
+
+    insert_into_botanist_table(connection, plant_data)
+    insert_into_location_table(connection, plant_data)
+    insert_into_plant_table(connection, plant_data)
+    insert_into_recordings_table(connection, plant_data)
+
+
+def time_load(load_function, plant_data: pd.DataFrame) -> tuple[float, int]:
+    """Returns the seconds taken and statements sent to load the data into a fresh database."""
+
+    engine = create_local_engine()
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda *args: statements.append(args[2]))
+
+    with engine.connect() as connection:
+        start = time.perf_counter()
+        load_function(connection, plant_data)
+        elapsed = time.perf_counter() - start
+
+    engine.dispose()
+
+    return elapsed, len(statements)
+
+
+if __name__ == "__main__":
+
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROW_COUNT
+    data = make_plant_data(row_count)
+
+    for name, function in [("row by row", row_by_row_load), ("bulk", bulk_load_plant_data)]:
+        seconds, statement_count = time_load(function, data)
+        print(f"{name:>10}: {row_count} rows in {seconds:.3f} seconds, "
+              f"{statement_count} statements")
@@ -0,0 +1,181 @@
+"""
+Benchmarks the hot queries' plans before and after the hot query indexes.
+
+Resets the database to schema.sql, drops the indexes added by
+`database/migrations/002_hot_query_indexes.sql`, and seeds a reading a minute
+for every plant over the given number of days. Each query's estimated plan
+(operators, indexes used and estimated cost) and median run time are then
+reported, the migration is applied and they are reported again.
+
+Only run this against a local SQL Server container, for example
+`docker run -e ACCEPT_EULA=Y -e MSSQL_SA_PASSWORD=<password> -p 1433:1433
+mcr.microsoft.com/mssql/server:2022-latest`, with the plants database and
+s_delta schema created and DB_HOST set to localhost.
+
+Run with `python3 benchmark_query_plans.py [days]`.
+"""
+
+import re
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+from os import environ, path
+
+from dotenv import load_dotenv
+from sqlalchemy import sql, Connection
+
+from benchmark_load import make_plant_data
+from load import create_database_connection, bulk_load_plant_data
+from rollups import PERIOD_RECORDINGS_QUERY
+
+DEFAULT_DAYS = 7
+PLANT_COUNT = 50
+FIRST_DAY = "2023-12-01"
+TIMED_RUNS = 5
+LOCAL_HOSTS = ["localhost", "127.0.0.1"]
+
+DATABASE_DIR = path.join(path.dirname(path.abspath(__file__)), "database")
+SHOWPLAN_NAMESPACE = {"plan": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+
+DROP_HOT_QUERY_INDEXES = """DROP INDEX IF EXISTS ix_recording_taken_plant ON s_delta.recording;
+DROP INDEX IF EXISTS ix_plant_botanist ON s_delta.plant;
+DROP INDEX IF EXISTS ix_plant_location ON s_delta.plant;"""
+
+SEED_RECORDINGS_QUERY = sql.text("""INSERT INTO s_delta.recording
+    (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+    SELECT plant.plant_id, 20 + (minutes.n + plant.plant_id) % 60, 10 + (minutes.n % 15),
+    DATEADD(MINUTE, minutes.n, CAST(:first_day AS DATETIME)), CAST(:first_day AS DATETIME)
+    FROM s_delta.plant AS plant
+    CROSS JOIN (SELECT TOP (:minutes) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS n
+                FROM sys.all_objects AS a CROSS JOIN sys.all_objects AS b) AS minutes""")
+
+# The transfer and dashboard queries, as in transfer_old_data.py and dashboard.py
+HOT_QUERIES = {
+    "rollup hour": (PERIOD_RECORDINGS_QUERY, {"period_start": "2023-12-02 15:00:00",
+                                              "period_end": "2023-12-02 16:00:00"}),
+    "transfer chunk": (sql.text(
+        """SELECT TOP (:chunk_size) rec.recording_id, rec.soil_moisture, rec.temperature,
+        rec.recording_taken, rec.last_watered, plant.name AS plant_name, bot.name, bot.email,
+        bot.telephone_number, loc.region, loc.country, loc.continent
+        FROM s_delta.recording AS rec
+        JOIN s_delta.plant AS plant ON rec.plant_id = plant.plant_id
+        JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
+        JOIN s_delta.location AS loc ON plant.location_id = loc.location_id
+        WHERE rec.recording_id > :last_recording_id ORDER BY rec.recording_id"""),
+        {"chunk_size": 10_000, "last_recording_id": 0}),
+    "dashboard dimensions": (sql.text(
+        """SELECT plant.plant_id, plant.name AS plant_name, bot.name, bot.email,
+        bot.telephone_number, loc.region, loc.country, loc.continent
+        FROM s_delta.plant AS plant
+        JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
+        JOIN s_delta.location AS loc ON plant.location_id = loc.location_id"""), {}),
+    "dashboard new recordings": (sql.text(
+        """SELECT recording_id, plant_id, soil_moisture, temperature, recording_taken,
+        last_watered FROM s_delta.recording
+        WHERE recording_id > :last_recording_id ORDER BY recording_id"""),
+        {"last_recording_id": 0}),
+    "day range": (sql.text(
+        """SELECT plant_id, soil_moisture, temperature, recording_taken FROM s_delta.recording
+        WHERE recording_taken >= :day AND recording_taken < DATEADD(DAY, 1, :day)"""),
+        {"day": "2023-12-02"}),
+    "plant lookup": (sql.text("SELECT plant_id FROM s_delta.plant WHERE name = (:name)"),
+                     {"name": "Plant 7"}),
+    "botanist lookup": (sql.text("SELECT botanist_id FROM s_delta.botanist WHERE email = (:email)"),
+                        {"email": "botanist.7@lnhm.co.uk"}),
+    "duplicate check": (sql.text(
+        """SELECT 1 FROM s_delta.recording
+        WHERE plant_id = :plant_id AND recording_taken = :recording_taken"""),
+        {"plant_id": 8, "recording_taken": "2023-12-02 15:00:00"})}
+
+
+def run_sql_script(connection: Connection, filename: str) -> None:
+    """Runs a sqlcmd script, one `GO` separated batch at a time."""
+
+    with open(filename, encoding="utf-8") as script_file:
+        batches = re.split(r"^\s*GO\s*$", script_file.read(), flags=re.MULTILINE)
+
+    for batch in batches:
+        if batch.strip():
+            connection.exec_driver_sql(batch)
+
+    connection.commit()
+
+
+def seed_database(connection: Connection, days: int) -> None:
+    """Loads the plants' dimensions, then a reading a minute for each plant over the days."""
+
+    bulk_load_plant_data(connection, make_plant_data(PLANT_COUNT, PLANT_COUNT))
+
+    connection.execute(SEED_RECORDINGS_QUERY, {"first_day": FIRST_DAY, "minutes": days * 1440})
+    connection.commit()
+
+
+def get_estimated_plan(connection: Connection, query, params: dict) -> dict:
+    """Returns the operators, indexes and estimated cost of the query's plan."""
+
+    connection.exec_driver_sql("SET SHOWPLAN_XML ON")
+    try:
+        plan = ET.fromstring(connection.execute(query, params).scalar())
+    finally:
+        connection.exec_driver_sql("SET SHOWPLAN_XML OFF")
+
+    statement = plan.find(".//plan:StmtSimple", SHOWPLAN_NAMESPACE)
+    operators = [operator.get("PhysicalOp")
+                 for operator in plan.iterfind(".//plan:RelOp", SHOWPLAN_NAMESPACE)]
+    indexes = sorted({obj.get("Index").strip("[]")
+                      for obj in plan.iterfind(".//plan:Object", SHOWPLAN_NAMESPACE)
+                      if obj.get("Index")})
+
+    return {"cost": float(statement.get("StatementSubTreeCost")),
+            "operators": operators, "indexes": indexes}
+
+
+def time_query(connection: Connection, query, params: dict) -> float:
+    """Returns the median seconds taken to run the query and fetch every row."""
+
+    times = []
+    for _ in range(TIMED_RUNS):
+        start = time.perf_counter()
+        connection.execute(query, params).fetchall()
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def report_plans(connection: Connection, label: str) -> None:
+    """Prints each hot query's plan and run time."""
+
+    print(f"\n{label}")
+    for name, (query, params) in HOT_QUERIES.items():
+        plan = get_estimated_plan(connection, query, params)
+        seconds = time_query(connection, query, params)
+        print(f"{name:>24}: cost {plan['cost']:8.3f}, {seconds * 1000:8.1f} ms, "
+              f"{' > '.join(plan['operators'])} using {', '.join(plan['indexes'])}")
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+
+    if environ["DB_HOST"] not in LOCAL_HOSTS:
+        sys.exit("This resets the database, only point it at a local SQL Server.")
+
+    args = sys.argv[1:]
+    day_count = int(args[0]) if args and not args[0].startswith("--") else DEFAULT_DAYS
+
+    conn = create_database_connection(environ)
+
+    run_sql_script(conn, path.join(DATABASE_DIR, "schema.sql"))
+    conn.exec_driver_sql(DROP_HOT_QUERY_INDEXES)
+    conn.commit()
+
+    seed_database(conn, day_count)
+    print(f"Seeded {day_count} days of readings for {PLANT_COUNT} plants")
+
+    report_plans(conn, "Before the hot query indexes")
+
+    run_sql_script(conn, path.join(DATABASE_DIR, "migrations", "002_hot_query_indexes.sql"))
+    report_plans(conn, "After the hot query indexes")
+
+    conn.close()
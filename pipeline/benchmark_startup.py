@@ -0,0 +1,175 @@
+"""
+Times how long the pipeline's modules take to import, with `python -X importtime`,
+and fails if any has got slower than the stored baseline.
+
+Each module is imported in a fresh interpreter STARTUP_RUNS times and the median
+cumulative import time is compared with the `startup_baseline.json` saved on
+the same kind of machine. Baselines are kept per machine id under
+`benchmark_baselines`, as pytest-benchmark keeps its own, and a machine without
+one is only checked for deferred imports. It also fails if a module loads one
+of its deferred dependencies at import time, which is what usually makes
+startup slow again.
+
+Run with `python3 benchmark_startup.py [--save] [--runs N]`. Other services gate
+their own modules by calling `run_startup_gate` with their deferred imports and
+directory, which holds their baselines.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_DIR_NAME = 'benchmark_baselines'
+STARTUP_BASELINE_NAME = 'startup_baseline.json'
+STARTUP_RUNS = 7
+STARTUP_MAX_REGRESSION = 50
+# Imports of a few milliseconds vary by more than half between runs
+STARTUP_MIN_REGRESSION_US = 5_000
+
+# The heavy dependencies each module must only import when they're first used
+DEFERRED_IMPORTS = {
+    "pipeline": ["pandas", "sqlalchemy", "requests", "aiohttp", "dotenv", "country_converter"],
+    "instrumentation": ["sqlalchemy"],
+    "extract": ["pandas", "requests"],
+    "transform": ["country_converter"]}
+
+
+def get_machine_id() -> str:
+    """Returns the machine id pytest-benchmark keeps its baselines under."""
+
+    python_version = ".".join(platform.python_version_tuple()[:2])
+
+    return (f"{platform.system()}-{platform.python_implementation()}-{python_version}"
+            f"-{platform.architecture()[0]}")
+
+
+def get_baseline_file(directory: str = PIPELINE_DIR) -> str:
+    """Returns the path of the directory's startup baseline for this machine."""
+
+    return os.path.join(directory, BASELINES_DIR_NAME, get_machine_id(), STARTUP_BASELINE_NAME)
+
+
+def parse_import_times(importtime_output: str) -> dict[str, int]:
+    """Returns the cumulative import time in microseconds of every module in the output."""
+
+    import_times = {}
+
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        import_times[module.strip()] = int(cumulative)
+
+    return import_times
+
+
+def time_import(module: str, directory: str = PIPELINE_DIR) -> dict[str, int]:
+    """Imports the module in a fresh interpreter, returning the import times of all it loaded."""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=directory, capture_output=True, text=True, check=True)
+
+    return parse_import_times(result.stderr)
+
+
+def measure_startup(runs: int = STARTUP_RUNS,
+                    deferred_imports: dict[str, list[str]] | None = None,
+                    directory: str = PIPELINE_DIR) -> tuple[dict[str, int], dict[str, list[str]]]:
+    """
+    Returns each module's median import time in microseconds, and
+    any deferred dependencies it loaded.
+    """
+
+    medians = {}
+    eager_imports = {}
+
+    for module, deferred in (deferred_imports or DEFERRED_IMPORTS).items():
+        timings = [time_import(module, directory) for _ in range(runs)]
+        medians[module] = int(statistics.median(timing[module] for timing in timings))
+        eager_imports[module] = [name for name in deferred if name in timings[0]]
+
+    return medians, eager_imports
+
+
+def find_regressions(medians: dict[str, int], baseline: dict[str, int],
+                     max_regression: float = STARTUP_MAX_REGRESSION,
+                     min_regression_us: int = STARTUP_MIN_REGRESSION_US) -> list[str]:
+    """
+    Returns the modules importing more than max_regression percent, and more
+    than min_regression_us microseconds, slower than the baseline.
+    """
+
+    return [module for module, median in medians.items()
+            if module in baseline
+            and median > baseline[module] * (1 + max_regression / 100)
+            and median - baseline[module] > min_regression_us]
+
+
+def load_baseline(filename: str) -> dict[str, int]:
+    """Loads the stored import times, or an empty baseline."""
+
+    try:
+        with open(filename, encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(medians: dict[str, int], filename: str) -> None:
+    """Saves the import times as the new baseline."""
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    with open(filename, 'w', encoding='utf-8') as baseline_file:
+        json.dump(medians, baseline_file, indent=4)
+        baseline_file.write("\n")
+
+
+def run_startup_gate(deferred_imports: dict[str, list[str]], directory: str,
+                     description: str) -> int:
+    """
+    Times the modules in the directory against its baseline, printing any failures.
+    Returns the exit code, 1 if any module failed the gate.
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--save", action="store_true", help="store the times as the new baseline")
+    parser.add_argument("--runs", type=int, default=STARTUP_RUNS)
+    args = parser.parse_args()
+
+    baseline_file = get_baseline_file(directory)
+    medians, eager_imports = measure_startup(args.runs, deferred_imports, directory)
+    baseline = load_baseline(baseline_file)
+
+    if not baseline and not args.save:
+        print(f"No startup baseline for {get_machine_id()}, save one with --save")
+
+    for module, median in medians.items():
+        print(f"{module:<18} {median / 1000:8.1f} ms"
+              f" (baseline {baseline.get(module, 0) / 1000:.1f} ms)")
+
+    failures = [f"{module} imports {', '.join(names)} at startup"
+                for module, names in eager_imports.items() if names]
+
+    max_percent = float(os.environ.get("STARTUP_MAX_REGRESSION", STARTUP_MAX_REGRESSION))
+
+    if args.save:
+        save_baseline(medians, baseline_file)
+    else:
+        failures += [f"{module} imports more than {max_percent:g}% slower than the baseline"
+                     for module in find_regressions(medians, baseline, max_percent)]
+
+    for failure in failures:
+        print(failure)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(run_startup_gate(DEFERRED_IMPORTS, PIPELINE_DIR, "Gate the pipeline's import times"))
@@ -0,0 +1,81 @@
+"""
+Benchmarks the chained transform functions against the fused clean_plant_data.
+
+Run with `python3 benchmark_transform.py [row count ...]`.
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from transform import (REQUIRED_COLUMNS, remove_rows_with_null, check_soil_moisture_valid,
+                       check_soil_temp_valid, normalize_datetimes,
+                       change_temp_and_moisture_to_two_dp, clean_plant_data)
+
+DEFAULT_ROW_COUNTS = [50, 10_000, 1_000_000]
+
+
+def make_raw_plant_data(row_count: int, seed: int = 0) -> pd.DataFrame:
+    """Builds extracted plant data where roughly a tenth of the rows are invalid."""
+
+    rng = np.random.default_rng(seed)
+    plant_ids = np.arange(row_count) % 50
+
+    data = pd.DataFrame({
+        "Id": (plant_ids + 1).astype(str),
+        "Name": pd.Series(plant_ids).map("Plant {}".format),
+        "Last Watered": "Mon, 18 Dec 2023 14:03:04 GMT",
+        "Recording Taken": (pd.Timestamp("2023-12-18") + pd.to_timedelta(
+            np.arange(row_count), unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "Soil Moisture": rng.uniform(-5, 105, row_count),
+        "Temperature": rng.uniform(-2, 32, row_count),
+        "Botanist Name": "Carl Linnaeus",
+        "Botanist Email": "carl.linnaeus@lnhm.co.uk",
+        "Botanist Phone": "(146)994-1635x35992",
+        "Region": "Resplendor", "Continent": "America", "Country": "Brazil"})
+
+    data.loc[rng.random(row_count) < 0.01, "Botanist Email"] = None
+
+    return data
+
+
+def chained_transform(plants: pd.DataFrame) -> pd.DataFrame:
+    """Runs the transform steps one after another, as the pipeline used to."""
+
+    plants = remove_rows_with_null(plants, REQUIRED_COLUMNS)
+    plants = check_soil_moisture_valid(plants)
+    plants = check_soil_temp_valid(plants)
+    plants = normalize_datetimes(plants.copy())
+    plants = change_temp_and_moisture_to_two_dp(plants)
+
+    return plants
+
+
+def time_transform(transform_function, plants: pd.DataFrame, repeats: int) -> float:
+    """Returns the best time in seconds of `repeats` runs of the transform."""
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        transform_function(plants)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+if __name__ == "__main__":
+
+    row_counts = [int(count) for count in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+
+    for row_count in row_counts:
+        raw_plants = make_raw_plant_data(row_count)
+        runs = 3 if row_count > 100_000 else 20
+
+        chained_seconds = time_transform(chained_transform, raw_plants, runs)
+        fused_seconds = time_transform(clean_plant_data, raw_plants, runs)
+
+        print(f"{row_count:>9} rows: chained {chained_seconds * 1000:9.2f} ms, "
+              f"fused {fused_seconds * 1000:9.2f} ms, "
+              f"{chained_seconds / fused_seconds:.1f}x")
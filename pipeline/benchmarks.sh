@@ -0,0 +1,10 @@
+# Compares the benchmarks with the stored baseline, failing if any is more than
+# BENCHMARK_MAX_REGRESSION percent (50 by default) slower, then gates the import times
+# with benchmark_startup.py. `save` stores new baselines for both.
+if [ "$1" == "save" ]; then
+    python3 benchmark_startup.py --save
+    python3 -m pytest bench_pipeline.py --benchmark-storage=file://./benchmark_baselines --benchmark-disable-gc --benchmark-warmup=on --benchmark-save=baseline
+else
+    python3 -m pytest bench_pipeline.py --benchmark-storage=file://./benchmark_baselines --benchmark-disable-gc --benchmark-warmup=on --benchmark-compare \
+        --benchmark-compare-fail=median:${BENCHMARK_MAX_REGRESSION:-50}% && python3 benchmark_startup.py
+fi
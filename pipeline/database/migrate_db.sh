@@ -0,0 +1,4 @@
+source .env
+for migration in migrations/*.sql; do
+    sqlcmd -S $DB_HOST,$DB_PORT -U $DB_USERNAME -P $DB_PASSWORD -i $migration
+done
@@ -0,0 +1,17 @@
+USE plants;
+GO
+
+-- Keeps the first copy of any reading loaded more than once, then adds the
+-- unique natural key that stops it happening again.
+WITH duplicates AS (
+    SELECT recording_id, ROW_NUMBER() OVER (
+        PARTITION BY plant_id, recording_taken ORDER BY recording_id) AS copy_number
+    FROM s_delta.recording
+)
+DELETE FROM duplicates WHERE copy_number > 1;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.key_constraints WHERE name = N'uq_recording_plant_taken')
+ALTER TABLE s_delta.recording
+ADD CONSTRAINT uq_recording_plant_taken UNIQUE (plant_id, recording_taken);
+GO
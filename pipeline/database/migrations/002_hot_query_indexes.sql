@@ -0,0 +1,20 @@
+USE plants;
+GO
+
+-- Hour, day and transfer scans filter on recording_taken, and read every
+-- reading column, so they are answered from this index alone.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'ix_recording_taken_plant')
+CREATE INDEX ix_recording_taken_plant ON s_delta.recording (recording_taken, plant_id)
+    INCLUDE (soil_moisture, temperature, last_watered);
+GO
+
+-- The plant to botanist and plant to location joins. The name, email and region
+-- lookups are already served by their UNIQUE constraints' indexes, and
+-- recording's plant_id by uq_recording_plant_taken.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'ix_plant_botanist')
+CREATE INDEX ix_plant_botanist ON s_delta.plant (botanist_id) INCLUDE (name, location_id);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'ix_plant_location')
+CREATE INDEX ix_plant_location ON s_delta.plant (location_id) INCLUDE (name, botanist_id);
+GO
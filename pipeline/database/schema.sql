@@ -1,6 +1,10 @@
 USE plants;
 GO
 
+IF OBJECT_ID(N's_delta.recording_rollup', N'U') IS NOT NULL
+DROP TABLE s_delta.recording_rollup;
+GO
+
 IF OBJECT_ID(N's_delta.recording', N'U') IS NOT NULL
 DROP TABLE s_delta.recording;
 GO
@@ -50,6 +54,32 @@ CREATE TABLE s_delta.recording(
     temperature FLOAT,
     recording_taken DATETIME NOT NULL,
     last_watered DATETIME NOT NULL,
-    FOREIGN KEY (plant_id) REFERENCES s_delta.plant (plant_id) ON DELETE CASCADE
+    FOREIGN KEY (plant_id) REFERENCES s_delta.plant (plant_id) ON DELETE CASCADE,
+    CONSTRAINT uq_recording_plant_taken UNIQUE (plant_id, recording_taken)
+);
+GO
+
+CREATE INDEX ix_recording_taken_plant ON s_delta.recording (recording_taken, plant_id)
+    INCLUDE (soil_moisture, temperature, last_watered);
+GO
+
+CREATE INDEX ix_plant_botanist ON s_delta.plant (botanist_id) INCLUDE (name, location_id);
+GO
+
+CREATE INDEX ix_plant_location ON s_delta.plant (location_id) INCLUDE (name, botanist_id);
+GO
+
+CREATE TABLE s_delta.recording_rollup(
+    plant_id INT NOT NULL,
+    resolution VARCHAR(4) NOT NULL,
+    period_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    soil_moisture_mean FLOAT,
+    soil_moisture_min FLOAT,
+    soil_moisture_max FLOAT,
+    temperature_mean FLOAT,
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    PRIMARY KEY (plant_id, resolution, period_start)
 );
 GO
@@ -0,0 +1,73 @@
+"""
+In-process cache of botanist, location and plant ids, keyed on the natural
+keys the load uses (botanist email, location region and plant name).
+"""
+
+import time
+
+from sqlalchemy import sql, Connection
+
+DIMENSION_CACHE_TTL = 3600
+
+DIMENSION_QUERIES = {
+    "botanist": sql.text("SELECT email, botanist_id FROM s_delta.botanist"),
+    "location": sql.text("SELECT region, location_id FROM s_delta.location"),
+    "plant": sql.text("SELECT name, plant_id FROM s_delta.plant")}
+
+
+def create_dimension_cache(ttl: float = DIMENSION_CACHE_TTL) -> dict:
+    """Returns an empty cache that expires `ttl` seconds after it is warmed."""
+
+    return {"ttl": ttl, "loaded_at": None,
+            "ids": {table: {} for table in DIMENSION_QUERIES},
+            "hits": {table: 0 for table in DIMENSION_QUERIES},
+            "misses": {table: 0 for table in DIMENSION_QUERIES}}
+
+
+def warm_dimension_cache(connection: Connection, cache: dict) -> None:
+    """Loads every dimension id with one SELECT per table."""
+
+    for table, query in DIMENSION_QUERIES.items():
+        cache["ids"][table] = dict(connection.execute(query).fetchall())
+
+    cache["loaded_at"] = time.monotonic()
+
+
+def invalidate_dimension_cache(cache: dict) -> None:
+    """Drops all cached ids so the next load re-warms the cache."""
+
+    cache["ids"] = {table: {} for table in DIMENSION_QUERIES}
+    cache["loaded_at"] = None
+
+
+def is_dimension_cache_stale(cache: dict) -> bool:
+    """Returns True if the cache has never been warmed or has outlived its TTL."""
+
+    return cache["loaded_at"] is None or time.monotonic() - cache["loaded_at"] > cache["ttl"]
+
+
+def get_dimension_id(cache: dict, table: str, key: str) -> int | None:
+    """Returns the cached id for a natural key, counting the hit or miss."""
+
+    dimension_id = cache["ids"][table].get(key)
+
+    if dimension_id is None:
+        cache["misses"][table] += 1
+    else:
+        cache["hits"][table] += 1
+
+    return dimension_id
+
+
+def set_dimension_id(cache: dict, table: str, key: str, dimension_id: int) -> None:
+    """Records the id of a newly inserted dimension row."""
+
+    cache["ids"][table][key] = dimension_id
+
+
+def get_dimension_cache_stats(cache: dict) -> dict:
+    """Returns the size, hits and misses of each cached table."""
+
+    return {table: {"size": len(cache["ids"][table]), "hits": cache["hits"][table],
+                    "misses": cache["misses"][table]}
+            for table in DIMENSION_QUERIES}
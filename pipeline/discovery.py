@@ -0,0 +1,139 @@
+"""
+Plant ID discovery, so each cycle only requests plants that exist.
+
+The state remembers the live plant ids, the highest id seen so far and any
+known-dead ids. Only ids the API says don't exist are marked dead; an id that
+times out or errors stays live. Dead ids are re-probed on an exponential
+backoff in case the sensor comes back. Every cycle also probes a window beyond
+the highest known id and keeps extending it until `max_consecutive_misses` ids
+in a row are missing. That way new plants are picked up without a hard-coded
+plant count.
+"""
+
+import json
+import os
+
+DISCOVERY_STATE_FILE = './data/plant_discovery.json'
+MAX_CONSECUTIVE_MISSES = 10
+MAX_REPROBE_INTERVAL = 64
+
+# What a fetch found for each requested id
+PLANT_FOUND = "found"
+PLANT_NOT_FOUND = "not_found"
+PLANT_FAILED = "failed"
+
+
+def create_discovery_state() -> dict:
+    """Returns the state for a pipeline that has never seen any plants."""
+
+    return {"cycle": 0, "known_max": -1, "live": [], "dead": {}}
+
+
+def load_discovery_state(filename: str = DISCOVERY_STATE_FILE) -> dict:
+    """Loads the discovery state saved by the previous cycle, or a fresh state."""
+
+    try:
+        with open(filename, encoding='utf-8') as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return create_discovery_state()
+
+
+def save_discovery_state(state: dict, filename: str = DISCOVERY_STATE_FILE) -> None:
+    """Saves the discovery state, replacing the old file in one step so a crash can't corrupt it."""
+
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file)
+    os.replace(temp_filename, filename)
+
+
+def get_probe_window(state: dict,
+                     max_consecutive_misses: int = MAX_CONSECUTIVE_MISSES) -> list[int]:
+    """Returns the ids just beyond the highest known plant id."""
+
+    first_id = state["known_max"] + 1
+
+    return list(range(first_id, first_id + max_consecutive_misses))
+
+
+def get_plant_ids_to_fetch(state: dict,
+                           max_consecutive_misses: int = MAX_CONSECUTIVE_MISSES) -> list[int]:
+    """Returns the live ids, the dead ids due a re-probe, and the probe window."""
+
+    due_dead_ids = [int(plant_id) for plant_id, dead in state["dead"].items()
+                    if dead["next_probe"] <= state["cycle"]]
+
+    plant_ids = set(state["live"]) | set(due_dead_ids) | set(
+        get_probe_window(state, max_consecutive_misses))
+
+    return sorted(plant_ids)
+
+
+def get_plant_id(plant: dict) -> int:
+    """Returns the API plant id for a flattened plant (whose "Id" is shifted by one)."""
+
+    return int(plant["Id"]) - 1
+
+
+def update_discovery_state(state: dict, results: dict[int, str],
+                           max_reprobe_interval: int = MAX_REPROBE_INTERVAL) -> None:
+    """
+    Records what each requested id returned. Ids the API says don't exist, at
+    or below the highest known id, are marked dead and backed off; above it
+    they're just the end of the probe window. Failed ids are left as they were,
+    so a timeout or outage doesn't drop a live plant.
+    """
+
+    found_ids = [plant_id for plant_id, result in results.items() if result == PLANT_FOUND]
+    state["known_max"] = max([state["known_max"], *found_ids])
+
+    live_ids = set(state["live"])
+
+    for plant_id, result in results.items():
+        if result == PLANT_FOUND:
+            live_ids.add(plant_id)
+            state["dead"].pop(str(plant_id), None)
+
+        elif result == PLANT_NOT_FOUND and plant_id <= state["known_max"]:
+            live_ids.discard(plant_id)
+            dead = state["dead"].get(str(plant_id), {"misses": 0})
+            misses = dead["misses"] + 1
+            state["dead"][str(plant_id)] = {
+                "misses": misses,
+                "next_probe": state["cycle"] + min(2 ** (misses - 1), max_reprobe_interval)}
+
+    state["live"] = sorted(live_ids)
+    state["cycle"] += 1
+
+
+def discover_and_fetch(state: dict, fetch,
+                       max_consecutive_misses: int = MAX_CONSECUTIVE_MISSES) -> list[dict]:
+    """
+    Fetches this cycle's plants with `fetch`, a function that takes a list of
+    plant ids and a dict to record each id's result in, and returns their
+    flattened plant dicts. Keeps probing further ids while new plants turn up,
+    then records the results in the state.
+    """
+
+    results = {}
+    requested_ids = get_plant_ids_to_fetch(state, max_consecutive_misses)
+    plant_data = fetch(requested_ids, results)
+
+    highest_id = max([state["known_max"], *map(get_plant_id, plant_data)])
+    next_id = max(requested_ids) + 1
+
+    while next_id <= highest_id + max_consecutive_misses:
+        probe_ids = list(range(next_id, highest_id + max_consecutive_misses + 1))
+        probe_data = fetch(probe_ids, results)
+
+        plant_data.extend(probe_data)
+
+        highest_id = max([highest_id, *map(get_plant_id, probe_data)])
+        next_id = probe_ids[-1] + 1
+
+    update_discovery_state(state, results)
+
+    return sorted(plant_data, key=get_plant_id)
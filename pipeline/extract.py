@@ -1,19 +1,34 @@
 """Extract script that pulls all plant data from the API."""
 import os
+import asyncio
 import concurrent.futures
+import contextvars
+import json
+import logging
+import random
 import time
 
 
-import requests
-import requests.exceptions
-import pandas as pd
+import aiohttp
+
+from instrumentation import observe_latency, increment
+from discovery import PLANT_FOUND, PLANT_NOT_FOUND, PLANT_FAILED
 
 API_URL = "https://data-eng-plants-api.herokuapp.com/plants/"
 
+MAX_PLANTS = 55
+MAX_CONCURRENT_REQUESTS = 20
+PLANT_TIMEOUT = 10
+CYCLE_DEADLINE = 40
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+
 
 def convert_plant_data_to_csv(plant_list: list[dict]) -> None:
     """Converts the list of all plant data into one csv file."""
 
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
     plant_dataframe = pd.DataFrame(plant_list)
 
     os.makedirs('./data/', exist_ok=True)
@@ -53,42 +68,172 @@ def flatten_and_organize_data(plant_dict: dict) -> dict:
     return new_plant_dict
 
 
-def fetch_plant_data(current_plant, session):
+def get_error_result(status: int, plant_json: dict) -> str:
+    """
+    Returns whether an error response means the plant doesn't exist, or that
+    the API failed to return a plant that may still be live.
+    """
+
+    if status == 404 or 'not found' in str(plant_json.get('error', '')).lower():
+        return PLANT_NOT_FOUND
+
+    return PLANT_FAILED
+
+
+def record_result(results: dict | None, plant_id: int, result: str) -> None:
+    """Records whether a plant was found, not found or failed, if results are wanted."""
+
+    if results is not None:
+        results[plant_id] = result
+
+
+def fetch_plant_data(current_plant, session, results: dict = None):
     """
-    Fetches data for a single plant.
+    Fetches data for a single plant, recording in `results` whether it
+    was found, not found or failed.
     """
+    import requests.exceptions  # pylint: disable=import-outside-toplevel
+
+    start = time.perf_counter()
     try:
         response = session.get(f"{API_URL}{current_plant}", timeout=20)
         plant_json = response.json()
         plant_keys = plant_json.keys()
 
         if 'error' not in plant_keys:
+            record_result(results, current_plant, PLANT_FOUND)
             return flatten_and_organize_data(plant_json)
+
+        record_result(results, current_plant,
+                      get_error_result(response.status_code, plant_json))
     except requests.exceptions.JSONDecodeError:
-        pass
+        record_result(results, current_plant, PLANT_FAILED)
+    finally:
+        observe_latency("plant_fetch_seconds", time.perf_counter() - start)
 
     return None
 
 
-def fetch_all_plant_data() -> list[dict]:
+def fetch_all_plant_data(plant_ids=range(MAX_PLANTS), results: dict = None) -> list[dict]:
     """
     Fetches all 50 plants data from the API,
     reads the data into a dict using multiprocessing.
+    Each plant's result is recorded in `results`, if given.
     """
+    import requests  # pylint: disable=import-outside-toplevel
 
-    max_plants = 55
+    context = contextvars.copy_context()
 
     with concurrent.futures.ThreadPoolExecutor() as multiprocessor:
         session = requests.Session()
 
         def partial_fetch_plant_data(
-            plant): return fetch_plant_data(plant, session)
+            plant): return context.copy().run(fetch_plant_data, plant, session, results)
         plant_data = list(multiprocessor.map(
-            partial_fetch_plant_data, range(max_plants)))
+            partial_fetch_plant_data, plant_ids))
 
     return [plant for plant in plant_data if plant is not None]
 
 
+async def fetch_plant_data_async(current_plant: int, session: aiohttp.ClientSession,
+                                 semaphore: asyncio.Semaphore, api_url: str = API_URL,
+                                 plant_timeout: float = PLANT_TIMEOUT,
+                                 max_retries: int = MAX_RETRIES,
+                                 backoff_base: float = BACKOFF_BASE,
+                                 results: dict = None) -> dict | None:
+    """
+    Fetches data for a single plant without blocking the other requests.
+    Server errors and non-JSON responses are retried with jittered exponential
+    backoff; a plant that times out is given up on for this cycle.
+    Whether it was found, not found or failed is recorded in `results`.
+    """
+    timeout = aiohttp.ClientTimeout(total=plant_timeout)
+    start = time.perf_counter()
+
+    try:
+        for attempt in range(max_retries + 1):
+            try:
+                async with semaphore:
+                    async with session.get(f"{api_url}{current_plant}",
+                                           timeout=timeout) as response:
+                        if response.status < 500:
+                            plant_json = await response.json(content_type=None)
+
+                            if 'error' not in plant_json.keys():
+                                record_result(results, current_plant, PLANT_FOUND)
+                                return flatten_and_organize_data(plant_json)
+                            record_result(results, current_plant,
+                                          get_error_result(response.status, plant_json))
+                            return None
+            except asyncio.TimeoutError:
+                increment("plant_fetch_timeouts")
+                record_result(results, current_plant, PLANT_FAILED)
+                return None
+            except (json.JSONDecodeError, aiohttp.ClientError):
+                pass
+
+            if attempt < max_retries:
+                increment("plant_fetch_retries")
+                await asyncio.sleep(random.uniform(0, backoff_base * 2 ** attempt))
+
+        record_result(results, current_plant, PLANT_FAILED)
+        return None
+    finally:
+        observe_latency("plant_fetch_seconds", time.perf_counter() - start)
+
+
+async def fetch_all_plant_data_async(plant_ids=range(MAX_PLANTS), api_url: str = API_URL,
+                                     max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                                     plant_timeout: float = PLANT_TIMEOUT,
+                                     cycle_deadline: float = CYCLE_DEADLINE,
+                                     max_retries: int = MAX_RETRIES,
+                                     backoff_base: float = BACKOFF_BASE,
+                                     results: dict = None) -> list[dict]:
+    """
+    Fetches every plant concurrently, with at most `max_concurrency` requests
+    in flight. Plants still outstanding when `cycle_deadline` passes are
+    cancelled, so one slow endpoint cannot stall the whole cycle.
+    Returns the same flattened dicts as fetch_all_plant_data, in plant id order,
+    and records each plant's result in `results`, if given. Cancelled plants
+    are recorded as failed.
+    """
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = [asyncio.create_task(
+            fetch_plant_data_async(plant, session, semaphore, api_url,
+                                   plant_timeout, max_retries, backoff_base, results))
+                 for plant in plant_ids]
+
+        if not tasks:
+            return []
+
+        done, pending = await asyncio.wait(tasks, timeout=cycle_deadline)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning("Extract deadline of %s seconds passed, %s plants skipped",
+                            cycle_deadline, len(pending))
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    plant_data = []
+    for plant, task in zip(plant_ids, tasks):
+        if results is not None:
+            results.setdefault(plant, PLANT_FAILED)
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            logging.warning("Failed to fetch plant: %s", task.exception())
+            continue
+        if task.result() is not None:
+            plant_data.append(task.result())
+
+    return plant_data
+
+
 if __name__ == "__main__":
 
     st = time.time()
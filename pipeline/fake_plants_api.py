@@ -0,0 +1,102 @@
+"""
+Local stand-in for the plants API, used by the tests and benchmarks
+to inject latency and failures without touching the real endpoint.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePlantsServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog large enough for concurrent extracts."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_plant_json(plant_id: int) -> dict:
+    """Builds a plant response shaped like the real API's."""
+
+    return {"botanist": {"email": f"botanist.{plant_id % 5}@lnhm.co.uk",
+                         "name": f"Botanist {plant_id % 5}",
+                         "phone": f"(146)994-{1000 + plant_id % 5}"},
+            "last_watered": "Mon, 18 Dec 2023 14:03:04 GMT",
+            "name": f"Plant {plant_id}",
+            "origin_location": ["-19.32556", "-41.25528", f"Region {plant_id % 10}",
+                                "BR", "America/Sao_Paulo"],
+            "plant_id": plant_id,
+            "recording_taken": "2023-12-18 14:50:56",
+            "scientific_name": [f"Plantus {plant_id}"],
+            "soil_moisture": 50 + plant_id % 40,
+            "temperature": 10 + plant_id % 15}
+
+
+def start_fake_plants_api(plant_ids=range(50), latency: float = 0, slow_plants: dict = None,
+                          failing_plants: dict = None, invalid_json_plants: set = None):
+    """
+    Starts a fake plants API on a random local port in a background thread.
+
+    `slow_plants` maps a plant id to its response delay in seconds,
+    `failing_plants` maps a plant id to how many requests get a 500 before it
+    recovers (use a large number for a permanently broken plant), and
+    `invalid_json_plants` always return a body that is not JSON.
+    Returns the server and the base url to pass to the extract functions.
+    """
+
+    live_ids = set(plant_ids)
+    slow_plants = slow_plants or {}
+    failures_left = dict(failing_plants or {})
+    invalid_json_plants = invalid_json_plants or set()
+    lock = threading.Lock()
+
+    class FakePlantHandler(BaseHTTPRequestHandler):
+        """Serves /plants/<id> like the real API."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Responds to a single plant request."""
+
+            plant_id = int(self.path.rstrip("/").split("/")[-1])
+
+            with lock:
+                self.server.request_count += 1
+                should_fail = failures_left.get(plant_id, 0) > 0
+                if should_fail:
+                    failures_left[plant_id] -= 1
+
+            time.sleep(slow_plants.get(plant_id, latency))
+
+            if should_fail:
+                self.send_json(500, {"error": "Internal server error"})
+            elif plant_id in invalid_json_plants:
+                self.send_body(200, b"<html>Application error</html>")
+            elif plant_id not in live_ids:
+                self.send_json(404, {"error": "plant not found", "plant_id": plant_id})
+            else:
+                self.send_json(200, make_plant_json(plant_id))
+
+        def send_json(self, status: int, body: dict) -> None:
+            """Sends a JSON response."""
+
+            self.send_body(status, json.dumps(body).encode())
+
+        def send_body(self, status: int, body: bytes) -> None:
+            """Sends a raw response body."""
+
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            """Keeps test output quiet."""
+
+    server = FakePlantsServer(("127.0.0.1", 0), FakePlantHandler)
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_port}/plants/"
@@ -0,0 +1,181 @@
+"""
+Per-cycle timing and metrics for the pipeline.
+
+Spans are timed with the monotonic perf_counter clock and collected in the current
+cycle's metrics, along with counters, values such as row counts, and latency
+histograms. The current metrics live in a context variable, so a cycle whose
+load overlaps the next cycle's extract still reports its own numbers.
+At the end of a cycle the metrics are written as one JSON line, and
+optionally exported as a Prometheus textfile or StatsD packets.
+"""
+
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+
+METRICS_LOG_FILE = 'pipeline_metrics.jsonl'
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20]
+METRIC_PREFIX = 'plant_pipeline'
+
+CURRENT_METRICS = ContextVar("current_metrics")
+
+
+def start_cycle_metrics() -> dict:
+    """Starts a new set of metrics for the cycle running in this context and returns it."""
+
+    metrics = {"started_at": datetime.now().isoformat(),
+               "spans": {}, "counters": {}, "values": {}, "histograms": {}}
+    CURRENT_METRICS.set(metrics)
+
+    return metrics
+
+
+def get_current_metrics() -> dict:
+    """Returns the metrics of the cycle running in this context, starting them if needed."""
+
+    try:
+        return CURRENT_METRICS.get()
+    except LookupError:
+        return start_cycle_metrics()
+
+
+@contextmanager
+def timed_span(name: str):
+    """Times the enclosed block, adding its duration in seconds to the named span."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        spans = get_current_metrics()["spans"]
+        spans[name] = spans.get(name, 0) + elapsed
+
+
+def timed(name: str):
+    """Decorator that times every call of the function as the named span."""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed_span(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Adds to a counter."""
+
+    counters = get_current_metrics()["counters"]
+    counters[name] = counters.get(name, 0) + amount
+
+
+def set_value(name: str, value: float) -> None:
+    """Records a single value, such as a row count."""
+
+    get_current_metrics()["values"][name] = value
+
+
+def observe_latency(name: str, seconds: float) -> None:
+    """Adds a latency to the named histogram."""
+
+    histogram = get_current_metrics()["histograms"].setdefault(
+        name, {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0, "count": 0})
+
+    bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+                  len(LATENCY_BUCKETS))
+    histogram["buckets"][bucket] += 1
+    histogram["sum"] += seconds
+    histogram["count"] += 1
+
+
+def count_database_round_trips(engine: "Engine") -> None:
+    """Counts every statement the engine sends to the database as a round trip."""
+    from sqlalchemy import event  # pylint: disable=import-outside-toplevel
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_round_trip(*_):
+        increment("db_round_trips")
+
+
+def write_metrics_log(metrics: dict, filename: str = METRICS_LOG_FILE) -> None:
+    """Appends the cycle's metrics to the log as a single JSON line."""
+
+    with open(filename, 'a', encoding='utf-8') as metrics_file:
+        metrics_file.write(json.dumps(metrics) + "\n")
+
+
+def format_prometheus_metrics(metrics: dict, prefix: str = METRIC_PREFIX) -> str:
+    """Formats the metrics in the Prometheus text exposition format."""
+
+    lines = []
+
+    for name, seconds in metrics.get("spans", {}).items():
+        lines.append(f'{prefix}_span_seconds{{span="{name}"}} {seconds}')
+
+    for name, count in metrics.get("counters", {}).items():
+        lines.append(f'{prefix}_{name}_total {count}')
+
+    for name, value in metrics.get("values", {}).items():
+        lines.append(f'{prefix}_{name} {value}')
+
+    for name, histogram in metrics.get("histograms", {}).items():
+        cumulative = 0
+        for bound, count in zip([*LATENCY_BUCKETS, "+Inf"], histogram["buckets"]):
+            cumulative += count
+            lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_{name}_sum {histogram["sum"]}')
+        lines.append(f'{prefix}_{name}_count {histogram["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(metrics: dict, filename: str) -> None:
+    """Writes the metrics for the node exporter's textfile collector, replacing the old file."""
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as metrics_file:
+        metrics_file.write(format_prometheus_metrics(metrics))
+    os.replace(temp_filename, filename)
+
+
+def format_statsd_metrics(metrics: dict, prefix: str = METRIC_PREFIX) -> list[str]:
+    """Formats the metrics as StatsD timers, counters and gauges."""
+
+    lines = [f"{prefix}.span.{name}:{seconds * 1000:.3f}|ms"
+             for name, seconds in metrics.get("spans", {}).items()]
+    lines += [f"{prefix}.{name}:{count}|c" for name, count in metrics.get("counters", {}).items()]
+    lines += [f"{prefix}.{name}:{value}|g" for name, value in metrics.get("values", {}).items()]
+
+    return lines
+
+
+def send_statsd_metrics(metrics: dict, host: str, port: int = 8125) -> None:
+    """Sends the metrics to a StatsD server over UDP."""
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as statsd_socket:
+        for line in format_statsd_metrics(metrics):
+            statsd_socket.sendto(line.encode(), (host, port))
+
+
+def export_metrics(metrics: dict, config) -> None:
+    """Writes the JSON line, plus any exporters switched on in the config."""
+
+    write_metrics_log(metrics, config.get("METRICS_LOG_FILE", METRICS_LOG_FILE))
+
+    if config.get("METRICS_TEXTFILE"):
+        write_prometheus_textfile(metrics, config["METRICS_TEXTFILE"])
+
+    if config.get("STATSD_HOST"):
+        send_statsd_metrics(metrics, config["STATSD_HOST"], int(config.get("STATSD_PORT", 8125)))
@@ -0,0 +1,35 @@
+"""
+In-process record of the last reading loaded for each plant, keyed on plant name.
+
+The api keeps serving a plant's last reading until its sensor takes a new one,
+so a cycle often repeats readings that are already in the database. These are
+dropped before the load, and the unique (plant_id, recording_taken) index
+catches any that slip through, such as after a restart.
+"""
+
+import pandas as pd
+
+
+def create_last_readings() -> dict:
+    """Returns the record of a pipeline that hasn't loaded any readings yet."""
+
+    return {}
+
+
+def drop_unchanged_readings(plant_data: pd.DataFrame, last_readings: dict) -> pd.DataFrame:
+    """Drops readings already loaded, or repeated within the data, keeping the first of each."""
+
+    plant_data = plant_data.drop_duplicates(["Name", "Recording Taken"])
+    last_taken = plant_data["Name"].map(last_readings)
+
+    return plant_data[last_taken.isna() | (last_taken != plant_data["Recording Taken"])]
+
+
+def remember_last_readings(plant_data: pd.DataFrame, last_readings: dict) -> None:
+    """Records the latest reading of each plant in data that has been loaded."""
+
+    latest = plant_data.groupby("Name")["Recording Taken"].max()
+
+    for name, recording_taken in latest.items():
+        if name not in last_readings or recording_taken > last_readings[name]:
+            last_readings[name] = recording_taken
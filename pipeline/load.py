@@ -4,23 +4,97 @@
 from os import environ, _Environ
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, sql, Connection
+from sqlalchemy import create_engine, sql, Connection, Engine
+from sqlalchemy.exc import IntegrityError
 import pandas as pd
 
 from transform import csv_to_data_frame
+from instrumentation import timed
+from local_database import create_local_engine
+from dimension_cache import (get_dimension_id, set_dimension_id, is_dimension_cache_stale,
+                             warm_dimension_cache, invalidate_dimension_cache)
+
+DB_BACKEND = "mssql"
+LOCAL_DATABASE_FILE = "./data/plants.db"
+POOL_SIZE = 2
+POOL_RECYCLE = 1800
+ENGINES = {}
+
+BULK_CHUNK_SIZE = 300
+
+BULK_BOTANIST_QUERY = """INSERT INTO s_delta.botanist (name, email, telephone_number)
+    SELECT staged.name, staged.email, staged.telephone_number FROM staged
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.botanist AS bot WHERE bot.email = staged.email)"""
+
+BULK_LOCATION_QUERY = """INSERT INTO s_delta.location (region, country, continent)
+    SELECT staged.region, staged.country, staged.continent FROM staged
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.location AS loc WHERE loc.region = staged.region)"""
+
+BULK_PLANT_QUERY = """INSERT INTO s_delta.plant (plant_id, name, botanist_id, location_id)
+    SELECT staged.plant_id, staged.name, bot.botanist_id, loc.location_id FROM staged
+    JOIN s_delta.botanist AS bot ON bot.email = staged.email
+    JOIN s_delta.location AS loc ON loc.region = staged.region
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.plant AS plant WHERE plant.name = staged.name)"""
+
+BULK_RECORDING_QUERY = """INSERT INTO s_delta.recording
+    (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+    SELECT plant.plant_id, staged.soil_moisture, staged.temperature,
+    staged.recording_taken, staged.last_watered FROM staged
+    JOIN s_delta.plant AS plant ON plant.name = staged.name
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording AS rec
+        WHERE rec.plant_id = plant.plant_id AND rec.recording_taken = staged.recording_taken)"""
+
+CACHED_RECORDING_QUERY = """INSERT INTO s_delta.recording
+    (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+    SELECT staged.plant_id, staged.soil_moisture, staged.temperature,
+    staged.recording_taken, staged.last_watered FROM staged
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording AS rec
+        WHERE rec.plant_id = staged.plant_id AND rec.recording_taken = staged.recording_taken)"""
+
+BOTANIST_TABLE = sql.table("botanist", sql.column("botanist_id"), sql.column("name"),
+                           sql.column("email"), sql.column("telephone_number"), schema="s_delta")
+
+LOCATION_TABLE = sql.table("location", sql.column("location_id"), sql.column("region"),
+                           sql.column("country"), sql.column("continent"), schema="s_delta")
+
+PLANT_TABLE = sql.table("plant", sql.column("plant_id"), sql.column("name"),
+                        sql.column("botanist_id"), sql.column("location_id"), schema="s_delta")
+
+
+def get_database_engine(config: _Environ) -> Engine:
+    """
+    Returns the engine for the configured backend, creating it on first use:
+    the SQL Server by default, or a local SQLite file with `DB_BACKEND=sqlite`.
+    The engine is kept for the life of the process so each cycle reuses
+    pooled connections instead of logging in again.
+    """
+
+    if config.get("DB_BACKEND", DB_BACKEND) == "sqlite":
+        filename = config.get("DB_PATH", LOCAL_DATABASE_FILE)
+        url = f"sqlite:///{filename}"
+        if url not in ENGINES:
+            ENGINES[url] = create_local_engine(filename)
+        return ENGINES[url]
+
+    url = (f"mssql+pymssql://{config['DB_USERNAME']}:{config['DB_PASSWORD']}"
+           f"@{config['DB_HOST']}/{config.get('DB_NAME', 'plants')}?charset=utf8")
+
+    if url not in ENGINES:
+        ENGINES[url] = create_engine(
+            url, pool_size=int(config.get("DB_POOL_SIZE", POOL_SIZE)),
+            pool_recycle=int(config.get("DB_POOL_RECYCLE", POOL_RECYCLE)),
+            pool_pre_ping=True)
+
+    return ENGINES[url]
 
 
 def create_database_connection(config: _Environ) -> Connection:
-    """Creates a database connection to the SQL Server."""
+    """Checks out a pooled connection to the configured database."""
 
-    engine = create_engine(
-        f"mssql+pymssql://{config['DB_USERNAME']}:{config['DB_PASSWORD']}@{config['DB_HOST']}/?charset=utf8")
-
-    connection = engine.connect()
-
-    return connection
+    return get_database_engine(config).connect()
 
 
+@timed("insert_into_location_table")
 def insert_into_location_table(connection: Connection, plant_data: pd.DataFrame) -> None:
     """Inserts data from a pandas data frame into a SQL Server into the location table."""
 
@@ -45,6 +119,7 @@ def insert_into_location_table(connection: Connection, plant_data: pd.DataFrame)
                 query, {"region": region, "continent": continent, "country": country})
 
 
+@timed("insert_into_botanist_table")
 def insert_into_botanist_table(connection: Connection, plant_data: pd.DataFrame) -> None:
     """Inserts data from a pandas data frame into a SQL Server into the location table."""
 
@@ -52,8 +127,6 @@ def insert_into_botanist_table(connection: Connection, plant_data: pd.DataFrame)
 
     for plant in plant_list:
 
-        connection.execute(sql.text("USE plants;"))
-
         query = sql.text(
             "SELECT botanist_id FROM s_delta.botanist WHERE email = (:email)")
         args = ({"email": plant[7]})
@@ -72,6 +145,7 @@ def insert_into_botanist_table(connection: Connection, plant_data: pd.DataFrame)
                 query, {"name": name, "email": email, "telephone": telephone})
 
 
+@timed("insert_into_plant_table")
 def insert_into_plant_table(connection: Connection, plant_data: list[dict]) -> None:
     """Seed the plant table with the plant data list and relevant botanist and location ids."""
 
@@ -103,6 +177,7 @@ def insert_into_plant_table(connection: Connection, plant_data: list[dict]) -> N
             connection.execute(query, args)
 
 
+@timed("insert_into_recordings_table")
 def insert_into_recordings_table(connection: Connection, plant_data: pd.DataFrame) -> None:
     """Inserts data from a pandas data frame into a SQL Server into the recording table."""
 
@@ -120,15 +195,213 @@ def insert_into_recordings_table(connection: Connection, plant_data: pd.DataFram
         recording = plant[3]
         watered = plant[2]
 
-        connection.execute(sql.text("USE plants;"))
-
         query = sql.text(
-            """INSERT INTO s_delta.recording (plant_id,soil_moisture,temperature,recording_taken,last_watered)
-            VALUES (:id,:soil,:temperature,:recording,:watered)""")
-        connection.execute(query, {"id": plant_id, "soil": soil, "temperature": temperature, "recording": recording,
-                                   "watered": watered})
+            """INSERT INTO s_delta.recording
+                (plant_id, soil_moisture, temperature, recording_taken, last_watered)
+            SELECT :id, :soil, :temperature, :recording, :watered
+            WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording
+                WHERE plant_id = :id AND recording_taken = :recording)""")
+        connection.execute(query, {"id": plant_id, "soil": soil, "temperature": temperature,
+                                   "recording": recording, "watered": watered})
+
+    connection.commit()
+
+
+def build_staged_rows(columns: list[str], row_count: int) -> str:
+    """
+    Builds a `WITH staged (...)` clause holding `row_count` rows of bound parameters,
+    so a whole batch can be joined against the tables in a single statement.
+    """
+
+    rows = [", ".join(f":{column}_{row}" for column in columns) for row in range(row_count)]
+
+    return f"WITH staged ({', '.join(columns)}) AS (SELECT {' UNION ALL SELECT '.join(rows)})"
+
+
+def get_records(data: pd.DataFrame) -> pd.DataFrame:
+    """Returns the data as Python objects with missing values as None, ready to bind."""
+
+    return data.astype(object).where(data.notna(), None)
+
+
+def execute_staged_insert(connection: Connection, query: str, staged_data: pd.DataFrame,
+                          chunk_size: int = BULK_CHUNK_SIZE) -> None:
+    """Runs a set-based insert over the staged data, one statement per chunk of rows."""
+
+    columns = list(staged_data.columns)
+    records = get_records(staged_data).values.tolist()
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        params = {f"{column}_{row}": value
+                  for row, record in enumerate(chunk)
+                  for column, value in zip(columns, record)}
+
+        connection.execute(
+            sql.text(f"{build_staged_rows(columns, len(chunk))} {query}"), params)
+
+
+@timed("bulk_insert_into_botanist_table")
+def bulk_insert_into_botanist_table(connection: Connection, plant_data: pd.DataFrame) -> None:
+    """Inserts any new botanists in the data frame with set-based statements."""
+
+    botanists = plant_data[["Botanist Name", "Botanist Email", "Botanist Phone"]].drop_duplicates(
+        "Botanist Email").set_axis(["name", "email", "telephone_number"], axis=1)
+
+    execute_staged_insert(connection, BULK_BOTANIST_QUERY, botanists)
+
+
+@timed("bulk_insert_into_location_table")
+def bulk_insert_into_location_table(connection: Connection, plant_data: pd.DataFrame) -> None:
+    """Inserts any new locations in the data frame with set-based statements."""
+
+    locations = plant_data[["Region", "Country", "Continent"]].drop_duplicates(
+        "Region").set_axis(["region", "country", "continent"], axis=1)
+
+    execute_staged_insert(connection, BULK_LOCATION_QUERY, locations)
+
+
+@timed("bulk_insert_into_plant_table")
+def bulk_insert_into_plant_table(connection: Connection, plant_data: pd.DataFrame) -> None:
+    """Inserts any new plants, joining their botanist and location ids in the database."""
+
+    plants = plant_data[["Id", "Name", "Botanist Email", "Region"]].drop_duplicates(
+        "Name").set_axis(["plant_id", "name", "email", "region"], axis=1)
+
+    execute_staged_insert(connection, BULK_PLANT_QUERY, plants)
+
+
+@timed("bulk_insert_into_recordings_table")
+def bulk_insert_into_recordings_table(connection: Connection, plant_data: pd.DataFrame) -> None:
+    """Inserts every recording not already in the table with set-based statements."""
+
+    recordings = plant_data[["Name", "Soil Moisture", "Temperature", "Recording Taken",
+                             "Last Watered"]].drop_duplicates(
+        ["Name", "Recording Taken"]).set_axis(
+        ["name", "soil_moisture", "temperature", "recording_taken", "last_watered"], axis=1)
+
+    execute_staged_insert(connection, BULK_RECORDING_QUERY, recordings)
+
+
+def bulk_load_plant_data(connection: Connection, plant_data: pd.DataFrame) -> None:
+    """
+    Loads a cycle of cleaned plant data in a constant number of statements,
+    upserting botanists, locations and plants before inserting the recordings.
+    No database is selected here, the connection's engine must connect to it,
+    as get_database_engine does with DB_NAME.
+    """
 
-    connection.execute(sql.text("COMMIT;"))
+    bulk_insert_into_botanist_table(connection, plant_data)
+    bulk_insert_into_location_table(connection, plant_data)
+    bulk_insert_into_plant_table(connection, plant_data)
+    bulk_insert_into_recordings_table(connection, plant_data)
+
+    connection.commit()
+
+
+def insert_returning_ids(connection: Connection, table, key_column: str, id_column: str,
+                         rows: list[dict], cache: dict,
+                         chunk_size: int = BULK_CHUNK_SIZE) -> None:
+    """
+    Inserts new dimension rows and caches the ids the database hands back
+    (`OUTPUT INSERTED` on SQL Server), so they never need to be looked up.
+    """
+
+    for start in range(0, len(rows), chunk_size):
+        query = sql.insert(table).values(rows[start:start + chunk_size]).returning(
+            table.c[key_column], table.c[id_column])
+
+        for key, dimension_id in connection.execute(query).fetchall():
+            set_dimension_id(cache, table.name, key, dimension_id)
+
+
+def get_uncached_rows(cache: dict, table: str, dimension_data: pd.DataFrame,
+                      key_column: str) -> list[dict]:
+    """Returns the rows whose natural key is not in the cache yet."""
+
+    uncached = [get_dimension_id(cache, table, key) is None
+                for key in dimension_data[key_column]]
+
+    return get_records(dimension_data[uncached]).to_dict('records')
+
+
+@timed("insert_new_botanists")
+def insert_new_botanists(connection: Connection, plant_data: pd.DataFrame, cache: dict) -> None:
+    """Inserts botanists missing from the cache and caches their new ids."""
+
+    botanists = plant_data[["Botanist Name", "Botanist Email", "Botanist Phone"]].drop_duplicates(
+        "Botanist Email").set_axis(["name", "email", "telephone_number"], axis=1)
+
+    rows = get_uncached_rows(cache, "botanist", botanists, "email")
+    insert_returning_ids(connection, BOTANIST_TABLE, "email", "botanist_id", rows, cache)
+
+
+@timed("insert_new_locations")
+def insert_new_locations(connection: Connection, plant_data: pd.DataFrame, cache: dict) -> None:
+    """Inserts locations missing from the cache and caches their new ids."""
+
+    locations = plant_data[["Region", "Country", "Continent"]].drop_duplicates(
+        "Region").set_axis(["region", "country", "continent"], axis=1)
+
+    rows = get_uncached_rows(cache, "location", locations, "region")
+    insert_returning_ids(connection, LOCATION_TABLE, "region", "location_id", rows, cache)
+
+
+@timed("insert_new_plants")
+def insert_new_plants(connection: Connection, plant_data: pd.DataFrame, cache: dict) -> None:
+    """Inserts plants missing from the cache, taking their botanist and location ids from it."""
+
+    plants = plant_data[["Id", "Name", "Botanist Email", "Region"]].drop_duplicates(
+        "Name").set_axis(["plant_id", "name", "email", "region"], axis=1)
+
+    rows = [{"plant_id": plant["plant_id"], "name": plant["name"],
+             "botanist_id": get_dimension_id(cache, "botanist", plant["email"]),
+             "location_id": get_dimension_id(cache, "location", plant["region"])}
+            for plant in get_uncached_rows(cache, "plant", plants, "name")]
+
+    insert_returning_ids(connection, PLANT_TABLE, "name", "plant_id", rows, cache)
+
+
+@timed("insert_cached_recordings")
+def insert_cached_recordings(connection: Connection, plant_data: pd.DataFrame,
+                             cache: dict) -> None:
+    """Inserts every recording not already in the table, taking the plant ids from the cache."""
+
+    plant_ids = {name: get_dimension_id(cache, "plant", name)
+                 for name in plant_data["Name"].unique()}
+
+    recordings = plant_data[["Name", "Soil Moisture", "Temperature", "Recording Taken",
+                             "Last Watered"]].drop_duplicates(["Name", "Recording Taken"]).set_axis(
+        ["plant_id", "soil_moisture", "temperature", "recording_taken", "last_watered"], axis=1)
+    recordings["plant_id"] = recordings["plant_id"].map(plant_ids)
+
+    recordings = recordings.dropna(subset=["plant_id"]).astype({"plant_id": int})
+
+    execute_staged_insert(connection, CACHED_RECORDING_QUERY, recordings)
+
+
+def cached_load_plant_data(connection: Connection, plant_data: pd.DataFrame, cache: dict) -> None:
+    """
+    Loads a cycle of cleaned plant data using the dimension cache, so once the cache
+    is warm only the recordings are sent to the database. A constraint violation
+    means the cache is out of date: it is dropped and the cycle is reloaded with
+    the set-based path.
+    """
+
+    if is_dimension_cache_stale(cache):
+        warm_dimension_cache(connection, cache)
+
+    try:
+        insert_new_botanists(connection, plant_data, cache)
+        insert_new_locations(connection, plant_data, cache)
+        insert_new_plants(connection, plant_data, cache)
+        insert_cached_recordings(connection, plant_data, cache)
+        connection.commit()
+
+    except IntegrityError:
+        connection.rollback()
+        invalidate_dimension_cache(cache)
+        bulk_load_plant_data(connection, plant_data)
 
 
 if __name__ == "__main__":
@@ -144,3 +417,5 @@ if __name__ == "__main__":
     insert_into_plant_table(conn, plant_dataframe)
 
     insert_into_recordings_table(conn, plant_dataframe)
+
+    conn.close()
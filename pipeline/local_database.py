@@ -0,0 +1,86 @@
+"""
+Local SQLite backend for the s_delta schema, so the pipeline can run offline
+(with `DB_BACKEND=sqlite`) and the load functions can be tested and
+benchmarked without a SQL Server.
+"""
+
+import os
+import sqlite3
+
+import pandas as pd
+from sqlalchemy import create_engine, event, sql, Engine
+from sqlalchemy.pool import StaticPool
+
+SQLITE_SCHEMA = [
+    """CREATE TABLE s_delta.location (
+        location_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        region VARCHAR(100) UNIQUE,
+        country VARCHAR(50),
+        continent VARCHAR(20)
+    )""",
+    """CREATE TABLE s_delta.botanist (
+        botanist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100),
+        email VARCHAR(100) UNIQUE,
+        telephone_number VARCHAR(20)
+    )""",
+    """CREATE TABLE s_delta.plant (
+        plant_id INT NOT NULL PRIMARY KEY,
+        name VARCHAR(100) UNIQUE,
+        location_id INT REFERENCES location (location_id) ON DELETE CASCADE,
+        botanist_id INT REFERENCES botanist (botanist_id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE s_delta.recording (
+        recording_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plant_id INT NOT NULL REFERENCES plant (plant_id) ON DELETE CASCADE,
+        soil_moisture FLOAT NOT NULL,
+        temperature FLOAT,
+        recording_taken DATETIME NOT NULL,
+        last_watered DATETIME NOT NULL,
+        CONSTRAINT uq_recording_plant_taken UNIQUE (plant_id, recording_taken)
+    )""",
+    """CREATE TABLE s_delta.recording_rollup (
+        plant_id INT NOT NULL,
+        resolution VARCHAR(4) NOT NULL,
+        period_start DATETIME NOT NULL,
+        reading_count INT NOT NULL,
+        soil_moisture_mean FLOAT,
+        soil_moisture_min FLOAT,
+        soil_moisture_max FLOAT,
+        temperature_mean FLOAT,
+        temperature_min FLOAT,
+        temperature_max FLOAT,
+        PRIMARY KEY (plant_id, resolution, period_start)
+    )""",
+    """CREATE INDEX IF NOT EXISTS s_delta.ix_recording_taken_plant
+        ON recording (recording_taken, plant_id, soil_moisture, temperature, last_watered)""",
+    """CREATE INDEX IF NOT EXISTS s_delta.ix_plant_botanist
+        ON plant (botanist_id, name, location_id)""",
+    """CREATE INDEX IF NOT EXISTS s_delta.ix_plant_location
+        ON plant (location_id, name, botanist_id)"""]
+
+sqlite3.register_adapter(pd.Timestamp, lambda timestamp: timestamp.isoformat(sep=" "))
+
+
+def create_local_engine(filename: str = ":memory:") -> Engine:
+    """
+    Creates a SQLite engine with the s_delta schema attached and created,
+    in memory or in the given database file.
+    """
+
+    if filename != ":memory:":
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def attach_schema(dbapi_connection, _):
+        dbapi_connection.execute(f"ATTACH DATABASE '{filename}' AS s_delta")
+
+    with engine.begin() as connection:
+        for statement in SQLITE_SCHEMA:
+            connection.execute(sql.text(
+                statement.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1)))
+
+    return engine
@@ -1,88 +1,231 @@
 """
 Pipeline script that connects the ETL scripts,
-Runs the pipeline in a loop every 1 min.
+Runs the pipeline on a fixed cadence, every 1 min by default.
 """
 
-import time
-from os import environ
+from __future__ import annotations
+
+from os import environ, _Environ
 import logging
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-import requests
-from dotenv import load_dotenv
-import pandas as pd
+from discovery import load_discovery_state, save_discovery_state, discover_and_fetch
+from instrumentation import (start_cycle_metrics, get_current_metrics, timed_span, set_value,
+                             increment, export_metrics, count_database_round_trips)
+from scheduler import run_on_cadence, run_pipelined_on_cadence, CYCLE_SECONDS
 
-from extract import fetch_all_plant_data
-from transform import standardize_country_name, remove_rows_with_null, check_soil_moisture_valid, check_soil_temp_valid, normalize_datetimes, change_temp_and_moisture_to_two_dp
-from load import create_database_connection, insert_into_recordings_table, insert_into_location_table, insert_into_botanist_table, insert_into_plant_table
+if TYPE_CHECKING:
+    import pandas as pd
 
-if __name__ == "__main__":
+# The stage modules pull in pandas, SQLAlchemy, requests and aiohttp, so they're
+# imported by the functions that use them rather than when this module loads
+# pylint: disable=import-outside-toplevel
 
-    logging.basicConfig(filename='execution_time.log',
-                        encoding='utf-8', level=logging.DEBUG)
+# The cycle's top level spans, every other span is timed inside one of these
+PHASE_SPANS = ("extract", "transform", "load", "stats")
 
-    logging.getLogger('urllib3').setLevel(logging.WARNING)
 
-    load_dotenv()
+def extract_plant_data(config: _Environ) -> list[dict]:
+    """Fetches the live plants from the api, probing for any new ones."""
+
+    from extract import (fetch_all_plant_data, fetch_all_plant_data_async,
+                         MAX_CONCURRENT_REQUESTS, CYCLE_DEADLINE)
+
+    if config.get("EXTRACT_MODE", "async") == "async":
+        import asyncio
+
+        def fetch_plants(plant_ids, results):
+            return asyncio.run(fetch_all_plant_data_async(
+                plant_ids,
+                max_concurrency=int(config.get("EXTRACT_CONCURRENCY", MAX_CONCURRENT_REQUESTS)),
+                cycle_deadline=float(config.get("EXTRACT_DEADLINE", CYCLE_DEADLINE)),
+                results=results))
+    else:
+        fetch_plants = fetch_all_plant_data
+
+    # Only requests the plant ids known to be live, plus a probe for new ones
+    discovery_state = load_discovery_state()
+    plant_api_data = discover_and_fetch(discovery_state, fetch_plants)
+    save_discovery_state(discovery_state)
+
+    return plant_api_data
+
+
+def transform_plant_data(plant_api_data: list[dict]) -> pd.DataFrame:
+    """Cleans the extracted plants ready to be loaded."""
+
+    import pandas as pd
+    from transform import standardize_country_names, clean_plant_data, COUNTRY_CACHE_FILE
+
+    plants = pd.DataFrame(plant_api_data)
+
+    # Location formatting
+    plants["Country"] = standardize_country_names(
+        plants["Country's Initials"], COUNTRY_CACHE_FILE)
+
+    # Drop redundant columns
+    plants = plants.drop("Country's Initials", axis=1)
+
+    # Drop rows with null or invalid values, normalise datetimes and round readings
+    return clean_plant_data(plants)
+
+
+def load_plant_data(config: _Environ, plants: pd.DataFrame, dimension_cache: dict,
+                    rollup_state: dict, last_readings: dict) -> pd.DataFrame:
+    """
+    Loads the plants' new readings into the SQL Server through a pooled connection,
+    then rolls up any hours and days that have finished. Returns the new readings.
+    """
+
+    import pandas as pd
+    from load import create_database_connection, cached_load_plant_data
+    from rollups import write_completed_rollups
+    from last_readings import drop_unchanged_readings, remember_last_readings
+
+    new_plants = drop_unchanged_readings(plants, last_readings)
+    set_value("rows_unchanged", len(plants) - len(new_plants))
+
+    with timed_span("connection_acquire"):
+        connection = create_database_connection(config)
+
+    # Returns the connection to the pool afterwards
+    with connection:
+        if not new_plants.empty:
+            cached_load_plant_data(connection, new_plants, dimension_cache)
+        write_completed_rollups(connection, rollup_state, pd.Timestamp.now())
+
+    # Only remembered once loaded, so a failed load is retried next cycle
+    remember_last_readings(new_plants, last_readings)
+
+    return new_plants
+
+
+def check_plant_readings(config: _Environ, plants: pd.DataFrame, plant_stats: dict) -> None:
+    """Adds the new readings to each plant's stats and checkpoints them, logging any alerts."""
 
-    while True:
+    from plant_stats import (update_plant_stats, save_plant_stats, write_alerts,
+                             PLANT_STATS_FILE, ALERTS_LOG_FILE)
 
-        # Starts a timer for each iteration of the pipeline
-        start_time = time.time()
-        logging.debug(str(datetime.now()) + ': Initializing pipeline')
+    alerts = update_plant_stats(plant_stats, plants)
+    save_plant_stats(plant_stats, config.get("PLANT_STATS_FILE", PLANT_STATS_FILE))
 
-        # Fetches all plant data from the api
+    for alert in alerts:
+        increment(f"alerts_{alert['type']}")
+        logging.warning(str(datetime.now()) + ': Plant alert: ' + str(alert))
 
-        plant_api_data = fetch_all_plant_data()
+    write_alerts(alerts, config.get("ALERTS_LOG_FILE", ALERTS_LOG_FILE))
 
-        extract_time = time.time() - start_time
-        logging.debug(str(datetime.now()) + ': Time taken to extract data: ' +
-                      str(extract_time) + ' seconds')
 
-        # Creates a csv file for the data and returns a data frame
-        plants = pd.DataFrame(plant_api_data)
+def extract_and_transform_cycle(config: _Environ) -> pd.DataFrame:
+    """Starts a new cycle's metrics, then extracts and cleans its plant data."""
 
-        # Location formatting
-        plants["Country"] = plants["Country's Initials"].apply(
-            standardize_country_name)
+    start_cycle_metrics()
 
-        # Drop redundant columns
-        plants = plants.drop("Country's Initials", axis=1)
+    with timed_span("extract"):
+        plant_api_data = extract_plant_data(config)
+    set_value("rows_extracted", len(plant_api_data))
 
-        # Drop rows with null values in important columns
-        plants = remove_rows_with_null(plants, ["Id", "Name", "Recording Taken", "Soil Moisture",
-                                                "Temperature", "Botanist Name", "Botanist Email", "Botanist Phone"])
+    with timed_span("transform"):
+        plants = transform_plant_data(plant_api_data)
+    set_value("rows_transformed", len(plants))
 
-        # Validate and round moisture and temperature values
-        plants = check_soil_moisture_valid(plants)
-        plants = check_soil_temp_valid(plants)
-        plants = normalize_datetimes(plants)
-        plants = change_temp_and_moisture_to_two_dp(plants)
+    return plants
 
-        transform_time = time.time() - extract_time
-        logging.debug(str(datetime.now()) + ': Time taken to transform data: ' +
-                      str(transform_time) + ' seconds')
 
-        # Creates a connection to the SQL Server
-        connection = create_database_connection(environ)
+def load_cycle(config: _Environ, plants: pd.DataFrame, dimension_cache: dict,
+               rollup_state: dict, last_readings: dict, plant_stats: dict) -> dict:
+    """
+    Loads a cycle's plant data and checks its new readings, then logs and
+    exports the cycle's metrics.
+    """
 
-        # Inserts the current iterations data into the SQL Server
-        insert_into_botanist_table(connection, plants)
-        insert_into_location_table(connection, plants)
-        insert_into_plant_table(connection, plants)
+    with timed_span("load"):
+        new_plants = load_plant_data(config, plants, dimension_cache, rollup_state,
+                                     last_readings)
 
-        insert_into_recordings_table(connection, plants)
+    with timed_span("stats"):
+        check_plant_readings(config, new_plants, plant_stats)
 
-        load_time = time.time() - (extract_time + transform_time)
-        logging.debug(str(datetime.now()) + ': Time taken to load data: ' +
-                      str(load_time) + ' seconds')
+    metrics = get_current_metrics()
+    log_cycle_metrics(metrics, dimension_cache)
+    export_metrics(metrics, config)
 
-        # get the end time
-        et = time.time()
+    return metrics
 
-        # get the execution time
-        elapsed_time = et - start_time
-        logging.debug(str(datetime.now()) + ': Total execution time: ' +
-                      str(elapsed_time) + ' seconds')
 
-        time.sleep(30)
+def run_pipeline_cycle(config: _Environ, dimension_cache: dict, rollup_state: dict,
+                       last_readings: dict, plant_stats: dict) -> dict:
+    """Runs one extract, transform and load cycle, returning its metrics."""
+
+    plants = extract_and_transform_cycle(config)
+
+    return load_cycle(config, plants, dimension_cache, rollup_state, last_readings, plant_stats)
+
+
+def log_cycle_metrics(metrics: dict, dimension_cache: dict) -> None:
+    """Logs the time taken by each phase of the cycle."""
+
+    from dimension_cache import get_dimension_cache_stats
+
+    spans = metrics["spans"]
+
+    logging.debug(str(datetime.now()) + ': Time taken to extract data: ' +
+                  str(spans["extract"]) + ' seconds')
+    logging.debug(str(datetime.now()) + ': Time taken to transform data: ' +
+                  str(spans["transform"]) + ' seconds')
+    logging.debug(str(datetime.now()) + ': Time taken to acquire connection: ' +
+                  str(spans["connection_acquire"]) + ' seconds')
+    logging.debug(str(datetime.now()) + ': Time taken to load data: ' +
+                  str(spans["load"]) + ' seconds')
+    logging.debug(str(datetime.now()) + ': Time taken to check readings: ' +
+                  str(spans.get("stats", 0)) + ' seconds')
+    logging.debug(str(datetime.now()) + ': Dimension cache: ' +
+                  str(get_dimension_cache_stats(dimension_cache)))
+    logging.debug(str(datetime.now()) + ': Total execution time: ' +
+                  str(sum(spans.get(phase, 0) for phase in PHASE_SPANS)) + ' seconds')
+
+
+def main() -> None:
+    """Sets up the pipeline's caches and runs its cycles on the cadence."""
+
+    logging.basicConfig(filename='execution_time.log',
+                        encoding='utf-8', level=logging.DEBUG)
+
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
+
+    from dotenv import load_dotenv
+    from load import get_database_engine
+    from dimension_cache import create_dimension_cache, DIMENSION_CACHE_TTL
+    from rollups import create_rollup_state
+    from last_readings import create_last_readings
+    from plant_stats import load_plant_stats, PLANT_STATS_FILE
+
+    load_dotenv()
+
+    dimension_cache = create_dimension_cache(
+        float(environ.get("DIMENSION_CACHE_TTL", DIMENSION_CACHE_TTL)))
+
+    rollup_state = create_rollup_state()
+
+    last_readings = create_last_readings()
+
+    plant_stats = load_plant_stats(environ.get("PLANT_STATS_FILE", PLANT_STATS_FILE))
+
+    count_database_round_trips(get_database_engine(environ))
+
+    cadence = float(environ.get("CYCLE_SECONDS", CYCLE_SECONDS))
+
+    # Runs a cycle on every tick, optionally extracting the next cycle while this one loads
+    if environ.get("OVERLAP_EXTRACT_AND_LOAD", "false").lower() == "true":
+        run_pipelined_on_cadence(
+            lambda: extract_and_transform_cycle(environ),
+            lambda plants: load_cycle(environ, plants, dimension_cache, rollup_state,
+                                      last_readings, plant_stats), cadence)
+    else:
+        run_on_cadence(lambda: run_pipeline_cycle(environ, dimension_cache, rollup_state,
+                                                  last_readings, plant_stats), cadence)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Streaming per-plant statistics and anomaly alerts, updated as each batch arrives.
+
+For each plant's soil moisture and temperature the state keeps the count, mean,
+variance (Welford's method), min and max of the current day, plus an
+exponentially weighted mean and variance that follow the sensor's trend.
+Every reading updates them in constant time, so no history is re-read.
+
+Each new reading is checked against the state before it is added:
+- `spike` : a reading more than SPIKE_DEVIATIONS weighted standard deviations
+  from the weighted mean
+- `stuck_sensor` : STUCK_READINGS readings in a row with identical values
+- `missed_watering` : no watering for more than MAX_HOURS_BETWEEN_WATERINGS
+
+The state is checkpointed to disk each cycle, so a restart carries on from it.
+It holds when each plant's last reading was taken, and readings taken at or
+before it are skipped, as a restarted pipeline sees the API's current readings
+again before it has anything to compare them with.
+"""
+
+import json
+import math
+import os
+
+import pandas as pd
+
+PLANT_STATS_FILE = './data/plant_stats.json'
+ALERTS_LOG_FILE = './data/plant_alerts.jsonl'
+
+EWMA_ALPHA = 0.1
+MIN_READINGS = 10
+SPIKE_DEVIATIONS = 4
+MIN_DEVIATIONS = {"soil_moisture": 0.5, "temperature": 0.2}
+STUCK_READINGS = 30
+MAX_HOURS_BETWEEN_WATERINGS = 24
+
+READING_COLUMNS = {"soil_moisture": "Soil Moisture", "temperature": "Temperature"}
+
+
+def create_plant_stats() -> dict:
+    """Returns the state of a pipeline that hasn't seen any readings yet."""
+
+    return {"plants": {}}
+
+
+def load_plant_stats(filename: str = PLANT_STATS_FILE) -> dict:
+    """Loads the stats checkpointed by the previous cycle, or a fresh state."""
+
+    try:
+        with open(filename, encoding='utf-8') as stats_file:
+            return json.load(stats_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return create_plant_stats()
+
+
+def save_plant_stats(stats: dict, filename: str = PLANT_STATS_FILE) -> None:
+    """Checkpoints the stats, replacing the old file in one step so a crash can't corrupt it."""
+
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as stats_file:
+        json.dump(stats, stats_file)
+    os.replace(temp_filename, filename)
+
+
+def create_reading_stats(day: str) -> dict:
+    """Returns the stats of a sensor that hasn't taken a reading today."""
+
+    return {"day": day, "count": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None,
+            "ewma": None, "ewm_variance": 0.0, "ewm_count": 0}
+
+
+def get_variance(reading_stats: dict) -> float:
+    """Returns the variance of the day's readings."""
+
+    if reading_stats["count"] < 2:
+        return 0.0
+
+    return reading_stats["m2"] / (reading_stats["count"] - 1)
+
+
+def is_spike(reading_stats: dict, value: float, min_deviation: float) -> bool:
+    """Checks a reading against the weighted mean, once there are enough readings to trust it."""
+
+    if reading_stats["ewm_count"] < MIN_READINGS:
+        return False
+
+    deviation = max(math.sqrt(reading_stats["ewm_variance"]), min_deviation)
+
+    return abs(value - reading_stats["ewma"]) > SPIKE_DEVIATIONS * deviation
+
+
+def update_reading_stats(reading_stats: dict, value: float, day: str,
+                         alpha: float = EWMA_ALPHA) -> None:
+    """Adds a reading to the day's stats and the weighted mean and variance."""
+
+    if reading_stats["day"] != day:
+        reading_stats.update({key: default for key, default in create_reading_stats(day).items()
+                              if not key.startswith("ewm")})
+
+    reading_stats["count"] += 1
+    delta = value - reading_stats["mean"]
+    reading_stats["mean"] += delta / reading_stats["count"]
+    reading_stats["m2"] += delta * (value - reading_stats["mean"])
+    if reading_stats["count"] == 1:
+        reading_stats["min"] = reading_stats["max"] = value
+    else:
+        reading_stats["min"] = min(reading_stats["min"], value)
+        reading_stats["max"] = max(reading_stats["max"], value)
+
+    if reading_stats["ewma"] is None:
+        reading_stats["ewma"] = value
+    else:
+        difference = value - reading_stats["ewma"]
+        increment = alpha * difference
+        reading_stats["ewma"] += increment
+        reading_stats["ewm_variance"] = (1 - alpha) * (
+            reading_stats["ewm_variance"] + difference * increment)
+    reading_stats["ewm_count"] += 1
+
+
+def create_alert(alert_type: str, name: str, recording_taken: pd.Timestamp, **details) -> dict:
+    """Returns an alert for a plant's reading."""
+
+    return {"type": alert_type, "plant": name, "recording_taken": recording_taken.isoformat(),
+            **details}
+
+
+def check_watering(plant: dict, name: str, recording_taken: pd.Timestamp,
+                   last_watered: pd.Timestamp) -> list[dict]:
+    """Alerts once per watering when a plant has gone too long without another."""
+
+    overdue = recording_taken - last_watered > pd.Timedelta(hours=MAX_HOURS_BETWEEN_WATERINGS)
+
+    if not overdue or plant.get("watering_alerted_for") == last_watered.isoformat():
+        return []
+
+    plant["watering_alerted_for"] = last_watered.isoformat()
+
+    return [create_alert("missed_watering", name, recording_taken,
+                         last_watered=last_watered.isoformat())]
+
+
+def update_plant_stats(stats: dict, plant_data: pd.DataFrame) -> list[dict]:
+    """Adds a batch of new readings to each plant's stats, returning any alerts they raise."""
+
+    alerts = []
+
+    for reading in plant_data.sort_values("Recording Taken").to_dict('records'):
+        name = reading["Name"]
+        recording_taken = reading["Recording Taken"]
+        day = recording_taken.strftime("%Y-%m-%d")
+        values = {metric: float(reading[column]) for metric, column in READING_COLUMNS.items()}
+
+        plant = stats["plants"].setdefault(name, {
+            **{metric: create_reading_stats(day) for metric in READING_COLUMNS},
+            "last_values": None, "unchanged_readings": 0, "last_recording_taken": None})
+
+        last_recording_taken = plant.get("last_recording_taken")
+        if last_recording_taken and recording_taken <= pd.Timestamp(last_recording_taken):
+            continue
+        plant["last_recording_taken"] = recording_taken.isoformat()
+
+        for metric, value in values.items():
+            reading_stats = plant[metric]
+            if is_spike(reading_stats, value, MIN_DEVIATIONS[metric]):
+                alerts.append(create_alert("spike", name, recording_taken, metric=metric,
+                                           value=value, ewma=reading_stats["ewma"]))
+            update_reading_stats(reading_stats, value, day)
+
+        if plant["last_values"] == values:
+            plant["unchanged_readings"] += 1
+            if plant["unchanged_readings"] == STUCK_READINGS:
+                alerts.append(create_alert("stuck_sensor", name, recording_taken, **values))
+        else:
+            plant["unchanged_readings"] = 1
+        plant["last_values"] = values
+
+        alerts += check_watering(plant, name, recording_taken, reading["Last Watered"])
+
+    return alerts
+
+
+def write_alerts(alerts: list[dict], filename: str = ALERTS_LOG_FILE) -> None:
+    """Appends each alert to the log as a JSON line."""
+
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+    with open(filename, 'a', encoding='utf-8') as alerts_file:
+        for alert in alerts:
+            alerts_file.write(json.dumps(alert) + "\n")
@@ -0,0 +1,192 @@
+"""
+Hourly and daily rollups of the recordings, for charts over long ranges.
+
+Once an hour has finished, each plant's readings in it are summarised as a
+count with the mean, min and max soil moisture and temperature. Once a day
+has finished its hourly rollups are combined into daily ones. Rollups are
+kept when the transfer job clears the recordings, and are only ever inserted,
+so rolling up the same period twice changes nothing.
+
+A pipeline starting up carries on from the latest rollups in the table, or
+from its earliest recording if there are none, so the hours it missed while
+stopped are rolled up too. A day is only rolled up once all its hours are.
+"""
+
+import pandas as pd
+from sqlalchemy import sql, Connection
+
+from load import execute_staged_insert
+from instrumentation import timed
+
+MAX_CATCH_UP_PERIODS = 24
+
+ROLLUP_COLUMNS = ["plant_id", "resolution", "period_start", "reading_count",
+                  "soil_moisture_mean", "soil_moisture_min", "soil_moisture_max",
+                  "temperature_mean", "temperature_min", "temperature_max"]
+
+ROLLUP_INSERT_QUERY = f"""INSERT INTO s_delta.recording_rollup ({', '.join(ROLLUP_COLUMNS)})
+    SELECT {', '.join(f'staged.{column}' for column in ROLLUP_COLUMNS)} FROM staged
+    WHERE NOT EXISTS (SELECT 1 FROM s_delta.recording_rollup AS rollup
+        WHERE rollup.plant_id = staged.plant_id AND rollup.resolution = staged.resolution
+        AND rollup.period_start = staged.period_start)"""
+
+PERIOD_RECORDINGS_QUERY = sql.text("""SELECT plant_id, soil_moisture, temperature, recording_taken
+    FROM s_delta.recording
+    WHERE recording_taken >= :period_start AND recording_taken < :period_end""")
+
+PERIOD_HOURLY_ROLLUPS_QUERY = sql.text(f"""SELECT {', '.join(ROLLUP_COLUMNS)}
+    FROM s_delta.recording_rollup
+    WHERE resolution = 'hour' AND period_start >= :period_start AND period_start < :period_end""")
+
+ROLLUP_PROGRESS_QUERY = sql.text("""SELECT resolution, MAX(period_start)
+    FROM s_delta.recording_rollup GROUP BY resolution""")
+
+FIRST_PERIOD_QUERY = sql.text("""SELECT MIN(first_taken) FROM (
+    SELECT MIN(recording_taken) AS first_taken FROM s_delta.recording
+    UNION ALL
+    SELECT MIN(period_start) FROM s_delta.recording_rollup WHERE resolution = 'hour') AS firsts""")
+
+FREQUENCIES = {"hour": "h", "day": "D"}
+
+
+def create_rollup_state() -> dict:
+    """Returns the state of a pipeline that hasn't rolled anything up yet."""
+
+    return {"last_hour": None, "last_day": None}
+
+
+def load_rollup_state(connection: Connection) -> dict:
+    """
+    Returns the last hour and day rolled up, from the rollups table. A resolution
+    without any starts just before the earliest recording or hourly rollup.
+    """
+
+    latest = dict(connection.execute(ROLLUP_PROGRESS_QUERY).fetchall())
+    first = connection.execute(FIRST_PERIOD_QUERY).scalar()
+    state = create_rollup_state()
+
+    for resolution, frequency in FREQUENCIES.items():
+        if latest.get(resolution) is not None:
+            state[f"last_{resolution}"] = pd.Timestamp(latest[resolution])
+        elif first is not None:
+            state[f"last_{resolution}"] = (pd.Timestamp(first).floor(frequency)
+                                           - pd.Timedelta(1, frequency))
+
+    return state
+
+
+def roll_up_readings(readings: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """Summarises each plant's readings in each hour or day."""
+
+    periods = pd.to_datetime(readings["recording_taken"]).dt.floor(FREQUENCIES[resolution])
+
+    rollups = readings.groupby(["plant_id", periods]).agg(
+        reading_count=("soil_moisture", "size"),
+        soil_moisture_mean=("soil_moisture", "mean"),
+        soil_moisture_min=("soil_moisture", "min"),
+        soil_moisture_max=("soil_moisture", "max"),
+        temperature_mean=("temperature", "mean"),
+        temperature_min=("temperature", "min"),
+        temperature_max=("temperature", "max")).reset_index()
+
+    rollups = rollups.rename(columns={"recording_taken": "period_start"})
+    rollups["resolution"] = resolution
+
+    return rollups[ROLLUP_COLUMNS]
+
+
+def combine_rollups(rollups: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """Combines rollups into longer periods, weighting each mean by its reading count."""
+
+    combined = rollups.assign(
+        period_start=pd.to_datetime(rollups["period_start"]).dt.floor(FREQUENCIES[resolution]),
+        soil_moisture_total=rollups["soil_moisture_mean"] * rollups["reading_count"],
+        temperature_total=rollups["temperature_mean"] * rollups["reading_count"])
+
+    combined = combined.groupby(["plant_id", "period_start"]).agg(
+        reading_count=("reading_count", "sum"),
+        soil_moisture_total=("soil_moisture_total", "sum"),
+        soil_moisture_min=("soil_moisture_min", "min"),
+        soil_moisture_max=("soil_moisture_max", "max"),
+        temperature_total=("temperature_total", "sum"),
+        temperature_min=("temperature_min", "min"),
+        temperature_max=("temperature_max", "max")).reset_index()
+
+    combined["soil_moisture_mean"] = combined["soil_moisture_total"] / combined["reading_count"]
+    combined["temperature_mean"] = combined["temperature_total"] / combined["reading_count"]
+    combined["resolution"] = resolution
+
+    return combined[ROLLUP_COLUMNS]
+
+
+def get_completed_periods(last_period: pd.Timestamp | None, now: pd.Timestamp,
+                          frequency: str) -> list[pd.Timestamp]:
+    """
+    Returns the start of each period finished since `last_period`, oldest first.
+    Only the period just finished is returned when nothing has been rolled up.
+    After an outage no more than MAX_CATCH_UP_PERIODS are returned, the oldest,
+    so the next cycles carry on from where this one stops.
+    """
+
+    latest = now.floor(frequency) - pd.Timedelta(1, frequency)
+
+    if last_period is None:
+        return [latest]
+
+    periods = pd.date_range(last_period, latest, freq=frequency)[1:]
+
+    return list(periods[:MAX_CATCH_UP_PERIODS])
+
+
+@timed("write_hourly_rollups")
+def write_hourly_rollups(connection: Connection, hour: pd.Timestamp) -> None:
+    """Rolls up every plant's recordings taken in the hour."""
+
+    result = connection.execute(PERIOD_RECORDINGS_QUERY, {
+        "period_start": hour, "period_end": hour + pd.Timedelta(hours=1)})
+    readings = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    if not readings.empty:
+        execute_staged_insert(connection, ROLLUP_INSERT_QUERY, roll_up_readings(readings, "hour"))
+
+
+@timed("write_daily_rollups")
+def write_daily_rollups(connection: Connection, day: pd.Timestamp) -> None:
+    """Combines the hourly rollups of the day into daily ones."""
+
+    result = connection.execute(PERIOD_HOURLY_ROLLUPS_QUERY, {
+        "period_start": day, "period_end": day + pd.Timedelta(days=1)})
+    hourly = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    if not hourly.empty:
+        execute_staged_insert(connection, ROLLUP_INSERT_QUERY, combine_rollups(hourly, "day"))
+
+
+def write_completed_rollups(connection: Connection, state: dict, now: pd.Timestamp) -> None:
+    """
+    Writes the rollups of any hours and days that have finished since the last
+    cycle, and of days only once all their hours are rolled up. A new state is
+    first loaded from the rollups table. The state only moves on once they're
+    committed, so a failed cycle's periods are rolled up again by the next one.
+    """
+
+    if state["last_hour"] is None and state["last_day"] is None:
+        state.update(load_rollup_state(connection))
+
+    hours = get_completed_periods(state["last_hour"], now, "h")
+    last_hour = hours[-1] if hours else state["last_hour"]
+    rolled_up_to = now if last_hour is None else min(now, last_hour + pd.Timedelta(hours=1))
+    days = get_completed_periods(state["last_day"], rolled_up_to, "D")
+
+    for hour in hours:
+        write_hourly_rollups(connection, hour)
+
+    for day in days:
+        write_daily_rollups(connection, day)
+
+    connection.commit()
+
+    if hours:
+        state["last_hour"] = hours[-1]
+    if days:
+        state["last_day"] = days[-1]
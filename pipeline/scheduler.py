@@ -0,0 +1,78 @@
+"""
+Runs the pipeline on a fixed wall-clock cadence instead of sleeping between cycles.
+
+Cycles start on ticks aligned to the cadence (e.g. on the minute for 60 seconds).
+A cycle that overruns is logged and the ticks it missed are skipped, so the
+next cycle starts on the next tick rather than several starting back to back.
+"""
+
+import contextvars
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CYCLE_SECONDS = 60
+
+
+def get_next_tick(now: float, cadence: float) -> float:
+    """Returns the first tick aligned to the cadence strictly after `now`."""
+
+    return (math.floor(now / cadence) + 1) * cadence
+
+
+def run_on_cadence(cycle, cadence: float = CYCLE_SECONDS, max_cycles: int = None,
+                   clock=time.time, sleep=time.sleep) -> None:
+    """
+    Calls `cycle` once per tick, forever or for `max_cycles` cycles.
+    An exception in a cycle is logged and the schedule carries on.
+    """
+
+    next_tick = get_next_tick(clock(), cadence)
+    cycles_run = 0
+
+    while max_cycles is None or cycles_run < max_cycles:
+        sleep(max(0, next_tick - clock()))
+
+        tick = next_tick
+        try:
+            cycle()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.exception("Pipeline cycle for tick %s failed", tick)
+        cycles_run += 1
+
+        missed_ticks = math.floor((clock() - tick) / cadence)
+        if missed_ticks:
+            logging.warning("Pipeline cycle overran by %.1f seconds, skipping %s tick(s)",
+                            clock() - tick - cadence, missed_ticks)
+
+        next_tick = tick + (missed_ticks + 1) * cadence
+
+
+def run_pipelined_on_cadence(extract, load, cadence: float = CYCLE_SECONDS,
+                             max_cycles: int = None, clock=time.time, sleep=time.sleep) -> None:
+    """
+    Like run_on_cadence, but overlaps the two halves of consecutive cycles:
+    `extract()` for cycle N+1 runs while `load(data)` for cycle N runs in a
+    background thread. Only one load runs at a time, and each load runs in a
+    copy of its extract's context, so per-cycle state such as metrics stays
+    with the right cycle.
+    """
+
+    with ThreadPoolExecutor(max_workers=1) as loader:
+        pending_loads = []
+
+        def wait_for_load():
+            if pending_loads:
+                try:
+                    pending_loads.pop().result()
+                except Exception:  # pylint: disable=broad-exception-caught
+                    logging.exception("Pipeline load failed")
+
+        def pipelined_cycle():
+            data = extract()
+            wait_for_load()
+            pending_loads.append(loader.submit(contextvars.copy_context().run, load, data))
+
+        run_on_cadence(pipelined_cycle, cadence, max_cycles, clock, sleep)
+        wait_for_load()
@@ -0,0 +1,128 @@
+"""Unit tests for the historical recordings backfill."""
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import sql
+
+from backfill import (clean_recordings, insert_recordings, get_file_progress, backfill,
+                      backfill_file, load_checkpoint, CSV_COLUMNS)
+from local_database import create_local_engine
+
+TEST_CSV_ROWS = ["1,1,96.54,13.14,2023-12-19 15:02:35,2023-12-19 14:03:04",
+                 "2,2,95.98,12.02,2023-12-19 15:02:36,2023-12-19 13:54:32",
+                 "3,3,150.0,9.09,2023-12-19 15:02:37,2023-12-19 14:10:54",
+                 "4,1,96.54,13.14,2023-12-19 15:02:35,2023-12-19 14:03:04",
+                 "5,99,50.0,10.0,2023-12-19 15:02:38,2023-12-19 14:10:54",
+                 "6,1,94.1,13.2,2023-12-19 15:03:35,2023-12-19 14:03:04",
+                 "7,2,93.7,12.1,2023-12-19 15:03:36,not a date"]
+
+
+def write_test_csv(tmp_path) -> str:
+    """Writes the test rows as a headerless dump, returning its path."""
+
+    filename = tmp_path / "archive.csv"
+    filename.write_text("\n".join(TEST_CSV_ROWS) + "\n", encoding="utf-8")
+
+    return str(filename)
+
+
+def read_test_chunk() -> pd.DataFrame:
+    """Returns the test rows as a chunk read from a dump."""
+
+    return pd.DataFrame([row.split(",") for row in TEST_CSV_ROWS], columns=CSV_COLUMNS).astype(
+        {"plant_id": int, "soil_moisture": float, "temperature": float})
+
+
+def test_clean_recordings():
+    """Tests that invalid and repeated readings are dropped from a chunk."""
+
+    recordings = clean_recordings(read_test_chunk())
+
+    assert list(recordings.columns) == ["plant_id", "soil_moisture", "temperature",
+                                        "recording_taken", "last_watered"]
+    assert recordings["plant_id"].tolist() == [1, 2, 99, 1]
+    assert recordings["recording_taken"].iloc[0] == pd.Timestamp("2023-12-19 15:02:35")
+
+
+def test_insert_recordings_bulk_copies_on_sql_server():
+    """Tests that on SQL Server the recordings are bulk copied then inserted in one statement."""
+
+    mock_connection = MagicMock()
+    mock_connection.dialect.name = "mssql"
+    bulk_copy = mock_connection.connection.dbapi_connection.bulk_copy
+
+    insert_recordings(mock_connection, clean_recordings(read_test_chunk()))
+
+    table, rows = bulk_copy.call_args.args
+    assert table == "#recording_backfill"
+    assert rows[0] == (1, 96.54, 13.14, datetime.datetime(2023, 12, 19, 15, 2, 35),
+                       datetime.datetime(2023, 12, 19, 14, 3, 4))
+    assert mock_connection.execute.call_count == 2
+    mock_connection.commit.assert_called_once()
+
+
+def test_get_file_progress_restarts_on_new_chunk_size():
+    """Tests that a file's finished chunks are forgotten when the chunk size changes."""
+
+    checkpoint = {}
+    get_file_progress(checkpoint, "archive.csv", 100)["completed"].append(0)
+
+    assert get_file_progress(checkpoint, "archive.csv", 100)["completed"] == [0]
+    assert get_file_progress(checkpoint, "archive.csv", 50)["completed"] == []
+
+
+def test_backfill_loads_and_resumes(tmp_path):
+    """Tests that the backfill loads known plants' new readings and skips finished chunks."""
+
+    config = {"DB_BACKEND": "sqlite", "DB_PATH": str(tmp_path / "plants.db")}
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    filename = write_test_csv(tmp_path)
+    engine = create_local_engine(config["DB_PATH"])
+
+    with engine.begin() as connection:
+        connection.execute(sql.text(
+            "INSERT INTO s_delta.plant (plant_id, name) VALUES (1, 'Plant 1'), (2, 'Plant 2')"))
+
+    totals = backfill(config, [filename], workers=2, chunk_rows=2,
+                      checkpoint_file=checkpoint_file)
+    rerun_totals = backfill(config, [filename], workers=2, chunk_rows=2,
+                            checkpoint_file=checkpoint_file)
+
+    with engine.connect() as connection:
+        recordings = connection.execute(sql.text(
+            """SELECT plant_id, recording_taken FROM s_delta.recording
+            ORDER BY recording_taken""")).fetchall()
+
+    assert totals == {"rows_read": 7, "rows_valid": 5}
+    assert rerun_totals == {"rows_read": 0, "rows_valid": 0}
+    assert sorted(next(iter(load_checkpoint(checkpoint_file).values()))["completed"]) == [
+        0, 1, 2, 3]
+    assert [tuple(row) for row in recordings] == [(1, "2023-12-19 15:02:35"),
+                                                  (2, "2023-12-19 15:02:36"),
+                                                  (1, "2023-12-19 15:03:35")]
+
+
+def test_backfill_file_checkpoints_other_chunks_when_one_fails(tmp_path, monkeypatch):
+    """Tests that the chunks which loaded are checkpointed before a failed chunk's error."""
+
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    filename = write_test_csv(tmp_path)
+
+    def fake_load_chunk(_config, chunk_number, chunk):
+        if chunk_number == 1:
+            raise ValueError("Chunk 1 failed")
+        return chunk_number, len(chunk), len(chunk)
+
+    monkeypatch.setattr("backfill.load_chunk", fake_load_chunk)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match="Chunk 1 failed"):
+            backfill_file({}, filename, {}, executor, workers=2, chunk_rows=2,
+                          checkpoint_file=checkpoint_file)
+
+    assert sorted(next(iter(load_checkpoint(checkpoint_file).values()))["completed"]) == [
+        0, 2, 3]
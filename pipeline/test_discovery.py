@@ -0,0 +1,100 @@
+"""Unit tests for the plant id discovery functions."""
+
+from discovery import (create_discovery_state, load_discovery_state, save_discovery_state,
+                       get_plant_ids_to_fetch, discover_and_fetch, PLANT_FOUND, PLANT_NOT_FOUND,
+                       PLANT_FAILED)
+from extract import flatten_and_organize_data
+from fake_plants_api import make_plant_json
+
+
+def make_fake_fetch(live_ids: set, requests_made: list, failing_ids: set = frozenset()):
+    """
+    Returns a fetch function that only finds plants in `live_ids`, and fails
+    to fetch those in `failing_ids`, recording every id asked for.
+    """
+
+    def fake_fetch(plant_ids, results):
+        requests_made.extend(plant_ids)
+        for plant_id in plant_ids:
+            if plant_id in failing_ids:
+                results[plant_id] = PLANT_FAILED
+            else:
+                results[plant_id] = PLANT_FOUND if plant_id in live_ids else PLANT_NOT_FOUND
+        return [flatten_and_organize_data(make_plant_json(plant_id))
+                for plant_id in plant_ids if plant_id in live_ids - failing_ids]
+
+    return fake_fetch
+
+
+def test_discover_and_fetch_finds_all_plants_from_scratch():
+    """Tests that a fresh state keeps probing until a full window of misses."""
+
+    state = create_discovery_state()
+    requests_made = []
+
+    plants = discover_and_fetch(state, make_fake_fetch(set(range(51)), requests_made),
+                                max_consecutive_misses=5)
+
+    assert len(plants) == 51
+    assert state["known_max"] == 50
+    assert sorted(requests_made) == list(range(56))
+
+
+def test_discover_and_fetch_backs_off_dead_plants():
+    """Tests that missing ids below the highest id are only re-probed on a backoff."""
+
+    state = create_discovery_state()
+    live_ids = set(range(20)) - {7}
+    fake_fetch = make_fake_fetch(live_ids, [])
+
+    discover_and_fetch(state, fake_fetch, max_consecutive_misses=5)
+    assert state["dead"]["7"]["misses"] == 1
+
+    assert 7 in get_plant_ids_to_fetch(state, 5)
+    discover_and_fetch(state, fake_fetch, max_consecutive_misses=5)
+
+    assert state["dead"]["7"] == {"misses": 2, "next_probe": 3}
+    assert 7 not in get_plant_ids_to_fetch(state, 5)
+
+
+def test_discover_and_fetch_keeps_plants_that_fail():
+    """Tests that a live plant that times out once is still requested next cycle."""
+
+    state = create_discovery_state()
+    live_ids = set(range(20))
+
+    discover_and_fetch(state, make_fake_fetch(live_ids, []), max_consecutive_misses=5)
+    plants = discover_and_fetch(state, make_fake_fetch(live_ids, [], failing_ids={7}),
+                                max_consecutive_misses=5)
+
+    assert len(plants) == 19
+    assert 7 in state["live"]
+    assert "7" not in state["dead"]
+    assert 7 in get_plant_ids_to_fetch(state, 5)
+
+
+def test_discover_and_fetch_picks_up_new_plants():
+    """Tests that plants added beyond the known maximum are found on the next cycle."""
+
+    state = create_discovery_state()
+    live_ids = set(range(10))
+
+    discover_and_fetch(state, make_fake_fetch(live_ids, []), max_consecutive_misses=5)
+    live_ids.update(range(10, 200))
+    plants = discover_and_fetch(state, make_fake_fetch(live_ids, []), max_consecutive_misses=5)
+
+    assert len(plants) == 200
+    assert state["live"] == list(range(200))
+
+
+def test_discovery_state_round_trip(tmp_path):
+    """Tests that the state saved by one cycle is loaded by the next."""
+
+    filename = str(tmp_path / "state" / "discovery.json")
+    state = create_discovery_state()
+    discover_and_fetch(state, make_fake_fetch({0, 1, 3}, []))
+
+    save_discovery_state(state, filename)
+
+    assert load_discovery_state(filename) == state
+    assert load_discovery_state(str(tmp_path / "missing.json")) == create_discovery_state()
@@ -1,8 +1,13 @@
 """Basic unit tests for the extracting from API functions"""
 
+import asyncio
+import time
+
 import pytest
 
-from extract import flatten_and_organize_data, fetch_plant_data
+from extract import flatten_and_organize_data, fetch_plant_data, fetch_all_plant_data_async
+from fake_plants_api import start_fake_plants_api, make_plant_json
+from discovery import PLANT_FOUND, PLANT_NOT_FOUND, PLANT_FAILED
 
 
 TEST_DATA = {'botanist': {'email': 'carl.linnaeus@lnhm.co.uk',
@@ -40,3 +45,73 @@ def test_fetch_plant_data_fails_at_51():
     incorrect_outcome = fetch_plant_data(51)
 
     assert incorrect_outcome is None
+
+
+def test_fetch_all_plant_data_async_skips_missing_plants():
+    """Tests that the async extract returns flattened plants in id order, skipping errors."""
+
+    server, url = start_fake_plants_api(plant_ids=[0, 1, 3])
+
+    plants = asyncio.run(fetch_all_plant_data_async(range(5), api_url=url))
+    server.shutdown()
+
+    assert [plant["Id"] for plant in plants] == ["1", "2", "4"]
+    assert plants[0] == flatten_and_organize_data(make_plant_json(0))
+
+
+def test_fetch_all_plant_data_async_retries_server_errors():
+    """Tests that 500 responses and invalid json are retried until the plant recovers."""
+
+    server, url = start_fake_plants_api(plant_ids=range(3), failing_plants={1: 2},
+                                        invalid_json_plants={2})
+
+    plants = asyncio.run(fetch_all_plant_data_async(range(3), api_url=url, backoff_base=0.01))
+    server.shutdown()
+
+    assert [plant["Id"] for plant in plants] == ["1", "2"]
+    assert server.request_count == 1 + 3 + 4
+
+
+def test_fetch_all_plant_data_async_records_results():
+    """Tests that missing plants are recorded as not found, and errors and timeouts as failed."""
+
+    server, url = start_fake_plants_api(plant_ids=range(3), failing_plants={1: 100},
+                                        slow_plants={2: 2})
+    results = {}
+
+    asyncio.run(fetch_all_plant_data_async(range(4), api_url=url, plant_timeout=0.3,
+                                           max_retries=1, backoff_base=0.01, results=results))
+    server.shutdown()
+
+    assert results == {0: PLANT_FOUND, 1: PLANT_FAILED, 2: PLANT_FAILED, 3: PLANT_NOT_FOUND}
+
+
+def test_fetch_all_plant_data_async_drops_slow_plants():
+    """Tests that a plant slower than the per-plant timeout does not hold up the others."""
+
+    server, url = start_fake_plants_api(plant_ids=range(10), slow_plants={4: 2})
+
+    start = time.monotonic()
+    plants = asyncio.run(fetch_all_plant_data_async(range(10), api_url=url, plant_timeout=0.3))
+    elapsed = time.monotonic() - start
+    server.shutdown()
+
+    assert len(plants) == 9
+    assert elapsed < 1.5
+
+
+def test_fetch_all_plant_data_async_cycle_deadline():
+    """Tests that the whole extract returns once the cycle deadline passes."""
+
+    server, url = start_fake_plants_api(plant_ids=range(10), latency=0.05,
+                                        slow_plants={7: 3, 8: 3})
+
+    start = time.monotonic()
+    plants = asyncio.run(fetch_all_plant_data_async(range(10), api_url=url,
+                                                    cycle_deadline=0.5))
+    elapsed = time.monotonic() - start
+    server.shutdown()
+
+    assert len(plants) == 8
+    assert elapsed < 1.5
+
@@ -0,0 +1,90 @@
+"""Unit tests for the pipeline timing and metrics functions."""
+
+import json
+import time
+
+from instrumentation import (start_cycle_metrics, timed_span, timed, increment, set_value,
+                             observe_latency, write_metrics_log, format_prometheus_metrics,
+                             format_statsd_metrics, count_database_round_trips)
+from local_database import create_local_engine
+from sqlalchemy import sql
+
+
+def test_timed_span_records_duration():
+    """Tests that spans record elapsed seconds rather than timestamps."""
+
+    metrics = start_cycle_metrics()
+
+    with timed_span("extract"):
+        time.sleep(0.05)
+
+    assert 0.05 <= metrics["spans"]["extract"] < 1
+
+
+def test_timed_decorator_adds_up_calls():
+    """Tests that each call of a decorated function adds to its span."""
+
+    @timed("insert")
+    def insert(value):
+        return value
+
+    metrics = start_cycle_metrics()
+
+    assert insert(1) == 1
+    insert(2)
+
+    assert list(metrics["spans"]) == ["insert"]
+
+
+def test_observe_latency_buckets():
+    """Tests that latencies land in the right histogram buckets."""
+
+    metrics = start_cycle_metrics()
+
+    for seconds in [0.01, 0.07, 0.07, 30]:
+        observe_latency("plant_fetch_seconds", seconds)
+
+    histogram = metrics["histograms"]["plant_fetch_seconds"]
+    assert histogram["buckets"] == [1, 2, 0, 0, 0, 0, 0, 0, 0, 1]
+    assert histogram["count"] == 4
+
+
+def test_count_database_round_trips():
+    """Tests that each statement sent to the database is counted."""
+
+    engine = create_local_engine()
+    count_database_round_trips(engine)
+    metrics = start_cycle_metrics()
+
+    with engine.connect() as connection:
+        connection.execute(sql.text("SELECT 1"))
+        connection.execute(sql.text("SELECT 2"))
+
+    assert metrics["counters"]["db_round_trips"] == 2
+
+
+def test_metrics_exports(tmp_path):
+    """Tests the JSON line, Prometheus and StatsD outputs."""
+
+    metrics = start_cycle_metrics()
+    increment("db_round_trips", 3)
+    set_value("rows_extracted", 50)
+    observe_latency("plant_fetch_seconds", 0.2)
+    metrics["spans"]["load"] = 1.5
+
+    filename = tmp_path / "metrics.jsonl"
+    write_metrics_log(metrics, str(filename))
+    write_metrics_log(metrics, str(filename))
+
+    lines = filename.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["values"] == {"rows_extracted": 50}
+
+    prometheus = format_prometheus_metrics(metrics)
+    assert 'plant_pipeline_span_seconds{span="load"} 1.5' in prometheus
+    assert 'plant_pipeline_plant_fetch_seconds_bucket{le="0.25"} 1' in prometheus
+    assert 'plant_pipeline_plant_fetch_seconds_bucket{le="+Inf"} 1' in prometheus
+
+    assert format_statsd_metrics(metrics) == ["plant_pipeline.span.load:1500.000|ms",
+                                              "plant_pipeline.db_round_trips:3|c",
+                                              "plant_pipeline.rows_extracted:50|g"]
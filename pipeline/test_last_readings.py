@@ -0,0 +1,48 @@
+"""Unit tests for dropping readings that have already been loaded."""
+
+import pandas as pd
+
+from last_readings import create_last_readings, drop_unchanged_readings, remember_last_readings
+from test_load import make_cleaned_plant_data
+
+
+def test_first_cycle_keeps_every_reading():
+    """Tests that nothing is dropped before any readings have been loaded."""
+
+    plant_data = make_cleaned_plant_data(5, recordings_per_plant=2)
+
+    assert len(drop_unchanged_readings(plant_data, create_last_readings())) == 10
+
+
+def test_unchanged_readings_are_dropped():
+    """Tests that only plants with a new reading since the last load are kept."""
+
+    last_readings = create_last_readings()
+    remember_last_readings(make_cleaned_plant_data(5), last_readings)
+
+    plant_data = make_cleaned_plant_data(5)
+    plant_data.loc[plant_data["Name"] == "Plant 2", "Recording Taken"] += pd.Timedelta(minutes=1)
+
+    assert drop_unchanged_readings(plant_data, last_readings)["Name"].tolist() == ["Plant 2"]
+
+
+def test_repeated_readings_in_a_cycle_are_dropped():
+    """Tests that a reading repeated within the same data is kept once."""
+
+    plant_data = make_cleaned_plant_data(3)
+
+    new_readings = drop_unchanged_readings(pd.concat([plant_data, plant_data]),
+                                           create_last_readings())
+
+    assert new_readings["Name"].tolist() == ["Plant 0", "Plant 1", "Plant 2"]
+
+
+def test_remember_last_readings_keeps_latest():
+    """Tests that each plant's latest reading is remembered, whatever order they arrive in."""
+
+    last_readings = create_last_readings()
+    remember_last_readings(make_cleaned_plant_data(2, recordings_per_plant=3), last_readings)
+    remember_last_readings(make_cleaned_plant_data(2), last_readings)
+
+    assert last_readings == {"Plant 0": pd.Timestamp("2023-12-19 15:04:35"),
+                             "Plant 1": pd.Timestamp("2023-12-19 15:04:35")}
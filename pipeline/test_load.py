@@ -1,9 +1,15 @@
 """Unit tests created to ensure the functionality of the load script."""
 from unittest.mock import MagicMock
 
+import time
+
 import pandas as pd
+from sqlalchemy import event, sql
 
-from load import insert_into_location_table, insert_into_plant_table
+from load import (insert_into_location_table, insert_into_plant_table, bulk_load_plant_data,
+                  cached_load_plant_data, get_database_engine)
+from local_database import create_local_engine
+from dimension_cache import create_dimension_cache, get_dimension_cache_stats
 
 TEST_PLANT_DATA = [{"Id": "1", "Name": "Epipremnum Aureum", "watered": "2023-12-19 14:03:04",
                    "recording": "2023-12-19 15:02:35",
@@ -36,3 +42,156 @@ def test_insert_into_plant_table():
     insert_into_plant_table(mock_connection, plant_dataframe)
 
     assert mock_execute.call_count == len(plant_dataframe)
+
+
+def test_get_database_engine_reused():
+    """Tests that every cycle gets the same pooled engine for the same database."""
+
+    config = {"DB_USERNAME": "user", "DB_PASSWORD": "password", "DB_HOST": "localhost",
+              "DB_POOL_SIZE": "3"}
+
+    engine = get_database_engine(config)
+
+    assert get_database_engine(dict(config)) is engine
+    assert engine.pool.size() == 3
+    assert engine.url.database == "plants"
+
+
+def test_get_database_engine_connects_to_db_name():
+    """Tests that the engine selects DB_NAME itself, as the bulk load never runs `USE`."""
+
+    config = {"DB_USERNAME": "user", "DB_PASSWORD": "password", "DB_HOST": "localhost",
+              "DB_NAME": "plants_staging"}
+
+    assert get_database_engine(config).url.database == "plants_staging"
+
+
+def make_cleaned_plant_data(plant_count: int, recordings_per_plant: int = 1,
+                            first_reading: str = "2023-12-19 15:02:35") -> pd.DataFrame:
+    """Builds cleaned plant data shaped like the transform output."""
+
+    rows = [{"Id": str(plant + 1), "Name": f"Plant {plant}",
+             "Last Watered": pd.Timestamp("2023-12-19 14:03:04"),
+             "Recording Taken": pd.Timestamp(first_reading) + pd.Timedelta(minutes=reading),
+             "Soil Moisture": 96.54, "Temperature": 13.14,
+             "Botanist Name": f"Botanist {plant % 3}",
+             "Botanist Email": f"botanist.{plant % 3}@lnhm.co.uk",
+             "Botanist Phone": "(146)994-1635x35992",
+             "Region": f"Region {plant % 7}", "Continent": "America", "Country": "Brazil"}
+            for reading in range(recordings_per_plant) for plant in range(plant_count)]
+
+    return pd.DataFrame(rows)
+
+
+def test_bulk_load_plant_data_constant_statements():
+    """Tests that the bulk load uses one statement per table however many rows there are."""
+
+    mock_connection = MagicMock()
+
+    bulk_load_plant_data(mock_connection, make_cleaned_plant_data(50, 2))
+
+    assert mock_connection.execute.call_count == 4
+
+
+def test_bulk_load_plant_data_upserts_dimensions():
+    """Tests that repeated cycles add recordings without duplicating dimension rows."""
+
+    engine = create_local_engine()
+    plant_data = make_cleaned_plant_data(20)
+
+    with engine.connect() as connection:
+        bulk_load_plant_data(connection, plant_data)
+        bulk_load_plant_data(connection, make_cleaned_plant_data(
+            25, first_reading="2023-12-19 15:03:35"))
+
+        counts = {table: connection.execute(
+            sql.text(f"SELECT COUNT(*) FROM s_delta.{table}")).scalar()
+            for table in ["botanist", "location", "plant", "recording"]}
+        plant = connection.execute(sql.text(
+            """SELECT bot.email, loc.region FROM s_delta.plant AS plant
+            JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
+            JOIN s_delta.location AS loc ON plant.location_id = loc.location_id
+            WHERE plant.name = 'Plant 10'""")).fetchone()
+
+    assert counts == {"botanist": 3, "location": 7, "plant": 25, "recording": 45}
+    assert tuple(plant) == ("botanist.1@lnhm.co.uk", "Region 3")
+
+
+def count_rows(connection) -> dict:
+    """Returns the number of rows in each s_delta table."""
+
+    return {table: connection.execute(sql.text(f"SELECT COUNT(*) FROM s_delta.{table}")).scalar()
+            for table in ["botanist", "location", "plant", "recording"]}
+
+
+def test_cached_load_plant_data_steady_state():
+    """Tests that once the cache is warm a cycle only sends the recordings insert."""
+
+    engine = create_local_engine()
+    cache = create_dimension_cache()
+    statements = []
+
+    with engine.connect() as connection:
+        cached_load_plant_data(connection, make_cleaned_plant_data(20), cache)
+
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        cached_load_plant_data(connection, make_cleaned_plant_data(
+            20, first_reading="2023-12-19 15:03:35"), cache)
+        cycle_statements = list(statements)
+
+        assert count_rows(connection) == {"botanist": 3, "location": 7, "plant": 20,
+                                          "recording": 40}
+
+    assert len(cycle_statements) == 1
+    assert "s_delta.recording" in cycle_statements[0]
+    assert get_dimension_cache_stats(cache)["plant"] == {"size": 20, "hits": 60, "misses": 20}
+
+
+def test_cached_load_plant_data_constraint_violation():
+    """Tests that an out of date cache is dropped and the cycle still loads."""
+
+    engine = create_local_engine()
+
+    with engine.connect() as connection:
+        bulk_load_plant_data(connection, make_cleaned_plant_data(5))
+
+        stale_cache = create_dimension_cache()
+        stale_cache["loaded_at"] = time.monotonic()
+        cached_load_plant_data(connection, make_cleaned_plant_data(
+            5, first_reading="2023-12-19 15:03:35"), stale_cache)
+
+        assert count_rows(connection) == {"botanist": 3, "location": 5, "plant": 5,
+                                          "recording": 10}
+
+    assert stale_cache["loaded_at"] is None
+
+
+def test_repeated_readings_are_skipped():
+    """Tests that readings already in the table, or repeated in a batch, are only loaded once."""
+
+    engine = create_local_engine()
+    cache = create_dimension_cache()
+    plant_data = make_cleaned_plant_data(10, recordings_per_plant=2)
+
+    with engine.connect() as connection:
+        bulk_load_plant_data(connection, pd.concat([plant_data, plant_data]))
+        bulk_load_plant_data(connection, plant_data)
+        cached_load_plant_data(connection, make_cleaned_plant_data(10, recordings_per_plant=3),
+                               cache)
+
+        assert count_rows(connection)["recording"] == 30
+
+
+def test_get_database_engine_sqlite_backend(tmp_path):
+    """Tests that the SQLite backend creates the schema in a file that later engines reuse."""
+
+    config = {"DB_BACKEND": "sqlite", "DB_PATH": str(tmp_path / "data" / "plants.db")}
+
+    with get_database_engine(config).connect() as connection:
+        bulk_load_plant_data(connection, make_cleaned_plant_data(5))
+
+    assert get_database_engine(dict(config)) is get_database_engine(config)
+
+    with create_local_engine(config["DB_PATH"]).connect() as connection:
+        assert count_rows(connection) == {"botanist": 3, "location": 5, "plant": 5,
+                                          "recording": 5}
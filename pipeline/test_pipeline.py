@@ -0,0 +1,18 @@
+"""Unit tests for the pipeline's cycle functions."""
+
+import logging
+
+from dimension_cache import create_dimension_cache
+from pipeline import log_cycle_metrics
+
+
+def test_log_cycle_metrics_totals_every_phase(caplog):
+    """Tests that the total execution time includes checking the readings."""
+
+    metrics = {"spans": {"extract": 1.0, "transform": 0.5, "connection_acquire": 0.25,
+                         "load": 2.0, "insert_cached_recordings": 1.5, "stats": 0.5}}
+
+    with caplog.at_level(logging.DEBUG):
+        log_cycle_metrics(metrics, create_dimension_cache())
+
+    assert caplog.messages[-1].endswith(': Total execution time: 4.0 seconds')
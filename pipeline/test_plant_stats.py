@@ -0,0 +1,107 @@
+"""Unit tests for the streaming per-plant stats and alerts."""
+
+import statistics
+
+import pandas as pd
+import pytest
+
+from plant_stats import (create_plant_stats, update_plant_stats, get_variance, load_plant_stats,
+                         save_plant_stats, STUCK_READINGS)
+
+
+def make_readings(moisture: list[float], temperature: list[float] = None,
+                  last_watered: str = "2023-12-19 08:00:00") -> pd.DataFrame:
+    """Builds one plant's cleaned readings, a minute apart."""
+
+    return pd.DataFrame({
+        "Name": "Venus flytrap",
+        "Recording Taken": pd.date_range("2023-12-19 09:00:00", periods=len(moisture), freq="min"),
+        "Last Watered": pd.Timestamp(last_watered),
+        "Soil Moisture": moisture,
+        "Temperature": temperature or [12.0 + (reading % 3) / 10
+                                       for reading in range(len(moisture))]})
+
+
+def test_update_plant_stats_matches_batch_stats():
+    """Tests that stats built a batch at a time match those of all the readings at once."""
+
+    moisture = [40.0 + (reading * 7) % 5 for reading in range(20)]
+    stats = create_plant_stats()
+
+    readings = make_readings(moisture)
+    update_plant_stats(stats, readings[:7])
+    update_plant_stats(stats, readings[7:])
+
+    moisture_stats = stats["plants"]["Venus flytrap"]["soil_moisture"]
+    assert moisture_stats["count"] == 20
+    assert moisture_stats["mean"] == pytest.approx(statistics.mean(moisture))
+    assert get_variance(moisture_stats) == pytest.approx(statistics.variance(moisture))
+    assert (moisture_stats["min"], moisture_stats["max"]) == (40.0, 44.0)
+
+
+def test_spike_alert():
+    """Tests that a reading far from the plant's trend raises a spike alert."""
+
+    moisture = [40.0 + reading % 2 for reading in range(20)] + [90.0]
+
+    alerts = update_plant_stats(create_plant_stats(), make_readings(moisture))
+
+    assert [(alert["type"], alert["metric"], alert["value"]) for alert in alerts] == [
+        ("spike", "soil_moisture", 90.0)]
+
+
+def test_stuck_sensor_alerts_once():
+    """Tests that a sensor repeating the same values is reported once, not every cycle."""
+
+    stats = create_plant_stats()
+    readings = make_readings([40.0] * (STUCK_READINGS + 10), [12.0] * (STUCK_READINGS + 10))
+
+    alerts = update_plant_stats(stats, readings[:20]) + update_plant_stats(stats, readings[20:])
+
+    assert [alert["type"] for alert in alerts] == ["stuck_sensor"]
+    assert alerts[0]["recording_taken"] == "2023-12-19T09:29:00"
+
+
+def test_missed_watering_alerts_once_per_watering():
+    """Tests that an overdue plant is reported once until it is watered again."""
+
+    stats = create_plant_stats()
+
+    alerts = update_plant_stats(stats, make_readings([40.0, 41.0],
+                                                     last_watered="2023-12-18 08:00:00"))
+    alerts += update_plant_stats(stats, make_readings([42.0], last_watered="2023-12-18 08:00:00"))
+
+    assert [alert["last_watered"] for alert in alerts] == ["2023-12-18T08:00:00"]
+
+
+def test_plant_stats_checkpoint(tmp_path):
+    """Tests that the stats carry on from the checkpoint after a restart."""
+
+    filename = str(tmp_path / "plant_stats.json")
+    stats = create_plant_stats()
+    update_plant_stats(stats, make_readings([40.0, 42.0]))
+
+    save_plant_stats(stats, filename)
+    restored = load_plant_stats(filename)
+
+    assert restored == stats
+    assert restored["plants"]["Venus flytrap"]["last_recording_taken"] == "2023-12-19T09:01:00"
+    assert load_plant_stats(str(tmp_path / "missing.json")) == create_plant_stats()
+
+
+def test_update_plant_stats_skips_readings_already_counted(tmp_path):
+    """Tests that readings seen again after a restart aren't counted a second time."""
+
+    filename = str(tmp_path / "plant_stats.json")
+    readings = make_readings([40.0, 42.0, 44.0])
+    stats = create_plant_stats()
+    update_plant_stats(stats, readings[:2])
+    save_plant_stats(stats, filename)
+
+    restored = load_plant_stats(filename)
+    update_plant_stats(restored, readings)
+
+    moisture_stats = restored["plants"]["Venus flytrap"]["soil_moisture"]
+    assert moisture_stats["count"] == 3
+    assert moisture_stats["mean"] == pytest.approx(42.0)
+    assert restored["plants"]["Venus flytrap"]["unchanged_readings"] == 1
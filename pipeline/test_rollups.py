@@ -0,0 +1,146 @@
+"""Unit tests for the hourly and daily rollups."""
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from sqlalchemy import sql
+
+from local_database import create_local_engine
+from load import bulk_load_plant_data
+from rollups import (roll_up_readings, combine_rollups, get_completed_periods,
+                     write_completed_rollups, create_rollup_state, load_rollup_state)
+from test_load import make_cleaned_plant_data
+
+
+def make_readings() -> pd.DataFrame:
+    """Builds recordings for two plants across two hours."""
+
+    return pd.DataFrame({
+        "plant_id": [1, 1, 1, 2],
+        "soil_moisture": [10.0, 20.0, 60.0, 50.0],
+        "temperature": [12.0, 14.0, 16.0, 20.0],
+        "recording_taken": pd.to_datetime(["2023-12-19 15:01:00", "2023-12-19 15:59:00",
+                                           "2023-12-19 16:30:00", "2023-12-19 15:30:00"])})
+
+
+def test_roll_up_readings():
+    """Tests that readings are summarised per plant per hour."""
+
+    rollups = roll_up_readings(make_readings(), "hour")
+
+    first = rollups.iloc[0]
+    assert len(rollups) == 3
+    assert first["period_start"] == pd.Timestamp("2023-12-19 15:00:00")
+    assert (first["reading_count"], first["soil_moisture_mean"],
+            first["soil_moisture_min"], first["soil_moisture_max"]) == (2, 15.0, 10.0, 20.0)
+
+
+def test_combine_rollups_weights_means_by_count():
+    """Tests that daily means match the mean of every reading, not of the hourly means."""
+
+    daily = combine_rollups(roll_up_readings(make_readings(), "hour"), "day")
+
+    plant_one = daily[daily["plant_id"] == 1].iloc[0]
+    assert plant_one["reading_count"] == 3
+    assert plant_one["soil_moisture_mean"] == pytest.approx(30.0)
+    assert (plant_one["temperature_min"], plant_one["temperature_max"]) == (12.0, 16.0)
+    assert plant_one["resolution"] == "day"
+
+
+def test_get_completed_periods():
+    """Tests which hours are rolled up on a first run, a normal cycle and after an outage."""
+
+    now = pd.Timestamp("2023-12-19 16:00:30")
+
+    assert get_completed_periods(None, now, "h") == [pd.Timestamp("2023-12-19 15:00")]
+    assert get_completed_periods(pd.Timestamp("2023-12-19 15:00"), now, "h") == []
+    assert get_completed_periods(pd.Timestamp("2023-12-19 13:00"), now, "h") == [
+        pd.Timestamp("2023-12-19 14:00"), pd.Timestamp("2023-12-19 15:00")]
+    caught_up = get_completed_periods(pd.Timestamp("2023-11-19 13:00"), now, "h")
+    assert len(caught_up) == 24
+    assert caught_up[0] == pd.Timestamp("2023-11-19 14:00")
+
+
+def test_write_completed_rollups_once():
+    """Tests that finished hours and days are written once, however many cycles run."""
+
+    engine = create_local_engine()
+    state = create_rollup_state()
+
+    with engine.connect() as connection:
+        bulk_load_plant_data(connection, make_cleaned_plant_data(4, recordings_per_plant=3))
+
+        write_completed_rollups(connection, state, pd.Timestamp("2023-12-19 16:00:10"))
+        write_completed_rollups(connection, state, pd.Timestamp("2023-12-19 16:01:10"))
+        write_completed_rollups(connection, state, pd.Timestamp("2023-12-20 00:00:10"))
+        write_completed_rollups(connection, create_rollup_state(),
+                                pd.Timestamp("2023-12-20 00:01:10"))
+
+        rollups = connection.execute(sql.text(
+            """SELECT resolution, COUNT(*), SUM(reading_count)
+            FROM s_delta.recording_rollup GROUP BY resolution ORDER BY resolution""")).fetchall()
+
+    # The readings are all taken between 15:02 and 15:04
+    assert state["last_hour"] == pd.Timestamp("2023-12-19 23:00")
+    assert [tuple(row) for row in rollups] == [("day", 4, 12), ("hour", 4, 12)]
+
+
+def test_write_completed_rollups_keeps_state_on_failure(monkeypatch):
+    """Tests that periods whose rollups fail aren't skipped by the next cycle."""
+
+    state = create_rollup_state()
+    state["last_hour"] = pd.Timestamp("2023-12-19 14:00")
+    connection = MagicMock()
+
+    def fail_after_first_hour(_, hour):
+        if hour > pd.Timestamp("2023-12-19 15:00"):
+            raise RuntimeError("database went away")
+
+    monkeypatch.setattr("rollups.write_hourly_rollups", fail_after_first_hour)
+
+    with pytest.raises(RuntimeError):
+        write_completed_rollups(connection, state, pd.Timestamp("2023-12-19 17:00:10"))
+
+    connection.commit.assert_not_called()
+    assert state == {"last_hour": pd.Timestamp("2023-12-19 14:00"), "last_day": None}
+
+
+def test_restarted_pipeline_rolls_up_missed_hours():
+    """Tests that a new state carries on from the table, so hours missed while stopped are kept."""
+
+    engine = create_local_engine()
+
+    with engine.connect() as connection:
+        bulk_load_plant_data(connection, make_cleaned_plant_data(4, recordings_per_plant=3))
+
+        assert load_rollup_state(connection) == {"last_hour": pd.Timestamp("2023-12-19 14:00"),
+                                                 "last_day": pd.Timestamp("2023-12-18")}
+
+        state = create_rollup_state()
+        write_completed_rollups(connection, state, pd.Timestamp("2023-12-19 18:00:10"))
+
+        hourly = connection.execute(sql.text(
+            """SELECT period_start, SUM(reading_count) FROM s_delta.recording_rollup
+            WHERE resolution = 'hour' GROUP BY period_start""")).fetchall()
+
+        assert load_rollup_state(connection)["last_hour"] == pd.Timestamp("2023-12-19 15:00")
+
+    assert state["last_hour"] == pd.Timestamp("2023-12-19 17:00")
+    assert [tuple(row) for row in hourly] == [("2023-12-19 15:00:00", 12)]
+
+
+def test_days_wait_for_their_hours(monkeypatch):
+    """Tests that a day is only rolled up once every hour of it has been."""
+
+    state = {"last_hour": pd.Timestamp("2023-12-19 10:00"),
+             "last_day": pd.Timestamp("2023-12-18")}
+    days = []
+
+    monkeypatch.setattr("rollups.write_hourly_rollups", lambda connection, hour: None)
+    monkeypatch.setattr("rollups.write_daily_rollups",
+                        lambda connection, day: days.append(day))
+
+    write_completed_rollups(MagicMock(), state, pd.Timestamp("2023-12-21 00:00:10"))
+
+    assert state["last_hour"] == pd.Timestamp("2023-12-20 10:00")
+    assert days == [pd.Timestamp("2023-12-19")]
@@ -0,0 +1,95 @@
+"""Unit tests for the pipeline scheduler."""
+
+import contextvars
+
+from scheduler import get_next_tick, run_on_cadence, run_pipelined_on_cadence
+
+
+def make_fake_clock(start: float):
+    """Returns a clock, a sleep that advances it, and the list of times slept until."""
+
+    now = [start]
+    woke_at = []
+
+    def clock():
+        return now[0]
+
+    def sleep(seconds):
+        now[0] += seconds
+        woke_at.append(now[0])
+
+    return clock, sleep, now, woke_at
+
+
+def test_get_next_tick_aligns_to_cadence():
+    """Tests that ticks land on multiples of the cadence."""
+
+    assert get_next_tick(125, 60) == 180
+    assert get_next_tick(180, 60) == 240
+
+
+def test_run_on_cadence_fixed_ticks():
+    """Tests that cycles start on the ticks however long each cycle takes."""
+
+    clock, sleep, now, woke_at = make_fake_clock(1010)
+    durations = iter([5, 40, 12])
+
+    def cycle():
+        now[0] += next(durations)
+
+    run_on_cadence(cycle, 60, max_cycles=3, clock=clock, sleep=sleep)
+
+    assert woke_at == [1020, 1080, 1140]
+
+
+def test_run_on_cadence_skips_missed_ticks(caplog):
+    """Tests that an overrunning cycle skips the ticks it missed and logs the overrun."""
+
+    clock, sleep, now, woke_at = make_fake_clock(0)
+    durations = iter([130, 10, 10])
+
+    def cycle():
+        now[0] += next(durations)
+
+    run_on_cadence(cycle, 60, max_cycles=3, clock=clock, sleep=sleep)
+
+    assert woke_at == [60, 240, 300]
+    assert "skipping 2 tick(s)" in caplog.text
+
+
+def test_run_on_cadence_survives_failed_cycle(caplog):
+    """Tests that one failing cycle doesn't stop the schedule."""
+
+    clock, sleep, _, _ = make_fake_clock(0)
+    cycles = []
+
+    def cycle():
+        cycles.append(len(cycles))
+        if len(cycles) == 1:
+            raise ValueError("API down")
+
+    run_on_cadence(cycle, 60, max_cycles=3, clock=clock, sleep=sleep)
+
+    assert cycles == [0, 1, 2]
+    assert "API down" in caplog.text
+
+
+def test_run_pipelined_on_cadence_loads_each_cycle_in_its_context():
+    """Tests that every extracted cycle is loaded, in the context of its own extract."""
+
+    clock, sleep, _, _ = make_fake_clock(0)
+    cycle_number = contextvars.ContextVar("cycle_number")
+    extracted = iter(range(4))
+    loaded = []
+
+    def extract():
+        number = next(extracted)
+        cycle_number.set(number)
+        return number
+
+    def load(data):
+        loaded.append((data, cycle_number.get()))
+
+    run_pipelined_on_cadence(extract, load, 60, max_cycles=4, clock=clock, sleep=sleep)
+
+    assert loaded == [(0, 0), (1, 1), (2, 2), (3, 3)]
@@ -0,0 +1,55 @@
+"""Unit tests for the startup import time gate."""
+import os
+
+from benchmark_startup import (parse_import_times, find_regressions, time_import,
+                               measure_startup, get_baseline_file, get_machine_id,
+                               DEFERRED_IMPORTS)
+
+TEST_IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       950 |       1070 | encodings
+import time:      2893 |      28596 | pipeline"""
+
+
+def test_parse_import_times():
+    """Tests that each module's cumulative import time is read from the output."""
+
+    assert parse_import_times(TEST_IMPORTTIME_OUTPUT) == {"_io": 120, "encodings": 1070,
+                                                          "pipeline": 28596}
+
+
+def test_find_regressions():
+    """Tests that only modules over the allowed regression, with a baseline, are reported."""
+
+    medians = {"pipeline": 30_000, "extract": 400_000, "transform": 500_000}
+    baseline = {"pipeline": 28_000, "extract": 250_000}
+
+    assert find_regressions(medians, baseline, 50) == ["extract"]
+    assert find_regressions({"archive": 9_000}, {"archive": 5_000}, 50) == []
+
+
+def test_pipeline_defers_heavy_imports():
+    """Tests that importing the pipeline doesn't load any of its deferred dependencies."""
+
+    loaded = time_import("pipeline")
+
+    assert "pipeline" in loaded
+    assert not [name for name in DEFERRED_IMPORTS["pipeline"] if name in loaded]
+
+
+def test_measure_startup_in_another_directory(tmp_path):
+    """Tests that another service's modules are timed from its directory with its own imports."""
+
+    (tmp_path / "service.py").write_text("import json\n", encoding="utf-8")
+
+    medians, eager_imports = measure_startup(1, {"service": ["json", "csv"]}, str(tmp_path))
+
+    assert list(medians) == ["service"]
+    assert eager_imports == {"service": ["json"]}
+
+
+def test_baselines_are_kept_per_machine():
+    """Tests that each machine id has its own startup baseline, beside pytest-benchmark's."""
+
+    assert get_baseline_file("service") == os.path.join(
+        "service", "benchmark_baselines", get_machine_id(), "startup_baseline.json")
@@ -1,8 +1,11 @@
+import warnings
+
 import pytest
 import pandas as pd
 from datetime import datetime
 
-from transform import standardize_country_name, remove_rows_with_null, check_soil_temp_valid, check_soil_moisture_valid, normalize_datetimes
+import transform
+from transform import standardize_country_name, remove_rows_with_null, check_soil_temp_valid, check_soil_moisture_valid, normalize_datetimes, standardize_country_names, clean_plant_data, change_temp_and_moisture_to_two_dp
 
 
 def test_standardize_country_name():
@@ -25,6 +28,47 @@ def test_standardize_country_name_4():
     assert standardize_country_name('CL') == 'Chile'
 
 
+def test_standardize_country_names_converts_each_code_once(monkeypatch, tmp_path):
+    """Testing each unique code is converted once, then served from the saved cache"""
+    conversions = []
+
+    def fake_convert(country_code):
+        conversions.append(country_code)
+        return {'AN': 'Netherlands Antilles', 'YU': 'Yugoslavia'}[country_code]
+
+    monkeypatch.setattr(transform, 'COUNTRY_NAMES', {})
+    monkeypatch.setattr(transform, 'convert_country_code', fake_convert)
+    cache_file = str(tmp_path / 'country_names.json')
+
+    names = standardize_country_names(pd.Series(['AN', 'YU', 'AN', 'AN']), cache_file)
+
+    assert list(names) == ['Netherlands Antilles', 'Yugoslavia', 'Netherlands Antilles',
+                           'Netherlands Antilles']
+    assert names.dtype == 'category'
+    assert sorted(conversions) == ['AN', 'YU']
+
+    monkeypatch.setattr(transform, 'COUNTRY_NAMES', {})
+    names = standardize_country_names(pd.Series(['YU', 'AN']), cache_file)
+
+    assert list(names) == ['Yugoslavia', 'Netherlands Antilles']
+    assert len(conversions) == 2
+
+
+def test_standardize_country_names_uses_precomputed_table(monkeypatch, tmp_path):
+    """Testing codes in the precomputed table need neither the converter nor the cache"""
+    def fake_convert(country_code):
+        raise AssertionError(f'{country_code} should be in the table')
+
+    monkeypatch.setattr(transform, 'COUNTRY_NAMES', {})
+    monkeypatch.setattr(transform, 'convert_country_code', fake_convert)
+    cache_file = tmp_path / 'country_names.json'
+
+    names = standardize_country_names(pd.Series(['BR', 'GB', 'UK', 'NA']), str(cache_file))
+
+    assert list(names) == ['Brazil', 'United Kingdom', 'United Kingdom', 'Namibia']
+    assert not cache_file.exists()
+
+
 def test_remove_rows_with_null():
     """Testing that null rows in given columns are dropped"""
     data = {'A': [None, 2, 1, 4],
@@ -96,3 +140,57 @@ def test_normalize_datetimes_invalid_datetime():
     assert df.to_dict() == {'Plant Name': {},
                             'Last Watered': {},
                             'Recording Taken': {}}
+
+
+def make_raw_plant_data():
+    """Plant data as it comes out of extract, with one problem per invalid row"""
+    rows = [{'Id': str(plant), 'Name': f'Plant{plant}',
+             'Last Watered': 'Mon, 18 Dec 2023 14:03:04 GMT',
+             'Recording Taken': '2023-12-18 14:50:56',
+             'Soil Moisture': 50.4567, 'Temperature': 12.3456,
+             'Botanist Name': 'Carl Linnaeus', 'Botanist Email': 'carl.linnaeus@lnhm.co.uk',
+             'Botanist Phone': '(146)994-1635x35992'} for plant in range(6)]
+    rows[1]['Botanist Email'] = None
+    rows[2]['Soil Moisture'] = 101
+    rows[3]['Temperature'] = -3
+    rows[4]['Recording Taken'] = 'not a date'
+
+    return pd.DataFrame(rows)
+
+
+def test_clean_plant_data_matches_chained_functions():
+    """Testing the fused transform gives the same result as the individual steps"""
+    chained = remove_rows_with_null(make_raw_plant_data(), ['Botanist Email'])
+    chained = check_soil_moisture_valid(chained)
+    chained = check_soil_temp_valid(chained)
+    chained = normalize_datetimes(chained.copy())
+    chained = change_temp_and_moisture_to_two_dp(chained)
+
+    cleaned = clean_plant_data(make_raw_plant_data())
+
+    pd.testing.assert_frame_equal(cleaned, chained)
+    assert list(cleaned['Id']) == ['0', '5']
+    assert cleaned['Soil Moisture'].iloc[0] == 50.46
+
+
+def test_clean_plant_data_leaves_input_unchanged():
+    """Testing the fused transform returns a new data frame"""
+    raw = make_raw_plant_data()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        clean_plant_data(raw)
+
+    pd.testing.assert_frame_equal(raw, make_raw_plant_data())
+
+
+def test_clean_plant_data_with_duplicate_index():
+    """Testing the parsed datetimes go to their own rows when the index repeats"""
+    raw = make_raw_plant_data()
+    raw['Recording Taken'] = [f'2023-12-18 14:5{plant}:00' for plant in range(6)]
+    raw.index = [0, 0, 1, 1, 2, 2]
+
+    cleaned = clean_plant_data(raw)
+
+    assert list(cleaned['Id']) == ['0', '4', '5']
+    assert [taken.minute for taken in cleaned['Recording Taken']] == [50, 54, 55]
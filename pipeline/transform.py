@@ -1,14 +1,94 @@
 """Transform script that produces cleaned data after extracting from APIs"""
 
+import json
+import os
+
+import numpy as np
 import pandas as pd
-import country_converter as coco
+
+from country_codes import COUNTRY_CODE_NAMES
+
+COUNTRY_CACHE_FILE = './data/country_names.json'
+
+LAST_WATERED_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+RECORDING_TAKEN_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+REQUIRED_COLUMNS = ["Id", "Name", "Recording Taken", "Soil Moisture",
+                    "Temperature", "Botanist Name", "Botanist Email", "Botanist Phone"]
+
+COUNTRY_NAMES = {}
+
+
+def convert_country_code(country_code: str) -> str:
+    """
+    Convert a country code with country_converter, which is only imported
+    the first time a code is missing from both the precomputed table and the cache.
+    """
+    import country_converter as coco  # pylint: disable=import-outside-toplevel
+
+    return coco.convert(names=country_code, to='name_short')
+
+
+def load_country_cache(filename: str) -> dict:
+    """
+    Load the saved country code to name lookup, if there is one.
+    """
+    try:
+        with open(filename, encoding='utf-8') as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_country_cache(country_names: dict, filename: str) -> None:
+    """
+    Save the country code to name lookup for the next run.
+    """
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+    with open(filename, 'w', encoding='utf-8') as cache_file:
+        json.dump(country_names, cache_file)
+
+
+def get_country_names(country_codes: list[str], filename: str = None) -> dict:
+    """
+    Return the standard name for each country code. Codes in the precomputed
+    table are looked up there, and only codes not already cached in memory or
+    in the cache file are converted.
+    """
+    unlisted_codes = [code for code in country_codes if code not in COUNTRY_CODE_NAMES]
+
+    if filename and unlisted_codes and not COUNTRY_NAMES:
+        COUNTRY_NAMES.update(load_country_cache(filename))
+
+    missing_codes = [code for code in unlisted_codes if code not in COUNTRY_NAMES]
+
+    for code in missing_codes:
+        COUNTRY_NAMES[code] = convert_country_code(code)
+
+    if filename and missing_codes:
+        save_country_cache(COUNTRY_NAMES, filename)
+
+    return {code: COUNTRY_CODE_NAMES[code] if code in COUNTRY_CODE_NAMES else COUNTRY_NAMES[code]
+            for code in country_codes}
 
 
 def standardize_country_name(country_name: str) -> str:
     """
     Convert country code given into standard country name.
     """
-    return coco.convert(names=country_name, to='name_short')
+    return get_country_names([country_name])[country_name]
+
+
+def standardize_country_names(country_codes: pd.Series, filename: str = None) -> pd.Series:
+    """
+    Convert a column of country codes into standard country names,
+    looking up each unique code once and mapping the result across the rows.
+    """
+    country_codes = country_codes.astype('category')
+    country_names = get_country_names(list(country_codes.cat.categories), filename)
+
+    return country_codes.map(country_names)
 
 
 def remove_rows_with_null(dataframe, columns):
@@ -18,38 +98,62 @@ def remove_rows_with_null(dataframe, columns):
     return dataframe.dropna(subset=columns)
 
 
+def get_soil_temp_mask(dataframe: pd.DataFrame) -> pd.Series:
+    """
+    Return which rows have a valid temperature reading.
+    """
+    return (dataframe['Temperature'] > 0) & (dataframe['Temperature'] < 30)
+
+
+def get_soil_moisture_mask(dataframe: pd.DataFrame) -> pd.Series:
+    """
+    Return which rows have a valid soil moisture reading.
+    """
+    return (dataframe['Soil Moisture'] > 0) & (dataframe['Soil Moisture'] < 100)
+
+
 def check_soil_temp_valid(dataframe: pd.DataFrame) -> pd.DataFrame:
     """
     Check if temperature reading is valid.
     """
-    temp_conditions = (
-        (dataframe['Temperature'] > 0) &
-        (dataframe['Temperature'] < 30)
-    )
-
-    return dataframe[temp_conditions]
+    return dataframe[get_soil_temp_mask(dataframe)]
 
 
 def check_soil_moisture_valid(dataframe: pd.DataFrame) -> pd.DataFrame:
     """
     Check if temperature reading is valid.
     """
-    moisture_conditions = (
-        (dataframe['Soil Moisture'] > 0) &
-        (dataframe['Soil Moisture'] < 100)
-    )
+    return dataframe[get_soil_moisture_mask(dataframe)]
+
+
+def parse_datetime_column(values: pd.Series, datetime_format: str) -> pd.Series:
+    """
+    Parse a column of datetimes with the format the API uses, falling back
+    to inferring the format for the whole column if any value doesn't match it.
+    Values that can't be parsed become NaT.
+    """
+    parsed = pd.to_datetime(values, format=datetime_format, errors='coerce')
+
+    if (parsed.isna() & values.notna()).any():
+        parsed = pd.to_datetime(values, errors='coerce')
+
+    return parsed
+
 
-    return dataframe[moisture_conditions]
+def parse_last_watered(values: pd.Series) -> pd.Series:
+    """
+    Parse last watered datetimes, dropping their timezone.
+    """
+    return parse_datetime_column(values, LAST_WATERED_FORMAT).dt.tz_localize(None)
 
 
 def normalize_datetimes(dataframe: pd.DataFrame) -> pd.DataFrame:
     """
     Check if datetimes are valid. Drop non-valid values
     """
-    dataframe['Last Watered'] = pd.to_datetime(
-        dataframe['Last Watered'], errors='coerce').dt.tz_localize(None)
-    dataframe['Recording Taken'] = pd.to_datetime(
-        dataframe['Recording Taken'], errors='coerce')
+    dataframe['Last Watered'] = parse_last_watered(dataframe['Last Watered'])
+    dataframe['Recording Taken'] = parse_datetime_column(
+        dataframe['Recording Taken'], RECORDING_TAKEN_FORMAT)
 
     dataframe = dataframe.dropna(subset=['Last Watered', 'Recording Taken'])
 
@@ -66,6 +170,37 @@ def change_temp_and_moisture_to_two_dp(dataframe: pd.DataFrame) -> pd.DataFrame:
     return dataframe
 
 
+def clean_plant_data(dataframe: pd.DataFrame,
+                     required_columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Validate and normalise plant data in a single pass. The null, soil moisture,
+    temperature and datetime checks are combined into one mask, and one filtered
+    copy is taken with the parsed datetimes and rounded readings written into it.
+    The input data frame is left unchanged. Rows must have every one of
+    `required_columns`, REQUIRED_COLUMNS by default.
+    """
+    if required_columns is None:
+        required_columns = REQUIRED_COLUMNS
+
+    last_watered = parse_last_watered(dataframe['Last Watered'])
+    recording_taken = parse_datetime_column(dataframe['Recording Taken'], RECORDING_TAKEN_FORMAT)
+
+    valid_rows = (dataframe[required_columns].notna().all(axis=1)
+                  & get_soil_moisture_mask(dataframe)
+                  & get_soil_temp_mask(dataframe)
+                  & last_watered.notna()
+                  & recording_taken.notna())
+    positions = np.flatnonzero(valid_rows.to_numpy())
+
+    cleaned = dataframe.take(positions)
+    cleaned['Last Watered'] = last_watered.iloc[positions].to_numpy()
+    cleaned['Recording Taken'] = recording_taken.iloc[positions].to_numpy()
+    cleaned['Soil Moisture'] = cleaned['Soil Moisture'].round(2)
+    cleaned['Temperature'] = cleaned['Temperature'].round(2)
+
+    return cleaned
+
+
 def csv_to_data_frame(filename: str) -> pd.DataFrame:
     """Converts a csv file to a pandas data frame."""
 
@@ -83,21 +218,14 @@ if __name__ == "__main__":
     plants = csv_to_data_frame("./data/plant_data.csv")
 
     # Location formatting
-    plants["Country"] = plants["Country's Initials"].apply(
-        standardize_country_name)
+    plants["Country"] = standardize_country_names(
+        plants["Country's Initials"], COUNTRY_CACHE_FILE)
 
     # Drop redundant columns
     plants = plants.drop("Country's Initials", axis=1)
 
-    # Drop rows with null values in important columns
-    plants = remove_rows_with_null(plants, ["Id", "Name", "Recording Taken", "Soil Moisture",
-                                            "Temperature", "Botanist Name", "Botanist Email", "Botanist Phone"])
-
-    # Validate and round moisture and temperature values
-    plants = check_soil_moisture_valid(plants)
-    plants = check_soil_temp_valid(plants)
-    plants = normalize_datetimes(plants)
-    plants = change_temp_and_moisture_to_two_dp(plants)
+    # Drop rows with null or invalid values, normalise datetimes and round readings
+    plants = clean_plant_data(plants)
 
     # Add clean data to new file
     upload_clean_csv_file('./data/cleaned_plant_data.csv', plants)
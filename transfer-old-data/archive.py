@@ -0,0 +1,330 @@
+"""
+Append-only, date-partitioned archive of old plant recordings in S3.
+
+Each transfer writes its rows as new objects under a `date=YYYY-MM-DD/` prefix
+and never rewrites the objects already there. A small manifest lists every
+partition with the range of recording ids it was written from, and is only
+updated once the new objects are written, so a crash mid-transfer never leaves
+the manifest pointing at missing data. Rows whose ids a listed range already
+covers are dropped before writing, so a retried transfer that reads a
+different set of rows still archives each reading once.
+
+Partitions are written as Parquet by default, with typed columns and the
+repeated plant, botanist and location strings dictionary encoded, so readers
+can fetch just the columns they need. CSV partitions are still read and can
+still be written for older consumers.
+
+Objects are read as an iterator of typed DataFrame batches. CSV is parsed
+straight off the S3 response stream a chunk of rows at a time, so the whole
+body is never held as bytes and a string on top of the parsed rows.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from collections.abc import Iterator
+from datetime import datetime
+from functools import cache
+from io import BytesIO, StringIO
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from mypy_boto3_s3 import S3Client
+
+# pandas and pyarrow take most of the transfer's startup, so they're imported
+# by the functions that use them rather than when this module loads
+# pylint: disable=import-outside-toplevel
+
+ARCHIVE_PREFIX = 'lmnh_plant_data_archive'
+MANIFEST_NAME = 'manifest.json'
+ARCHIVE_FORMAT = 'parquet'
+
+TIMESTAMP_COLUMNS = ["Recording Taken", "Last Watered"]
+DICTIONARY_COLUMNS = ["Plant Name", "Botanist Name", "Botanist Email", "Botanist Phone Number",
+                      "Region", "Country", "Continent"]
+ARCHIVE_COLUMNS = ["Recording ID", "Soil Moisture", "Temperature", *TIMESTAMP_COLUMNS,
+                   *DICTIONARY_COLUMNS]
+
+CSV_CHUNK_ROWS = 250_000
+CSV_DTYPES = {"Recording ID": "int64", "Soil Moisture": "float64", "Temperature": "float64",
+              **{column: "category" for column in DICTIONARY_COLUMNS}}
+
+
+@cache
+def get_archive_schema() -> pa.Schema:
+    """
+    Returns the Parquet schema of the archive, with the repeated plant,
+    botanist and location strings dictionary encoded.
+    """
+
+    import pyarrow as pa
+
+    dictionary_string = pa.dictionary(pa.int32(), pa.string())
+
+    return pa.schema([("Recording ID", pa.int64()),
+                      ("Soil Moisture", pa.float64()),
+                      ("Temperature", pa.float64()),
+                      *[(column, pa.timestamp("ms")) for column in TIMESTAMP_COLUMNS],
+                      *[(column, dictionary_string) for column in DICTIONARY_COLUMNS]])
+
+
+def get_manifest_key(prefix: str = ARCHIVE_PREFIX) -> str:
+    """Returns the key of the archive's manifest."""
+
+    return f"{prefix}/{MANIFEST_NAME}"
+
+
+def get_partition_key(date: str, first_id: int, last_id: int, prefix: str = ARCHIVE_PREFIX,
+                      file_format: str = ARCHIVE_FORMAT) -> str:
+    """Returns the key of the object holding a date's recordings between two ids."""
+
+    return f"{prefix}/date={date}/part-{first_id}-{last_id}.{file_format}"
+
+
+def create_manifest() -> dict:
+    """Returns the manifest of an empty archive."""
+
+    return {"updated_at": None, "partitions": {}}
+
+
+def load_manifest(s3_client: S3Client, bucket: str, prefix: str = ARCHIVE_PREFIX) -> dict:
+    """Loads the archive's manifest, or an empty one if the archive is new."""
+
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=get_manifest_key(prefix))
+    except s3_client.exceptions.NoSuchKey:
+        return create_manifest()
+
+    return json.loads(obj["Body"].read())
+
+
+def save_manifest(s3_client: S3Client, bucket: str, manifest: dict,
+                  prefix: str = ARCHIVE_PREFIX) -> None:
+    """Writes the manifest, replacing the old one in a single put."""
+
+    manifest["updated_at"] = datetime.now().isoformat()
+    s3_client.put_object(Bucket=bucket, Key=get_manifest_key(prefix),
+                         Body=json.dumps(manifest, indent=1).encode(),
+                         ContentType="application/json")
+
+
+def split_into_partitions(data: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Splits recordings by the date they were taken on, as YYYY-MM-DD strings."""
+
+    import pandas as pd
+
+    dates = pd.to_datetime(data["Recording Taken"]).dt.strftime("%Y-%m-%d")
+
+    return {date: partition for date, partition in data.groupby(dates, sort=True)}
+
+
+def to_parquet_bytes(data: pd.DataFrame) -> bytes:
+    """Encodes recordings as Parquet with the archive's column types."""
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    data = data.assign(**{column: pd.to_datetime(data[column]) for column in TIMESTAMP_COLUMNS})
+    table = pa.Table.from_pandas(data[ARCHIVE_COLUMNS], schema=get_archive_schema(),
+                                 preserve_index=False)
+
+    parquet_buffer = BytesIO()
+    pq.write_table(table, parquet_buffer, compression="zstd")
+
+    return parquet_buffer.getvalue()
+
+
+def to_csv_bytes(data: pd.DataFrame) -> bytes:
+    """Encodes recordings as CSV, as the old archive was."""
+
+    csv_buffer = StringIO()
+    data.to_csv(csv_buffer, index=False)
+
+    return csv_buffer.getvalue().encode()
+
+
+def write_partitions(s3_client: S3Client, bucket: str, data: pd.DataFrame,
+                     prefix: str = ARCHIVE_PREFIX,
+                     file_format: str = ARCHIVE_FORMAT) -> list[dict]:
+    """Writes each date's recordings as a new object, returning their manifest entries."""
+
+    encode = to_parquet_bytes if file_format == "parquet" else to_csv_bytes
+    entries = []
+
+    for date, partition in split_into_partitions(data).items():
+        first_id = int(partition["Recording ID"].min())
+        last_id = int(partition["Recording ID"].max())
+        key = get_partition_key(date, first_id, last_id, prefix, file_format)
+
+        s3_client.put_object(Bucket=bucket, Key=key, Body=encode(partition))
+
+        entries.append({"date": date, "key": key, "rows": len(partition),
+                        "first_recording_id": first_id, "last_recording_id": last_id})
+
+    return entries
+
+
+def add_to_manifest(manifest: dict, entries: list[dict]) -> dict:
+    """Adds new partition objects to the manifest, ignoring any it already lists."""
+
+    partitions = manifest["partitions"]
+
+    for entry in entries:
+        date_objects = partitions.setdefault(entry["date"], [])
+        if entry["key"] not in [listed["key"] for listed in date_objects]:
+            date_objects.append({key: value for key, value in entry.items() if key != "date"})
+
+    manifest["partitions"] = dict(sorted(partitions.items()))
+
+    return manifest
+
+
+def drop_archived_recordings(data: pd.DataFrame, manifest: dict) -> pd.DataFrame:
+    """
+    Drops the recordings whose ids fall in the id range of an object the manifest
+    lists. Each range was read as one run of ids, so every id in it is archived.
+    """
+
+    import pandas as pd
+
+    ranges = sorted((obj["first_recording_id"], obj["last_recording_id"])
+                    for date_objects in manifest["partitions"].values()
+                    for obj in date_objects)
+
+    if not ranges or data.empty:
+        return data
+
+    firsts = pd.Index([first for first, _ in ranges])
+    furthest_lasts = pd.Series([last for _, last in ranges]).cummax().to_numpy()
+    ids = data["Recording ID"].to_numpy()
+
+    positions = firsts.searchsorted(ids, side="right") - 1
+    archived = (positions >= 0) & (ids <= furthest_lasts[positions.clip(0)])
+
+    return data[~archived]
+
+
+def append_to_archive(s3_client: S3Client, bucket: str, data: pd.DataFrame,
+                      prefix: str = ARCHIVE_PREFIX, file_format: str = ARCHIVE_FORMAT) -> dict:
+    """
+    Appends the recordings the archive doesn't already hold, then updates and
+    returns its manifest.
+    """
+
+    manifest = load_manifest(s3_client, bucket, prefix)
+    data = drop_archived_recordings(data, manifest)
+
+    if data.empty:
+        return manifest
+
+    entries = write_partitions(s3_client, bucket, data, prefix, file_format)
+    manifest = add_to_manifest(manifest, entries)
+    save_manifest(s3_client, bucket, manifest, prefix)
+
+    return manifest
+
+
+def get_partition_keys(manifest: dict, dates: list[str] = None) -> list[str]:
+    """Lists the keys of every object in the archive, or only those for the given dates."""
+
+    return [obj["key"]
+            for date, date_objects in manifest["partitions"].items()
+            if dates is None or date in dates
+            for obj in date_objects]
+
+
+def iter_csv_batches(s3_client: S3Client, bucket: str, key: str, columns: list[str] = None,
+                     chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Parses a CSV object as it streams from S3, yielding typed batches of rows."""
+
+    import pandas as pd
+
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+
+    with pd.read_csv(body, usecols=columns, dtype=CSV_DTYPES, chunksize=chunk_rows,
+                     parse_dates=[column for column in TIMESTAMP_COLUMNS
+                                  if columns is None or column in columns]) as reader:
+        yield from reader
+
+
+def iter_parquet_batches(s3_client: S3Client, bucket: str, key: str, columns: list[str] = None,
+                         chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yields batches of the given columns of a Parquet object. Parquet needs its
+    footer first, so the compressed object is fetched whole, but only one
+    batch is decoded at a time.
+    """
+
+    import pyarrow.parquet as pq
+
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+    for batch in pq.ParquetFile(BytesIO(body)).iter_batches(chunk_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def iter_partition_batches(s3_client: S3Client, bucket: str, key: str, columns: list[str] = None,
+                           chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yields typed batches of one partition object, Parquet or CSV."""
+
+    if key.endswith(".parquet"):
+        return iter_parquet_batches(s3_client, bucket, key, columns, chunk_rows)
+
+    return iter_csv_batches(s3_client, bucket, key, columns, chunk_rows)
+
+
+def iter_archive_batches(s3_client: S3Client, bucket: str, manifest: dict,
+                         dates: list[str] = None, columns: list[str] = None,
+                         chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yields typed batches of the archive, or only the given dates of it, oldest first."""
+
+    for key in get_partition_keys(manifest, dates):
+        yield from iter_partition_batches(s3_client, bucket, key, columns, chunk_rows)
+
+
+def read_partition(s3_client: S3Client, bucket: str, key: str,
+                   columns: list[str] = None) -> pd.DataFrame:
+    """Reads one partition object, only decoding the given columns of a Parquet one."""
+
+    import pandas as pd
+
+    return pd.concat(iter_partition_batches(s3_client, bucket, key, columns), ignore_index=True)
+
+
+def read_archive(s3_client: S3Client, bucket: str, manifest: dict, dates: list[str] = None,
+                 columns: list[str] = None) -> pd.DataFrame:
+    """Reads the archive's partitions, or only those for the given dates, oldest first."""
+
+    import pandas as pd
+
+    batches = list(iter_archive_batches(s3_client, bucket, manifest, dates, columns))
+
+    if not batches:
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+
+    return pd.concat(batches, ignore_index=True)
+
+
+def export_archive_csv(s3_client: S3Client, bucket: str, manifest: dict, key: str,
+                       dates: list[str] = None) -> None:
+    """
+    Writes the archive, or the given dates of it, as a single CSV for older consumers.
+    Batches are spooled to a temporary file and uploaded from there in parts,
+    so memory use doesn't grow with the archive.
+    """
+
+    with tempfile.TemporaryFile() as csv_file:
+        header = True
+        for batch in iter_archive_batches(s3_client, bucket, manifest, dates):
+            batch.to_csv(csv_file, index=False, header=header)
+            header = False
+
+        if header:
+            csv_file.write(",".join(ARCHIVE_COLUMNS).encode() + b"\n")
+
+        csv_file.seek(0)
+        s3_client.upload_fileobj(csv_file, bucket, key)
@@ -0,0 +1,101 @@
+"""
+Benchmark suite for the transfer job and archive reads, run with pytest-benchmark.
+
+Every benchmark runs on a reading from each of 50 up to 100k synthetic plants,
+spread over two days. The transfer moves them from a fresh local SQLite
+database into a fresh bucket of the moto S3 stand-in every round.
+
+Run with `bash benchmarks.sh` to compare against the stored baseline, failing on
+regressions, or `bash benchmarks.sh save` to store a new baseline.
+"""
+
+import itertools
+
+import pandas as pd
+import pytest
+from sqlalchemy import sql
+
+from transfer_old_data import transfer_old_data, get_database_connection
+from archive import append_to_archive, load_manifest, read_archive
+from conftest import BUCKET
+
+PLANT_COUNTS = [50, 1_000, 100_000]
+TRANSFER_ROUNDS = 5
+
+def make_recordings(plant_count: int) -> pd.DataFrame:
+    """Builds extracted recordings with a reading from each plant, spread over two days."""
+
+    plant_ids = pd.RangeIndex(plant_count)
+
+    return pd.DataFrame({
+        "Recording ID": plant_ids + 1,
+        "Soil Moisture": 50.0 + plant_ids % 40, "Temperature": 10.0 + plant_ids % 15,
+        "Recording Taken": pd.Timestamp("2023-12-18 09:00:00") + pd.to_timedelta(
+            plant_ids * (2 * 86_400 // plant_count), unit="s"),
+        "Last Watered": pd.Timestamp("2023-12-18 08:00:00"),
+        "Plant Name": plant_ids.map("Plant {}".format),
+        "Botanist Name": (plant_ids % 12).map("Botanist {}".format),
+        "Botanist Email": (plant_ids % 12).map("botanist.{}@lnhm.co.uk".format),
+        "Botanist Phone Number": "(146)994-1635x35992",
+        "Region": (plant_ids % 90).map("Region {}".format), "Country": "Brazil",
+        "Continent": "America"})
+
+
+def seed_database(connection, plant_count: int) -> None:
+    """Loads a reading from each plant into the pipeline's SQLite schema."""
+
+    connection.execute(sql.text("INSERT INTO s_delta.botanist VALUES (:id, :name, :email, :phone)"),
+                       [{"id": botanist, "name": f"Botanist {botanist}",
+                         "email": f"botanist.{botanist}@lnhm.co.uk",
+                         "phone": "(146)994-1635x35992"} for botanist in range(12)])
+    connection.execute(sql.text("INSERT INTO s_delta.location VALUES (:id, :region, 'Brazil', "
+                                "'America')"),
+                       [{"id": region, "region": f"Region {region}"} for region in range(90)])
+    connection.execute(sql.text("INSERT INTO s_delta.plant VALUES (:id, :name, :location, "
+                                ":botanist)"),
+                       [{"id": plant, "name": f"Plant {plant}", "location": plant % 90,
+                         "botanist": plant % 12} for plant in range(plant_count)])
+
+    recordings = make_recordings(plant_count)
+    connection.execute(sql.text("INSERT INTO s_delta.recording VALUES (:id, :plant, :moisture, "
+                                ":temperature, :taken, :watered)"),
+                       [{"id": int(row["Recording ID"]), "plant": int(row["Recording ID"]) - 1,
+                         "moisture": row["Soil Moisture"], "temperature": row["Temperature"],
+                         "taken": str(row["Recording Taken"]), "watered": str(row["Last Watered"])}
+                        for row in recordings.to_dict("records")])
+    connection.commit()
+
+
+@pytest.mark.parametrize("plant_count", PLANT_COUNTS)
+def test_transfer_old_data(benchmark, s3_client, tmp_path, plant_count):
+    """Benchmarks moving every recording from the database to the archive."""
+
+    rounds = itertools.count()
+
+    def setup():
+        round_number = next(rounds)
+        bucket = f"{BUCKET}-{round_number}"
+        s3_client.create_bucket(Bucket=bucket, CreateBucketConfiguration={
+            "LocationConstraint": "eu-west-2"})
+        connection = get_database_connection({"DB_BACKEND": "sqlite",
+                                              "DB_PATH": str(tmp_path / f"{round_number}.db")})
+        seed_database(connection, plant_count)
+        return (connection, s3_client, bucket), {}
+
+    def teardown(connection, *_):
+        connection.close()
+
+    benchmark.pedantic(transfer_old_data, setup=setup, teardown=teardown,
+                       rounds=TRANSFER_ROUNDS)
+
+
+@pytest.mark.parametrize("plant_count", PLANT_COUNTS)
+def test_read_archive(benchmark, s3_client, plant_count):
+    """Benchmarks reading a day of the archive back, as the dashboard does."""
+
+    manifest = append_to_archive(s3_client, BUCKET, make_recordings(plant_count))
+
+    day = benchmark(read_archive, s3_client, BUCKET, load_manifest(s3_client, BUCKET),
+                    ["2023-12-18"], ["Recording Taken", "Soil Moisture", "Plant Name"])
+
+    assert len(day) == sum(obj["rows"] for obj in manifest["partitions"]["2023-12-18"])
@@ -0,0 +1,167 @@
+"""
+Benchmarks the peak memory of reading a large CSV archive from S3.
+
+Builds a synthetic archive of the given size, then reads it in a fresh process
+per mode and reports each process's peak RSS:
+- `full` : the old read().decode() into a StringIO, then one read_csv
+- `streamed` : get_archive_data_csv, parsing chunks straight off the body
+- `bounded` : iter_csv_batches, handling one batch at a time as the migration does
+
+The body is a botocore StreamingBody over a local file, the same object boto3
+returns for a real GetObject, so only the reader's own memory is measured.
+
+Run with `python3 benchmark_archive_read.py [size in GB] [--file archive.csv]`.
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+from botocore.response import StreamingBody
+
+from archive import iter_csv_batches
+from transfer_old_data import get_archive_data_csv
+
+DEFAULT_SIZE_GB = 2
+GENERATE_CHUNK_ROWS = 500_000
+MODES = ["full", "streamed", "bounded"]
+
+
+class LocalArchiveClient:
+    """Serves a local file as the body of every GetObject, as S3 would stream it."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def get_object(self, **_) -> dict:
+        """Returns the file as a streaming response body."""
+
+        return {"Body": StreamingBody(open(self.filename, 'rb'),  # pylint: disable=consider-using-with
+                                      os.path.getsize(self.filename))}
+
+
+def make_archive_rows(first_id: int, row_count: int, seed: int = 0) -> pd.DataFrame:
+    """Builds archived recordings for 50 plants, one reading per plant per minute."""
+
+    rng = np.random.default_rng(seed + first_id)
+    ids = np.arange(first_id, first_id + row_count)
+    plants = ids % 50
+
+    return pd.DataFrame({
+        "Recording ID": ids,
+        "Soil Moisture": rng.uniform(0, 100, row_count).round(2),
+        "Temperature": rng.uniform(0, 30, row_count).round(2),
+        "Recording Taken": pd.Timestamp("2023-01-01") + pd.to_timedelta(ids // 50, unit="min"),
+        "Last Watered": pd.Timestamp("2023-01-01") + pd.to_timedelta(ids // 50 // 1440, unit="D"),
+        "Plant Name": pd.Series(plants).map("Plant {}".format),
+        "Botanist Name": "Carl Linnaeus",
+        "Botanist Email": "carl.linnaeus@lnhm.co.uk",
+        "Botanist Phone Number": "(146)994-1635x35992",
+        "Region": pd.Series(plants).map("Region {}".format),
+        "Country": "Brazil", "Continent": "America"})
+
+
+def make_archive_csv(filename: str, size_gb: float) -> int:
+    """Writes a synthetic archive CSV of roughly the given size, returning its row count."""
+
+    target_bytes = size_gb * 1024 ** 3
+    row_count = 0
+
+    with open(filename, 'w', encoding='utf-8') as archive_file:
+        while archive_file.tell() < target_bytes:
+            make_archive_rows(row_count + 1, GENERATE_CHUNK_ROWS).to_csv(
+                archive_file, index=False, header=row_count == 0)
+            row_count += GENERATE_CHUNK_ROWS
+
+    return row_count
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Returns this process's peak resident memory in MB. On Linux ru_maxrss also
+    counts the parent's memory from before the exec, so VmHWM is used instead.
+    """
+
+    try:
+        with open("/proc/self/status", encoding="utf-8") as status_file:
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_archive(mode: str, filename: str) -> int:
+    """Reads the archive in the given mode, returning the number of rows read."""
+
+    s3_client = LocalArchiveClient(filename)
+
+    if mode == "full":
+        csv_str = s3_client.get_object()["Body"].read().decode()
+        return len(pd.read_csv(StringIO(csv_str)))
+
+    if mode == "streamed":
+        return len(get_archive_data_csv(s3_client, "bucket", "key"))
+
+    return sum(len(batch) for batch in iter_csv_batches(s3_client, "bucket", "key"))
+
+
+def run_child(mode: str, filename: str) -> None:
+    """Reads the archive in this process and prints the measurements as JSON."""
+
+    baseline_mb = get_peak_rss_mb()
+    start = time.perf_counter()
+    rows = read_archive(mode, filename)
+
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - start,
+                      "baseline_mb": baseline_mb, "peak_mb": get_peak_rss_mb()}))
+
+
+def measure(mode: str, filename: str) -> dict | None:
+    """Reads the archive in a fresh process, returning None if it ran out of memory."""
+
+    result = subprocess.run([sys.executable, __file__, "--child", mode, filename],
+                            capture_output=True, text=True, check=False)
+
+    if result.returncode != 0:
+        return None
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+
+    if sys.argv[1:2] == ["--child"]:
+        run_child(sys.argv[2], sys.argv[3])
+        sys.exit()
+
+    args = sys.argv[1:]
+    size = float(args[0]) if args and not args[0].startswith("--") else DEFAULT_SIZE_GB
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if "--file" in args:
+            archive_filename = args[args.index("--file") + 1]
+        else:
+            archive_filename = os.path.join(temp_dir, "archive.csv")
+            print(f"Generating a {size} GB archive...")
+            make_archive_csv(archive_filename, size)
+
+        print(f"Archive: {os.path.getsize(archive_filename) / 1024 ** 2:.0f} MB")
+
+        for read_mode in MODES:
+            measurements = measure(read_mode, archive_filename)
+            if measurements is None:
+                print(f"{read_mode:>9}: ran out of memory")
+                continue
+            print(f"{read_mode:>9}: {measurements['rows']} rows in "
+                  f"{measurements['seconds']:.1f} s, peak RSS {measurements['peak_mb']:.0f} MB "
+                  f"({measurements['peak_mb'] - measurements['baseline_mb']:.0f} MB for the read)")
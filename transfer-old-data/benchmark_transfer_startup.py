@@ -0,0 +1,30 @@
+"""
+Gates how long the transfer's modules take to import, with the pipeline's
+`benchmark_startup.py`, against this machine's `startup_baseline.json` under
+`benchmark_baselines` in this directory.
+
+Fails if a module imports more than STARTUP_MAX_REGRESSION percent (50 by
+default) slower than the baseline, or loads pandas, pyarrow, boto3, SQLAlchemy
+or dotenv before they're used, or the boto3 type stubs, which are only for
+type checking.
+
+Run from the repository with `python3 benchmark_transfer_startup.py [--save] [--runs N]`.
+"""
+
+import os
+import sys
+
+TRANSFER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(TRANSFER_DIR, "..", "pipeline"))
+
+from benchmark_startup import run_startup_gate  # pylint: disable=wrong-import-position
+
+# The dependencies each module must only import when they're first used
+DEFERRED_IMPORTS = {
+    "transfer_old_data": ["pandas", "pyarrow", "boto3", "sqlalchemy", "dotenv", "mypy_boto3_s3"],
+    "archive": ["pandas", "pyarrow", "mypy_boto3_s3"]}
+
+
+if __name__ == "__main__":
+
+    sys.exit(run_startup_gate(DEFERRED_IMPORTS, TRANSFER_DIR, "Gate the transfer's import times"))
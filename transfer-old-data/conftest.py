@@ -0,0 +1,28 @@
+"""Shared fixtures for the transfer tests."""
+
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+BUCKET = "test-archive-bucket"
+
+# The pipeline's SQLite backend, which the transfer reads with DB_BACKEND=sqlite
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipeline"))
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """Returns a client for an empty bucket in a local S3 stand-in."""
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-2")
+
+    with mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={
+            "LocationConstraint": "eu-west-2"})
+        yield s3_client
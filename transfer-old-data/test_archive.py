@@ -0,0 +1,261 @@
+"""Unit tests for the partitioned archive, run against a moto S3 stand-in."""
+
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from archive import (append_to_archive, load_manifest, get_partition_keys, get_manifest_key,
+                     split_into_partitions, to_parquet_bytes, read_partition, read_archive,
+                     export_archive_csv, iter_csv_batches, iter_archive_batches,
+                     drop_archived_recordings)
+from transfer_old_data import (migrate_legacy_archive, get_archive_data_csv, EXPORT_CSV_KEY,
+                               LEGACY_ARCHIVE_KEY)
+from conftest import BUCKET
+
+
+def make_recordings(first_id: int, recording_times: list[str]) -> pd.DataFrame:
+    """Builds extracted recordings with consecutive ids."""
+
+    return pd.DataFrame({
+        "Recording ID": range(first_id, first_id + len(recording_times)),
+        "Soil Moisture": 50.0, "Temperature": 12.5,
+        "Recording Taken": pd.to_datetime(recording_times),
+        "Last Watered": pd.Timestamp("2023-12-18 14:03:04"),
+        "Plant Name": "Venus flytrap", "Botanist Name": "Carl Linnaeus",
+        "Botanist Email": "carl.linnaeus@lnhm.co.uk",
+        "Botanist Phone Number": "(146)994-1635x35992",
+        "Region": "Resplendor", "Country": "Brazil", "Continent": "America"})
+
+
+def list_keys(s3_client) -> list[str]:
+    """Lists every object key in the test bucket."""
+
+    return sorted(obj["Key"] for obj in
+                  s3_client.list_objects_v2(Bucket=BUCKET).get("Contents", []))
+
+
+def test_split_into_partitions():
+    """Tests that recordings are grouped by the date they were taken."""
+
+    partitions = split_into_partitions(make_recordings(
+        1, ["2023-12-18 09:00:00", "2023-12-18 23:59:59", "2023-12-19 00:00:00"]))
+
+    assert {date: len(rows) for date, rows in partitions.items()} == {
+        "2023-12-18": 2, "2023-12-19": 1}
+
+
+def test_append_writes_only_new_partitions(s3_client):
+    """Tests that a second transfer adds objects without touching the first transfer's."""
+
+    append_to_archive(s3_client, BUCKET, make_recordings(
+        1, ["2023-12-18 09:00:00", "2023-12-18 10:00:00"]))
+    first_object = s3_client.get_object(
+        Bucket=BUCKET, Key="lmnh_plant_data_archive/date=2023-12-18/part-1-2.parquet")
+
+    manifest = append_to_archive(s3_client, BUCKET, make_recordings(
+        3, ["2023-12-18 11:00:00", "2023-12-19 08:00:00"]))
+
+    assert list_keys(s3_client) == ["lmnh_plant_data_archive/date=2023-12-18/part-1-2.parquet",
+                                    "lmnh_plant_data_archive/date=2023-12-18/part-3-3.parquet",
+                                    "lmnh_plant_data_archive/date=2023-12-19/part-4-4.parquet",
+                                    "lmnh_plant_data_archive/manifest.json"]
+    assert s3_client.get_object(
+        Bucket=BUCKET, Key="lmnh_plant_data_archive/date=2023-12-18/part-1-2.parquet"
+    )["ETag"] == first_object["ETag"]
+
+    assert list(manifest["partitions"]) == ["2023-12-18", "2023-12-19"]
+    assert [obj["rows"] for obj in manifest["partitions"]["2023-12-18"]] == [2, 1]
+
+
+def test_manifest_lists_partitions_without_scanning(s3_client):
+    """Tests that readers can find a date's objects from the saved manifest alone."""
+
+    append_to_archive(s3_client, BUCKET, make_recordings(
+        1, ["2023-12-18 09:00:00", "2023-12-19 09:00:00"]))
+
+    manifest = load_manifest(s3_client, BUCKET)
+
+    assert get_partition_keys(manifest, ["2023-12-19"]) == [
+        "lmnh_plant_data_archive/date=2023-12-19/part-2-2.parquet"]
+    assert len(get_partition_keys(manifest)) == 2
+
+    partition = read_partition(s3_client, BUCKET, get_partition_keys(manifest)[0])
+    assert partition["Recording ID"].tolist() == [1]
+
+
+def test_retried_append_is_idempotent(s3_client):
+    """Tests that appending the same rows twice doesn't duplicate them."""
+
+    recordings = make_recordings(1, ["2023-12-18 09:00:00", "2023-12-18 10:00:00"])
+
+    append_to_archive(s3_client, BUCKET, recordings)
+    manifest = append_to_archive(s3_client, BUCKET, recordings)
+
+    assert len(get_partition_keys(manifest)) == 1
+    assert len(list_keys(s3_client)) == 2
+
+
+def test_retry_reading_different_rows_archives_each_once(s3_client):
+    """Tests that a retry whose chunk has more rows only archives the ones not yet archived."""
+
+    recordings = make_recordings(1, ["2023-12-18 09:00:00", "2023-12-18 10:00:00",
+                                     "2023-12-18 11:00:00", "2023-12-18 12:00:00"])
+
+    append_to_archive(s3_client, BUCKET, recordings[:2])
+    manifest = append_to_archive(s3_client, BUCKET, recordings[1:])
+
+    assert get_partition_keys(manifest) == [
+        "lmnh_plant_data_archive/date=2023-12-18/part-1-2.parquet",
+        "lmnh_plant_data_archive/date=2023-12-18/part-3-4.parquet"]
+    assert read_archive(s3_client, BUCKET, manifest)["Recording ID"].tolist() == [1, 2, 3, 4]
+
+
+def test_drop_archived_recordings_uses_every_range():
+    """Tests that ids inside any listed object's range are dropped, whatever its date."""
+
+    manifest = {"partitions": {
+        "2023-12-17": [{"key": "a", "first_recording_id": 1, "last_recording_id": 10}],
+        "2023-12-18": [{"key": "b", "first_recording_id": 4, "last_recording_id": 6},
+                       {"key": "c", "first_recording_id": 20, "last_recording_id": 25}]}}
+    recordings = make_recordings(8, ["2023-12-18 09:00:00"] * 16)
+
+    kept = drop_archived_recordings(recordings, manifest)
+
+    assert kept["Recording ID"].tolist() == [11, 12, 13, 14, 15, 16, 17, 18, 19]
+
+
+def test_empty_append_writes_nothing(s3_client):
+    """Tests that a transfer with no new rows doesn't create a manifest."""
+
+    manifest = append_to_archive(s3_client, BUCKET, make_recordings(1, []))
+
+    assert manifest["partitions"] == {}
+    assert list_keys(s3_client) == []
+
+
+def test_migrate_legacy_archive(s3_client):
+    """Tests that the old single CSV archive is copied into date partitions."""
+
+    legacy_csv = make_recordings(
+        1, ["2023-12-17 09:00:00", "2023-12-18 09:00:00"]).to_csv(index=False)
+    s3_client.put_object(Bucket=BUCKET, Key="lmnh_plant_data_archive.csv",
+                         Body=legacy_csv.encode())
+
+    migrate_legacy_archive(s3_client, BUCKET, "lmnh_plant_data_archive.csv")
+
+    manifest = json.loads(s3_client.get_object(
+        Bucket=BUCKET, Key=get_manifest_key())["Body"].read())
+    assert list(manifest["partitions"]) == ["2023-12-17", "2023-12-18"]
+
+
+def test_migrate_legacy_archive_in_chunks(s3_client):
+    """Tests that a migration a few rows at a time still copies every row once."""
+
+    legacy_csv = make_recordings(1, ["2023-12-17 09:00:00", "2023-12-17 10:00:00",
+                                     "2023-12-17 11:00:00", "2023-12-18 09:00:00",
+                                     "2023-12-18 10:00:00"]).to_csv(index=False)
+    s3_client.put_object(Bucket=BUCKET, Key="lmnh_plant_data_archive.csv",
+                         Body=legacy_csv.encode())
+
+    manifest = migrate_legacy_archive(s3_client, BUCKET, "lmnh_plant_data_archive.csv",
+                                      chunk_rows=2)
+
+    assert get_partition_keys(manifest) == [
+        "lmnh_plant_data_archive/date=2023-12-17/part-1-2.parquet",
+        "lmnh_plant_data_archive/date=2023-12-17/part-3-3.parquet",
+        "lmnh_plant_data_archive/date=2023-12-18/part-4-4.parquet",
+        "lmnh_plant_data_archive/date=2023-12-18/part-5-5.parquet"]
+    assert read_archive(s3_client, BUCKET, manifest)["Recording ID"].tolist() == [1, 2, 3, 4, 5]
+
+    rerun = migrate_legacy_archive(s3_client, BUCKET, "lmnh_plant_data_archive.csv",
+                                   chunk_rows=3)
+
+    assert read_archive(s3_client, BUCKET, rerun)["Recording ID"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_iter_csv_batches_streams_typed_batches(s3_client):
+    """Tests that a CSV object is parsed in typed batches of the chosen size."""
+
+    recordings = make_recordings(1, ["2023-12-17 09:00:00"] * 5)
+    s3_client.put_object(Bucket=BUCKET, Key="recordings.csv",
+                         Body=recordings.to_csv(index=False).encode())
+
+    batches = list(iter_csv_batches(s3_client, BUCKET, "recordings.csv", chunk_rows=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert str(batches[0]["Recording ID"].dtype) == "int64"
+    assert str(batches[0]["Recording Taken"].dtype).startswith("datetime64")
+    assert isinstance(batches[0]["Country"].dtype, pd.CategoricalDtype)
+
+
+def test_iter_archive_batches_parquet_in_batches(s3_client):
+    """Tests that Parquet partitions are decoded a batch at a time."""
+
+    manifest = append_to_archive(s3_client, BUCKET, make_recordings(
+        1, ["2023-12-17 09:00:00"] * 3))
+
+    batches = list(iter_archive_batches(s3_client, BUCKET, manifest, columns=["Recording ID"],
+                                        chunk_rows=2))
+
+    assert [batch["Recording ID"].tolist() for batch in batches] == [[1, 2], [3]]
+
+
+def test_parquet_partitions_are_typed_and_dictionary_encoded():
+    """Tests the column types written to Parquet partitions."""
+
+    schema = pq.read_schema(pa.BufferReader(to_parquet_bytes(make_recordings(
+        1, ["2023-12-18 09:00:00", "2023-12-18 10:00:00"]))))
+
+    assert str(schema.field("Recording ID").type) == "int64"
+    assert str(schema.field("Recording Taken").type) == "timestamp[ms]"
+    assert str(schema.field("Plant Name").type) == (
+        "dictionary<values=string, indices=int32, ordered=0>")
+
+
+def test_read_archive_only_reads_chosen_dates_and_columns(s3_client):
+    """Tests that a single date can be read with just the columns asked for."""
+
+    append_to_archive(s3_client, BUCKET, make_recordings(
+        1, ["2023-12-17 09:00:00", "2023-12-18 09:00:00", "2023-12-18 10:00:00"]))
+    manifest = load_manifest(s3_client, BUCKET)
+
+    data = read_archive(s3_client, BUCKET, manifest, ["2023-12-18"],
+                        ["Recording Taken", "Temperature", "Plant Name"])
+
+    assert list(data.columns) == ["Recording Taken", "Temperature", "Plant Name"]
+    assert data["Recording Taken"].dt.hour.tolist() == [9, 10]
+    assert isinstance(data["Plant Name"].dtype, pd.CategoricalDtype)
+
+
+def test_csv_partitions_still_readable(s3_client):
+    """Tests that CSV and Parquet partitions can be read side by side."""
+
+    append_to_archive(s3_client, BUCKET, make_recordings(1, ["2023-12-17 09:00:00"]),
+                      file_format="csv")
+    append_to_archive(s3_client, BUCKET, make_recordings(2, ["2023-12-18 09:00:00"]))
+    manifest = load_manifest(s3_client, BUCKET)
+
+    assert get_partition_keys(manifest) == [
+        "lmnh_plant_data_archive/date=2023-12-17/part-1-1.csv",
+        "lmnh_plant_data_archive/date=2023-12-18/part-2-2.parquet"]
+
+    data = read_archive(s3_client, BUCKET, manifest, columns=["Recording ID", "Recording Taken"])
+    assert data["Recording ID"].tolist() == [1, 2]
+    assert data["Recording Taken"].dt.day.tolist() == [17, 18]
+
+
+def test_export_archive_csv(s3_client):
+    """Tests that the archive can be exported as a single CSV, leaving the legacy archive alone."""
+
+    s3_client.put_object(Bucket=BUCKET, Key=LEGACY_ARCHIVE_KEY, Body=b"legacy")
+    append_to_archive(s3_client, BUCKET, make_recordings(
+        1, ["2023-12-17 09:00:00", "2023-12-18 09:00:00"]))
+
+    export_archive_csv(s3_client, BUCKET, load_manifest(s3_client, BUCKET), EXPORT_CSV_KEY)
+
+    exported = get_archive_data_csv(s3_client, BUCKET, EXPORT_CSV_KEY)
+    assert exported["Recording ID"].tolist() == [1, 2]
+    assert exported["Plant Name"].tolist() == ["Venus flytrap", "Venus flytrap"]
+    assert s3_client.get_object(Bucket=BUCKET, Key=LEGACY_ARCHIVE_KEY)["Body"].read() == b"legacy"
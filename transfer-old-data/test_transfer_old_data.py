@@ -1,8 +1,23 @@
 """Unit tests for the ecs_load_to_s3.py script."""
 
+import subprocess
+import sys
+from collections import namedtuple
 from unittest.mock import MagicMock
 
-from transfer_old_data import extract_old_data_from_database, delete_data_from_db
+import pandas as pd
+import pytest
+from sqlalchemy import sql
+from sqlalchemy.dialects import mssql, sqlite
+
+import transfer_old_data
+from transfer_old_data import (extract_old_data_from_database, delete_data_from_db,
+                               get_database_connection, get_chunk_query,
+                               transfer_old_data as transfer, COLUMNS)
+from archive import load_manifest, read_archive
+from conftest import BUCKET
+
+Recording = namedtuple("Recording", COLUMNS)
 
 
 def test_extract_old_data_from_database_execute():
@@ -13,7 +28,7 @@ def test_extract_old_data_from_database_execute():
 
     extract_old_data_from_database(mock_conn)
 
-    assert mock_execute.call_count == 2
+    assert mock_execute.call_count == 1
 
 
 def test_extract_old_data_from_database_fetchall():
@@ -27,13 +42,127 @@ def test_extract_old_data_from_database_fetchall():
     assert mock_fetchall.call_count == 1
 
 
+def test_get_query_limits_for_each_database():
+    """Tests that the chunk query is limited with TOP on SQL Server and LIMIT on SQLite."""
+
+    query = get_chunk_query().limit(10)
+
+    assert str(query.compile(dialect=mssql.dialect())).startswith("SELECT TOP")
+    assert "LIMIT" in str(query.compile(dialect=sqlite.dialect()))
+
+
 def test_delete_data_from_db():
-    """Tests that execute is called within this function."""
+    """Tests that the ids are deleted in batches, committing after each one."""
 
     mock_conn = MagicMock()
 
     mock_execute = mock_conn.execute
 
-    delete_data_from_db(mock_conn)
+    delete_data_from_db(mock_conn, [1, 2, 3], batch_size=2)
 
     assert mock_execute.call_count == 2
+    assert mock_execute.call_args.args[1] == {"recording_ids": [3]}
+    assert mock_conn.commit.call_count == 2
+
+
+def make_fake_database(row_count: int) -> tuple[MagicMock, list]:
+    """Returns a mock connection that pages through and deletes from a list of recordings."""
+
+    database = [Recording(recording_id, 50.0, 12.5,
+                          pd.Timestamp("2023-12-18 09:00:00") + pd.Timedelta(hours=recording_id),
+                          pd.Timestamp("2023-12-18 08:00:00"), "Venus flytrap", "Carl Linnaeus",
+                          "carl.linnaeus@lnhm.co.uk", "(146)994-1635x35992", "Resplendor",
+                          "Brazil", "America")
+                for recording_id in range(1, row_count + 1)]
+
+    def execute(statement, params=None):
+        result = MagicMock()
+        if isinstance(statement, sql.Select):
+            chunk_size = statement.compile().params["param_1"]
+            result.fetchall.return_value = [
+                row for row in database
+                if row.recording_id > params["last_recording_id"]][:chunk_size]
+        elif "DELETE" in str(statement):
+            database[:] = [row for row in database
+                           if row.recording_id not in params["recording_ids"]]
+        return result
+
+    mock_conn = MagicMock()
+    mock_conn.execute.side_effect = execute
+
+    return mock_conn, database
+
+
+def test_transfer_old_data_in_chunks(s3_client):
+    """Tests that every recording is archived and deleted, a chunk at a time."""
+
+    mock_conn, database = make_fake_database(25)
+
+    assert transfer(mock_conn, s3_client, BUCKET, chunk_size=10, batch_size=4) == 25
+
+    assert database == []
+    assert mock_conn.commit.call_count == 3 + 3 + 2
+    assert read_archive(s3_client, BUCKET, load_manifest(s3_client, BUCKET))[
+        "Recording ID"].tolist() == list(range(1, 26))
+
+
+def test_transfer_old_data_resumes_after_failure(s3_client, monkeypatch):
+    """Tests that a failed transfer keeps unarchived rows, and a rerun archives them once."""
+
+    mock_conn, database = make_fake_database(25)
+    append_to_archive = transfer_old_data.append_to_archive
+    calls = []
+
+    def fail_on_second_chunk(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            raise ConnectionError("S3 went away")
+        return append_to_archive(*args, **kwargs)
+
+    monkeypatch.setattr(transfer_old_data, "append_to_archive", fail_on_second_chunk)
+
+    with pytest.raises(ConnectionError):
+        transfer(mock_conn, s3_client, BUCKET, chunk_size=10)
+
+    assert [row.recording_id for row in database] == list(range(11, 26))
+
+    transfer(mock_conn, s3_client, BUCKET, chunk_size=10)
+
+    archived = read_archive(s3_client, BUCKET, load_manifest(s3_client, BUCKET))
+    assert sorted(archived["Recording ID"].tolist()) == list(range(1, 26))
+    assert database == []
+
+
+def test_transfer_old_data_from_sqlite(s3_client, tmp_path):
+    """Tests a whole transfer from the pipeline's local SQLite backend, which creates its schema."""
+
+    conn = get_database_connection({"DB_BACKEND": "sqlite",
+                                    "DB_PATH": str(tmp_path / "plants.db")})
+    for statement in [
+            "INSERT INTO s_delta.botanist VALUES (1, 'Carl Linnaeus', 'carl.linnaeus@lnhm.co.uk', "
+            "'(146)994-1635x35992')",
+            "INSERT INTO s_delta.location VALUES (1, 'Resplendor', 'Brazil', 'America')",
+            "INSERT INTO s_delta.plant VALUES (1, 'Venus flytrap', 1, 1)"]:
+        conn.execute(sql.text(statement))
+    for hour in range(5):
+        conn.execute(sql.text("INSERT INTO s_delta.recording VALUES (NULL, 1, 50.0, 12.5, :taken, "
+                              "'2023-12-18 08:00:00')"),
+                     {"taken": f"2023-12-18 {9 + hour:02}:00:00"})
+    conn.commit()
+
+    assert transfer(conn, s3_client, BUCKET, chunk_size=2) == 5
+
+    assert conn.execute(sql.text("SELECT COUNT(*) FROM s_delta.recording")).scalar() == 0
+    archived = read_archive(s3_client, BUCKET, load_manifest(s3_client, BUCKET))
+    assert archived["Recording ID"].tolist() == [1, 2, 3, 4, 5]
+    assert archived["Plant Name"].tolist() == ["Venus flytrap"] * 5
+
+
+def test_type_stubs_not_imported_at_run_time():
+    """Tests that the job runs without the boto3 type stubs, which are only for type checking."""
+
+    result = subprocess.run([sys.executable, "-c", "import sys, transfer_old_data; "
+                             "print('mypy_boto3_s3' in sys.modules)"],
+                            capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
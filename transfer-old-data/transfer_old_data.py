@@ -1,31 +1,42 @@
 """
-Script that gets and removes all data from an RDS, uploading it
-to a CSV file in an S3 bucket in the process.
+Script that gets and removes all data from an RDS, appending it
+to a date-partitioned archive in an S3 bucket in the process.
+
+Recordings are paged through by recording_id, a chunk at a time. Each chunk
+is written to the archive, and only then are its ids deleted, in small
+batches, so memory stays flat and the live pipeline's inserts are never
+blocked for long. If the job fails, whatever it hadn't archived is still in
+the database for the next run.
 """
 
-from io import StringIO
+from __future__ import annotations
+
+import sys
+from functools import cache
 from os import environ, _Environ
+from typing import TYPE_CHECKING
 
-import pandas as pd
-from boto3 import client
-from mypy_boto3_s3 import S3Client
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, sql, Connection
+from archive import (append_to_archive, load_manifest, save_manifest, add_to_manifest,
+                     drop_archived_recordings, write_partitions, export_archive_csv,
+                     iter_csv_batches, ARCHIVE_FORMAT, CSV_CHUNK_ROWS)
 
-ARCHIVE_BUCKET = "c9-ladybird-lnhm-data-bucket"
-ARCHIVE_KEY = 'lmnh_plant_data_archive.csv'
+if TYPE_CHECKING:
+    import pandas as pd
+    from mypy_boto3_s3 import S3Client
+    from sqlalchemy import Connection, Select, TextClause
 
-GET_QUERY = sql.text("""SELECT rec.recording_id, rec.soil_moisture, rec.temperature,
-                     rec.recording_taken, rec.last_watered, plant.name AS plant_name,
-                     bot.name, bot.email, bot.telephone_number, loc.region, loc.country,
-                     loc.continent
-                     FROM s_delta.recording AS rec
-                     JOIN s_delta.plant AS plant ON rec.plant_id = plant.plant_id
-                     JOIN s_delta.botanist AS bot ON plant.botanist_id = bot.botanist_id
-                     JOIN s_delta.location AS loc ON plant.location_id = loc.location_id;
-                     """)
+# pandas, boto3 and SQLAlchemy take most of the job's startup, so they're
+# imported by the functions that use them rather than when this module loads
+# pylint: disable=import-outside-toplevel
+
+ARCHIVE_BUCKET = "c9-ladybird-lnhm-data-bucket"
+LEGACY_ARCHIVE_KEY = 'lmnh_plant_data_archive.csv'
+# Kept apart from the legacy archive, which --migrate-legacy reads
+EXPORT_CSV_KEY = 'lmnh_plant_data_archive/export.csv'
 
-DELETE_QUERY = sql.text("""DELETE FROM s_delta.recording;""")
+DB_BACKEND = "mssql"
+TRANSFER_CHUNK_SIZE = 10_000
+DELETE_BATCH_SIZE = 1_000
 
 COLUMNS = {"recording_id": "Recording ID", "soil_moisture": "Soil Moisture",
            "temperature": "Temperature", "recording_taken": "Recording Taken",
@@ -34,10 +45,68 @@ COLUMNS = {"recording_id": "Recording ID", "soil_moisture": "Soil Moisture",
            "region": "Region", "country": "Country", "continent": "Continent"}
 
 
+@cache
+def get_chunk_query() -> Select:
+    """
+    Returns the query for the recordings after an id, with their plant, botanist
+    and location. It is limited to a chunk of rows when run, which renders as
+    TOP on SQL Server and LIMIT on SQLite.
+    """
+
+    from sqlalchemy import sql
+
+    recording = sql.table("recording", sql.column("recording_id"), sql.column("plant_id"),
+                          sql.column("soil_moisture"), sql.column("temperature"),
+                          sql.column("recording_taken"), sql.column("last_watered"),
+                          schema="s_delta").alias("rec")
+    plant = sql.table("plant", sql.column("plant_id"), sql.column("name"),
+                      sql.column("botanist_id"), sql.column("location_id"),
+                      schema="s_delta").alias("plant")
+    botanist = sql.table("botanist", sql.column("botanist_id"), sql.column("name"),
+                         sql.column("email"), sql.column("telephone_number"),
+                         schema="s_delta").alias("bot")
+    location = sql.table("location", sql.column("location_id"), sql.column("region"),
+                         sql.column("country"), sql.column("continent"),
+                         schema="s_delta").alias("loc")
+
+    return (sql.select(recording.c.recording_id, recording.c.soil_moisture,
+                       recording.c.temperature, recording.c.recording_taken,
+                       recording.c.last_watered, plant.c.name.label("plant_name"),
+                       botanist.c.name, botanist.c.email, botanist.c.telephone_number,
+                       location.c.region, location.c.country, location.c.continent)
+            .join_from(recording, plant, recording.c.plant_id == plant.c.plant_id)
+            .join(botanist, plant.c.botanist_id == botanist.c.botanist_id)
+            .join(location, plant.c.location_id == location.c.location_id)
+            .where(recording.c.recording_id > sql.bindparam("last_recording_id"))
+            .order_by(recording.c.recording_id))
+
+
+@cache
+def get_delete_query() -> TextClause:
+    """Returns the query deleting a batch of recordings by id."""
+
+    from sqlalchemy import sql
+
+    return sql.text("""DELETE FROM s_delta.recording
+                    WHERE recording_id IN :recording_ids;""").bindparams(
+        sql.bindparam("recording_ids", expanding=True))
+
+
 def get_database_connection(config: _Environ) -> Connection:
-    """Get a connection to the short term database."""
+    """
+    Get a connection to the short term database: the SQL Server by default,
+    or the pipeline's local SQLite file with `DB_BACKEND=sqlite`.
+    """
+    if config.get("DB_BACKEND", DB_BACKEND) == "sqlite":
+        # The pipeline's SQLite backend, on the path with PYTHONPATH=../pipeline
+        from local_database import create_local_engine
+        return create_local_engine(config["DB_PATH"]).connect()
+
+    from sqlalchemy import create_engine
+
     sql_engine = create_engine(
-        f"mssql+pymssql://{config['DB_USERNAME']}:{config['DB_PASSWORD']}@{config['DB_HOST']}/?charset=utf8")
+        f"mssql+pymssql://{config['DB_USERNAME']}:{config['DB_PASSWORD']}@{config['DB_HOST']}"
+        f"/{config.get('DB_NAME', 'plants')}?charset=utf8")
 
     connection = sql_engine.connect()
 
@@ -46,56 +115,119 @@ def get_database_connection(config: _Environ) -> Connection:
 
 def get_s3_client(config: _Environ) -> S3Client:
     """Get a connection to the relevant S3 bucket."""
+    from boto3 import client
+
     s3_client = client("s3",
                        aws_access_key_id=config["AWS_ACCESS_KEY_ID"],
                        aws_secret_access_key=config["AWS_SECRET_ACCESS_KEY"])
     return s3_client
 
 
-def extract_old_data_from_database(connection: Connection) -> pd.DataFrame:
-    """Extract all data from the database."""
+def extract_old_data_from_database(connection: Connection, last_recording_id: int = 0,
+                                   chunk_size: int = TRANSFER_CHUNK_SIZE) -> pd.DataFrame:
+    """Extract the next chunk of data from the database, after the given recording id."""
 
-    connection.execute(sql.text("USE plants;"))
+    import pandas as pd
 
-    result = connection.execute(GET_QUERY).fetchall()
+    result = connection.execute(get_chunk_query().limit(chunk_size),
+                                {"last_recording_id": last_recording_id}).fetchall()
 
     return pd.DataFrame(result).rename(columns=COLUMNS)
 
 
 def get_archive_data_csv(s3_client: S3Client, bucket: str, key: str) -> pd.DataFrame:
-    """Retrieves the archived data from an S3 bucket."""
+    """Retrieves the archived data from an S3 bucket, parsing it as it streams in."""
+
+    import pandas as pd
+
+    return pd.concat(iter_csv_batches(s3_client, bucket, key), ignore_index=True)
+
+
+def migrate_legacy_archive(s3_client: S3Client, bucket: str, key: str,
+                           chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+    """
+    Copies the old single CSV archive into the partitioned archive, returning its manifest.
+    Only one chunk of rows is held in memory at a time, however large the old archive is,
+    and rows the archive already holds are skipped.
+    """
 
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    csv_str = obj["Body"].read().decode()
-    return pd.read_csv(StringIO(csv_str))
+    manifest = load_manifest(s3_client, bucket)
+    entries = []
+    for batch in iter_csv_batches(s3_client, bucket, key, chunk_rows=chunk_rows):
+        batch = drop_archived_recordings(batch, manifest)
+        if not batch.empty:
+            entries += write_partitions(s3_client, bucket, batch)
 
+    manifest = add_to_manifest(manifest, entries)
+    save_manifest(s3_client, bucket, manifest)
 
-def update_archive_data(arch_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
-    """Updates the archived dataframe with new data."""
+    return manifest
 
-    return pd.concat([arch_df, new_df], ignore_index=True, sort=False)
 
+def delete_data_from_db(conn: Connection, recording_ids: list[int],
+                        batch_size: int = DELETE_BATCH_SIZE) -> None:
+    """Deletes the given recordings from the database, committing each batch."""
 
-def delete_data_from_db(conn: Connection) -> None:
-    """Deletes all data from the database."""
+    for start in range(0, len(recording_ids), batch_size):
+        conn.execute(get_delete_query(), {"recording_ids": recording_ids[start:start + batch_size]})
+        conn.commit()
 
-    conn.execute(DELETE_QUERY)
-    conn.execute(sql.text("COMMIT;"))
+
+def transfer_old_data(conn: Connection, s3_client: S3Client, bucket: str,
+                      chunk_size: int = TRANSFER_CHUNK_SIZE,
+                      batch_size: int = DELETE_BATCH_SIZE,
+                      file_format: str = ARCHIVE_FORMAT) -> int:
+    """
+    Moves every recording from the database to the archive a chunk at a time,
+    deleting each chunk once the archive's manifest lists it. Returns the number
+    of recordings moved.
+    """
+
+    last_recording_id = 0
+    transferred = 0
+
+    while True:
+        chunk = extract_old_data_from_database(conn, last_recording_id, chunk_size)
+        if chunk.empty:
+            break
+
+        append_to_archive(s3_client, bucket, chunk, file_format=file_format)
+
+        recording_ids = chunk["Recording ID"].tolist()
+        delete_data_from_db(conn, recording_ids, batch_size)
+
+        last_recording_id = max(recording_ids)
+        transferred += len(chunk)
+
+        if len(chunk) < chunk_size:
+            break
+
+    return transferred
 
 
 if __name__ == "__main__":
 
+    from dotenv import load_dotenv
+
     load_dotenv()
 
-    conn = get_database_connection(environ)
     s3_client = get_s3_client(environ)
 
-    arch_data = get_archive_data_csv(s3_client, ARCHIVE_BUCKET, ARCHIVE_KEY)
-    new_plant_data = extract_old_data_from_database(conn)
-    combined_data = update_archive_data(arch_data, new_plant_data)
+    if "--migrate-legacy" in sys.argv:
+        migrate_legacy_archive(s3_client, ARCHIVE_BUCKET, LEGACY_ARCHIVE_KEY)
+        sys.exit()
+
+    if "--export-csv" in sys.argv:
+        export_archive_csv(s3_client, ARCHIVE_BUCKET,
+                           load_manifest(s3_client, ARCHIVE_BUCKET), EXPORT_CSV_KEY)
+        sys.exit()
+
+    conn = get_database_connection(environ)
 
-    combined_data.to_csv(
-        f"s3://{ARCHIVE_BUCKET}/{ARCHIVE_KEY}", index=False
-    )
+    # Only writes the new rows, each chunk is deleted once the manifest lists it
+    transfer_old_data(conn, s3_client, ARCHIVE_BUCKET,
+                      chunk_size=int(environ.get("TRANSFER_CHUNK_SIZE", TRANSFER_CHUNK_SIZE)),
+                      batch_size=int(environ.get("DELETE_BATCH_SIZE", DELETE_BATCH_SIZE)),
+                      file_format=environ.get("ARCHIVE_FORMAT", ARCHIVE_FORMAT))
 
-    delete_data_from_db(conn)
+    conn.close()